@@ -0,0 +1,33 @@
+# Settings for serving wsgi.py with gunicorn, they are picked up by running `gunicorn wsgi:app` in this folder
+import os
+import multiprocessing
+
+bind = '127.0.0.1:5000'
+
+# The app, with its preloaded regions, is created before the workers are forked, so the workers share those graphs and
+# their indexes copy-on-write and a restarted worker does not load them again
+preload_app = True
+
+# The jobs of the JSON API are kept in the job store, every worker answers for the jobs of the others
+workers = int(os.environ.get('WEB_CONCURRENCY', min(4, multiprocessing.cpu_count())))
+worker_class = 'gthread'
+# An open event stream holds a thread for as long as its job runs
+threads = 8
+
+
+def on_starting(server):
+    from srm.Core.SmartRouteMaker import Settings
+
+    if server.cfg.workers > 1 and not Settings.load('PlannerSettings')['jobs'].get('store', {}).get('enabled'):
+        raise RuntimeError("Without the job store a job is only known to the worker that runs it, enable jobs.store in "
+                           "PlannerSettings.json or serve srm with 1 worker")
+
+
+def post_fork(server, worker):
+    from srm.Core.SmartRouteMaker import Settings
+    from srm.Core.SmartRouteMaker import WorkerPool
+
+    # The worker has no request threads yet, so the routing workers are forked from a single threaded process. Together
+    # the routing workers of all gunicorn workers get one process per core, unless the worker_pool settings say otherwise.
+    processes = Settings.load('PlannerSettings')['worker_pool']['processes'] or max(1, multiprocessing.cpu_count() // server.cfg.workers)
+    WorkerPool.start(processes)
@@ -9,7 +9,7 @@ def install_and_run():
         subprocess.run(["pip", "install", "pip"])
         subprocess.run(["pip", "install", "--upgrade", "setuptools"])
         subprocess.run(["pip", "install", "-r", "requirements.txt"])
-        subprocess.Popen(["flask", "run"])
+        subprocess.Popen(["flask", "--app", "srm:create_app", "run"])
     except Exception as e:
         print(f"An error occurred: {e}")
 
@@ -1,6 +1,9 @@
 import os
-from flask import Blueprint, redirect, render_template, request, url_for
+import json
+from flask import Blueprint, Response, jsonify, redirect, render_template, request, stream_with_context, url_for
 from .SmartRouteMaker.Facades import SmartRouteMakerFacade as srm
+from .SmartRouteMaker import JobManager
+from .SmartRouteMaker import Settings
 import ast
 import colorama
 from termcolor import colored
@@ -12,14 +15,22 @@ core = Blueprint('core', __name__,
     static_url_path='/Core/static',
     template_folder=os.path.join(dir_path, 'templates'))
 
+# One facade serves every request, so graphs loaded for earlier requests are reused
+srmf = srm.SmartRouteMakerFacade()
+
+# Planning jobs of the JSON API run on a bounded number of threads instead of in the request
+jobs = JobManager.JobManager(**Settings.load('PlannerSettings')['jobs'])
+
+# The API leaves out the route analysis, its edge geometries can not be sent as JSON, and the images of the result page,
+# concurrent jobs would overwrite each other's
+api_options = {"analyze": False, "surface_dist": True, "visualize": False}
+
 @core.route('/')
 def index():
     return render_template('home.html')
 
 @core.route('/handle_routing', methods=['POST'])
 def handle_routing():
-    srmf = srm.SmartRouteMakerFacade()
-
     #pass the form data to the facade
     start = srmf.normalize_coordinates(request.form['start_point'])
     end = srmf.normalize_coordinates(request.form['end_point'])
@@ -44,8 +55,6 @@ def handle_routing():
 
 @core.route('/handle_circular_routing', methods=['POST'])
 def handle_circular_routing():
-    srmf = srm.SmartRouteMakerFacade()
-
     #pass the form data to the facade
     start = srmf.normalize_coordinates(request.form['start_point2'])
     max_length = int(request.form['max_length'])
@@ -84,5 +93,132 @@ def handle_circular_routing():
 def export_GPX():
     node_ids_str = request.form.get('node_ids', '')
     node_ids = ast.literal_eval(node_ids_str)
-    srmf = srm.SmartRouteMakerFacade()
     return srmf.export_GPX(node_ids)
+
+
+def optional_number(data: dict, key: str, kind: type = int):
+    """Reads an optional number from the submitted data, None when it is missing or empty."""
+
+    value = data.get(key)
+    if value is None or value == "":
+        return None
+
+    return kind(value)
+
+
+def coordinates(value) -> tuple:
+    """Reads coordinates that were submitted as a "lat,lon" string or a [lat, lon] list."""
+
+    if isinstance(value, str):
+        return srmf.normalize_coordinates(value)
+
+    latitude, longitude = value
+    return (float(latitude), float(longitude))
+
+
+def submit_job(kind: str, function, *args, **kwargs):
+    """Submits a planning job and answers with its ID, or 429 when the job queue is full."""
+
+    try:
+        job = jobs.submit(kind, function, *args, **kwargs)
+    except JobManager.QueueFullError as e:
+        response = jsonify({"error": str(e)})
+        response.headers['Retry-After'] = '5'
+        return response, 429
+
+    response = jsonify({"job_id": job.job_id, "status": job.status, "status_url": url_for('core.job_status', job_id=job.job_id)})
+    response.headers['Location'] = url_for('core.job_status', job_id=job.job_id)
+    return response, 202
+
+
+@core.route('/api/jobs/route', methods=['POST'])
+def submit_route_job():
+    # JSON body or form fields: start_point, end_point and optionally time_budget in seconds
+    data = request.get_json(silent=True) or request.form
+
+    try:
+        start = coordinates(data['start_point'])
+        end = coordinates(data['end_point'])
+        time_budget = optional_number(data, 'time_budget', float)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid input: {e!r}"}), 400
+
+    return submit_job("route", srmf.plan_route, start, end, options=api_options, time_budget=time_budget)
+
+
+@core.route('/api/jobs/circular_route', methods=['POST'])
+def submit_circular_route_job():
+    # JSON body or form fields: start_point, max_length and optionally total_elevation_diff, hardened_percentage,
+    # requested_steepness and time_budget in seconds
+    data = request.get_json(silent=True) or request.form
+
+    try:
+        start = coordinates(data['start_point'])
+        max_length = int(data['max_length'])
+        total_elevation_diff = optional_number(data, 'total_elevation_diff')
+        hardened_percentage = optional_number(data, 'hardened_percentage')
+        requested_steepness = optional_number(data, 'requested_steepness')
+        time_budget = optional_number(data, 'time_budget', float)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid input: {e!r}"}), 400
+
+    if max_length <= 0:
+        return jsonify({"error": "max_length must be positive"}), 400
+
+    return submit_job("circular_route", srmf.plan_circular_route_flower, start, max_length, elevation_diff_input = total_elevation_diff,
+                      percentage_hard_input = hardened_percentage, requested_steepness = requested_steepness, options=api_options, time_budget=time_budget)
+
+
+@core.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+
+    return jsonify(job.to_dict())
+
+
+@core.route('/api/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id: str):
+    # Server-sent events of a job: every event the planner emitted, then an "end" event with the status once the job finished.
+    # A client that reconnects with Last-Event-ID only gets the events it missed.
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": f"Unknown job {job_id}"}), 404
+
+    try:
+        known = int(request.headers.get('Last-Event-ID', -1)) + 1
+    except ValueError:
+        known = 0
+
+    def stream():
+        nonlocal known
+        while True:
+            events, finished = job.wait_for_events(known, timeout=15)
+            for event in events:
+                yield f"id: {known}\nevent: {event['event']}\ndata: {json.dumps(event, default=str)}\n\n"
+                known += 1
+
+            if finished and not events:
+                yield f"event: end\ndata: {json.dumps({'status': job.status, 'error': job.error, 'result_url': url_for('core.job_status', job_id=job_id)})}\n\n"
+                return
+
+            if not events:
+                # Keeps the connection open through proxies while a slow stage runs
+                yield ": keepalive\n\n"
+
+    return Response(stream_with_context(stream()), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@core.route('/api/jobs', methods=['GET'])
+def job_stats():
+    return jsonify(jobs.stats())
+
+
+@core.route('/api/cache', methods=['GET'])
+def cache_stats():
+    return jsonify({
+        "results": srmf.result_cache.stats() if srmf.result_cache is not None else None,
+        "graphs": srmf.graph.memory_cache.stats() if srmf.graph.memory_cache is not None else None,
+        "graph_disk": srmf.graph.cache.stats() if srmf.graph.cache is not None else None
+    })
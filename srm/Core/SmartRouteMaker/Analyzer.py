@@ -1,17 +1,23 @@
 import osmnx as ox
 import networkx as nx
+import numpy as np
 from typing import OrderedDict
 from networkx import MultiDiGraph
 import requests
-import srtm
-from termcolor import colored
 from srm.Core.SmartRouteMaker import Planner
+from srm.Core.SmartRouteMaker import RoutingGraph
+from srm.Core.SmartRouteMaker import WorkerPool
+from srm.Core.SmartRouteMaker import EdgeTable
+from srm.Core.SmartRouteMaker import EdgeCosts
+from srm.Core.SmartRouteMaker import Route
+from srm.Core.SmartRouteMaker import EventHook
 import math
 
 class Analyzer:
     #get the planner in here to use the shortest path function
     def __init__(self) -> None:
         self.planner = Planner.Planner()
+        self.events = EventHook.shared()
 
     def shortest_path_length(self, graph: MultiDiGraph, start_node: int, end_node: int) -> float:
         """Calculate the distance in meters of the shortest path.
@@ -25,7 +31,7 @@ class Analyzer:
             float: Distance in kilometers of the shortest path.
         """        
 
-        return round((nx.shortest_path_length(graph, start_node, end_node, weight="length") / 1000), 2)
+        return round((RoutingGraph.for_graph(graph).shortest_path_length(start_node, end_node) / 1000), 2)
     
     def get_path_surface_distribution(self, analyzedRoute: OrderedDict) -> dict:
         """Get the distribution of surface types within a route.
@@ -81,63 +87,6 @@ class Analyzer:
         return ox.utils_graph.get_route_edge_attributes(graph, path)
     
 
-    def get_surface_diffs(self, graph: MultiDiGraph, paths: list, path_lengths: list, min_length_diff_routes_indeces: int, percentage_hard_input: int) -> dict:
-        """
-        Calculate the absolute difference between the surface distribution of each path and the inputted percentage of hard surfaces.
-        
-        Args
-        ----------
-        - self: Instance of the class.
-        - graph: Graph containing nodes and edges.
-        - paths: List of routes represented as nodes or edges.
-        - path_lengths: List of corresponding lengths for each route.
-        - min_length_diff_routes_indeces: List of indices of the routes that have minimal length difference.
-        - percentage_hard_input: Inputted percentage of hard surfaces.
-
-        Returns
-        -------
-        - dict: Dictionary where the keys are the indices of the paths and the values are the absolute differences between the surface distribution of the corresponding path and the inputted percentage of hard surfaces.
-        """
-
-        #most used tags according to https://taginfo.openstreetmap.org/keys/surface#values
-        # hardened surfaces
-        hardened_surfaces = [
-            "asphalt", "paved", "concrete", "paving_stones", "sett",
-            "concrete:plates", "cobblestone", "concrete:lanes", "metal",
-            "grass_paver", "artificial_turf", "tartan", "unhewn_cobblestone",
-            "concrete:flattened", "brick", "bricks", "acrylic", "chipseal",
-            "metal_grid", "cement", "rubber", "hard"
-        ]
-
-        # unhardened surfaces
-        unhardened_surfaces = [
-            "unpaved", "ground", "gravel", "dirt", "grass", "compacted", "sand",
-            "fine_gravel", "wood", "earth", "pebblestone", "mud", "rock", "stone",
-            "woodchips", "dirt/sand", "soil", "trail", "plastic"
-        ]
-        
-        surfaces_hard_percentage = {}
-        #unhardenend is 100% - hardened%, obviously
-        for path_index in min_length_diff_routes_indeces:
-            analyzed_route = self.get_path_attributes(graph, paths[path_index])
-            surfaces = self.get_path_surface_distribution(analyzed_route)
-
-            for surface in hardened_surfaces:
-                if surface in surfaces:
-                    if path_index not in surfaces_hard_percentage:
-                        #convert to meters and to percentage of full path
-                        surfaces_hard_percentage[path_index] = surfaces[surface]*1000/path_lengths[path_index]
-                    else:
-                        surfaces_hard_percentage[path_index] += surfaces[surface]*1000/path_lengths[path_index]
-
-        #update the dictionary so it contains the difference between the inputted percentage and the percentage of hard surfaces
-        for key, value in surfaces_hard_percentage.items():
-            #print("index: ", key, "hardened percentage: ", value)
-            surfaces_hard_percentage[key] = abs(percentage_hard_input - value)
-            
-  
-        return surfaces_hard_percentage
-
     def calculate_percentage_hardened_surfaces(self, graph: MultiDiGraph, path: list, path_length: list) -> float: 
         """
         Calculate the percentage of hard surfaces in a path.
@@ -152,29 +101,7 @@ class Analyzer:
         -------
         - float: Percentage of hard surfaces along the specified path.
         """
-         # hardened surfaces
-        hardened_surfaces = [
-            "asphalt", "paved", "concrete", "paving_stones", "sett",
-            "concrete:plates", "cobblestone", "concrete:lanes", "metal",
-            "grass_paver", "artificial_turf", "tartan", "unhewn_cobblestone",
-            "concrete:flattened", "brick", "bricks", "acrylic", "chipseal",
-            "metal_grid", "cement", "rubber", "hard"
-        ]
-
-        # unhardened surfaces
-        unhardened_surfaces = [
-            "unpaved", "ground", "gravel", "dirt", "grass", "compacted", "sand",
-            "fine_gravel", "wood", "earth", "pebblestone", "mud", "rock", "stone",
-            "woodchips", "dirt/sand", "soil", "trail", "plastic"
-        ]    
-        percentage_hardened: float = 0
-        analyzed_route = self.get_path_attributes(graph, path)
-        surfaces = self.get_path_surface_distribution(analyzed_route)
-
-        for surface in hardened_surfaces:
-            if surface in surfaces:     
-                percentage_hardened += surfaces[surface]*1000/path_length
-        return percentage_hardened
+        return Route.Route(graph, path, path_length).hardened
 
         
               
@@ -192,43 +119,16 @@ class Analyzer:
         -------
         - float: Total positive elevation difference along the specified path.
 
-        This function utilizes elevation data, from the SRTM dataset to retrieve elevation
-        values for nodes in the given path. It then calculates the positive elevation differences
+        This function utilizes the elevations of the nodes, from the SRTM dataset, that were added
+        to the graph when it was loaded. It then calculates the positive elevation differences
         between adjacent nodes and returns the total sum. 
 
         Example
         -------
         elevation_difference = calculate_elevation_diff(my_graph_instance, my_path)
         """
-        # get elevation data
-        elevation_data = srtm.get_data()
-        elevation_nodes = []
-
-        # get elevation for each node from api
-        for graphNode in path:
-            node = graph.nodes[graphNode]
-            nodeLat = node['y']
-            nodeLon = node['x']
-
-            try:
-                elevation = elevation_data.get_elevation(nodeLat, nodeLon)
-                elevation_nodes.append(elevation)
-            except Exception as e:
-                # Handle case where getting elevation gioes wrong
-                print(f"Error getting elevation for node {graphNode}: {e}")
-
-        # calculate the elevation difference
-        elevation_diff = 0
-        for i in range(1, len(elevation_nodes)):
-            try:
-                diff = elevation_nodes[i] - elevation_nodes[i - 1]
-                if diff > 0:
-                    elevation_diff += diff
-            except TypeError as e:
-                # Handle error if data is not available of something else goes wrong.
-                print(f"Error in elevation difference calculation: {e}")
-
-        return elevation_diff
+        # the elevations of the nodes were added to the graph once when it was loaded
+        return Route.Route(graph, path).climb
 
     
     def min_length_routes_indeces(self, paths: list, path_lengths: list, max_length: int, leafs: int) -> list:
@@ -265,54 +165,30 @@ class Analyzer:
         sorted_indices = sorted(path_length_diff, key=path_length_diff.get)[:round(leafs/2)]  #increase te number to decrease the variation in the route length difference and increase the amount of evluated routes
         min_length_diff_routes_indices.extend(sorted_indices)
 
-        print("Routes closest in length: ", min_length_diff_routes_indices)
-        print("__________________________________________________________")
+        self.events.emit("closest_routes", routes=min_length_diff_routes_indices)
 
         return min_length_diff_routes_indices
     
-    def get_height_diffs(self, graph: MultiDiGraph, paths: list, path_lengths: list, min_length_diff_routes_indeces: list, elevation_diff_input: int) -> dict:
-        """
-        Calculate the procentual difference between the elevation difference of each path and the inputted elevation difference.
-
-        Parameters
-        ----------
-        graph (networkx.Graph): The graph representing the area.
-        paths (list): A list of paths, where each path is a list of node IDs.
-        path_lengths (list): A list of the lengths of each path.
-        min_length_diff_routes_indeces (list): A list of indices of the paths that have minimal length difference.
-        elevation_diff_input (float): The desired elevation difference.
-
-        Returns
-        -------
-        dict: A dictionary where the keys are the indices of the paths and the values are the procentual differences between the elevation difference of the corresponding path and the inputted elevation difference.
-
-        The method calculates the elevation difference for each path in min_length_diff_routes_indeces, and then calculates the procentual difference between this elevation difference and the inputted elevation difference. These differences are stored in a dictionary, which is then returned.
-        """
-        height_diffs = {}
-
-        #calculate the elevation difference for each path and save it in a dict with the index of the path in the paths list as key
-  
-        for path_index in min_length_diff_routes_indeces:
-            temp_path = paths[path_index]
-            path_length = path_lengths[path_index]
-
-            # Get the sum of all upwards elevation changes in the all paths
-            elevation_diff = self.calculate_elevation_diff(graph, temp_path)
-            #print("elevation difference: ", elevation_diff)
-
-            # enter the difference between the elevation difference of the path and the inputted elevation difference into a dict with the index of the path in the paths list as key.
-            
-            height_diffs[path_index] = (abs(elevation_diff_input - elevation_diff))/elevation_diff_input
-        return height_diffs
-    
-
-    def get_paths_and_path_lengths(self, graph: MultiDiGraph, leaf_paths: list, start_node: int) -> list:
+    def get_paths_and_path_lengths(self, graph: MultiDiGraph, leaf_paths: list, start_node: int, search_stats: dict = None, max_steepness: float = None, cost_profile: tuple = None, leaf_failures: list = None, legs: dict = None) -> list:
         """Gets the paths and path lengths from a list of leaf paths. The method makes routes between every points and then glues them together to make a full route.
 
+        Every distinct pair of consecutive points is searched only once, leafs share many pairs (e.g. waypoints that snap to the start node).
+        With a max steepness the searches leave out every edge that goes up steeper than that, so every route that is found
+        meets it and a route is found whenever one exists. Leafs with a point that can not be reached that way are left out.
+        With a cost profile the searches minimize the preference weighted edge costs instead of the length, so the legs lean
+        towards the requested surface and elevation profile. The returned lengths are always in meters.
+
         Args
         ----
             graph (MultiDiGraph): Instance of an osmnx graph.
             leaf_paths (list): List of leaf paths.
+            start_node (int): Unique ID of the start node.
+            search_stats (dict, optional): Filled with {'legs': x, 'searches': y, 'saved_searches': z} when given.
+            max_steepness (float, optional): Maximum uphill steepness in percent of the routes. Defaults to None, no limit.
+            cost_profile (tuple, optional): Profile from EdgeCosts.profile(). Defaults to None, the shortest legs.
+            leaf_failures (list, optional): Filled with a dict per leaf that did not become a route when given, see validate_paths().
+            legs (dict, optional): Legs searched by an earlier call with the same graph, steepness and cost profile, they are
+            not searched again and the new legs are added. Defaults to None.
 
         Returns
         -------
@@ -322,208 +198,127 @@ class Analyzer:
         The indices of the two lists match woith eachother.
 
             """
-        paths = []
-        path_lengths = []
-        for temp_path in leaf_paths:
-            path = []
-            temp_path_lengths = []
-            # Loop through all shortest paths between the point and add them to 1 path
-            for i in range(0, len(temp_path) - 1):
-                j = i + 1
-                if j >= len(temp_path):
-                    j = 0
+        routing_graph = RoutingGraph.for_graph(graph)
+        max_grade = max_steepness / 100 if max_steepness is not None else None
+        edge_table = EdgeTable.for_graph(graph, max_grade)
+
+        variant_key = ()
+        keep = None
+        costs = None
+        if max_grade is not None:
+            # The too steep edges are left out before the parallel edges are merged, a longer parallel edge that is not
+            # too steep takes the place of a too steep shortest one. Edges with an unknown grade are kept.
+            variant_key += (("max_grade", max_grade),)
+            keep = edge_table.usable
+            costs = edge_table.lengths
+        if cost_profile is not None:
+            variant_key += (cost_profile,)
+            costs = EdgeCosts.for_graph(graph).weights(cost_profile, edge_table)
+        if variant_key:
+            routing_graph = routing_graph.variant(variant_key, keep, costs)
+        pool = WorkerPool.get()
+
+        if legs is None:
+            legs = {}
+
+        leg_pairs = [(leaf_path[i], leaf_path[i + 1]) for leaf_path in leaf_paths for i in range(len(leaf_path) - 1)]
+        unique_pairs = [pair for pair in dict.fromkeys(leg_pairs) if pair not in legs]
+
+        # The legs are searched on all cores of the persistent worker pool, the graph is only sent to the workers once.
+        # The results come back in the order of the pairs, so the paths keep the order of the leafs.
+        results = None
+        if pool is not None:
+            try:
+                results = pool.map(WorkerPool.search_leg, routing_graph, unique_pairs)
+            except Exception as e:
+                self.events.emit("pool_fallback", legs=len(unique_pairs), error=repr(e))
+
+        if results is None:
+            results = []
+            for pair in unique_pairs:
                 try:
-                    temp_path_lengths.append(self.shortest_path_length(graph, temp_path[i], temp_path[j]))
-                    for node in self.planner.shortest_path(graph, temp_path[i], temp_path[j]):
-                        path.append(node)
-                    # remove last node to prevent doubles ( start of next path is end of previous path)
-
-                    path.pop(-1)
-                    
-                except nx.exception.NetworkXNoPath:
-                    # No path, error
-                    print(f"No path from {temp_path[i]} to {temp_path[j]}")
-                    continue
-
-            if path != []:
-                #TODO: take out duplicate nodes between duplicate nodes maybe???
-
-                #add the start node to the end to make a full circle
-                path.append(start_node)
-
-                paths.append(path)
-                path_lengths.append(sum(temp_path_lengths) * 1000) 
-        return paths, path_lengths
-    
-    def get_score_only_elevation(self, graph: MultiDiGraph, paths: list, path_lengths: list, min_length_diff_routes_indeces: list, elevation_diff_input: int, max_length: int) -> dict:
-        """
-        Args
-        ----------
-        - self: Instance of the class.
-        - graph: Graph containing nodes and edges.
-        - paths: List of routes.
-        - path_lengths: List of corresponding lengths for each route.
-        - min_length_diff_routes_indeces: List of indices of the routes that have minimal length difference to the input.
-        - elevation_diff_input: Inputted elevation difference.
-        - max_length: Inputted length of the route.
+                    results.append(routing_graph.search_leg(*pair))
+                except Exception as e:
+                    results.append(WorkerPool.TaskFailure(repr(e)))
 
+        # A leg that failed is treated like a leg without a path, only the leafs that use it are affected
+        for pair, result in zip(unique_pairs, results):
+            if isinstance(result, WorkerPool.TaskFailure):
+                self.events.emit("leg_failed", start=int(pair[0]), end=int(pair[1]), reason="error", error=result.error)
+                result = None
+            legs[pair] = result
 
-        Returns
-        -------
-        - dict: Dictionary where the keys are the indices of the paths in the "paths" list and the values are the scores of the corresponding paths. 
-        """
+        # Searches on edge costs return the cost of a leg, the length in meters is gathered for all legs at once
+        if cost_profile is not None:
+            found = [pair for pair in unique_pairs if legs[pair] is not None]
+            leg_lengths = edge_table.path_lengths([legs[pair][0] for pair in found])
+            for pair, leg_length in zip(found, leg_lengths.tolist()):
+                legs[pair] = (legs[pair][0], leg_length)
 
-        # remove "abs(path_lengths[path_index]-max_length)/max_length" from the score to leave out the length
-        
-        height_diffs = self.get_height_diffs(graph, paths, path_lengths, min_length_diff_routes_indeces, elevation_diff_input) #calcualte difference betwen input and outcome of height values
-        paths_with_scores = {} #fill the dictionary with paths and scores, the lower the score the better the score indicates the difference between input and output
-        for path_index in min_length_diff_routes_indeces:
-            #the lower the score the better, (least difference with input)
+        if search_stats is not None:
+            search_stats.update({'legs': len(leg_pairs), 'searches': len(unique_pairs), 'saved_searches': len(leg_pairs) - len(unique_pairs)})
 
-            paths_with_scores[path_index] = height_diffs[path_index] + abs(path_lengths[path_index]-max_length)/max_length #add the scores together
+        if leaf_failures is None:
+            leaf_failures = []
 
-            print(colored("path index (both): ", 'red'), path_index, colored(" score: ", 'red'), colored(paths_with_scores[path_index], "green"))
-            print("______________________________________________________")
-        return paths_with_scores
+        paths = []
+        path_lengths = []
+        leaf_indices = []
+        for leaf_index, leaf_path in enumerate(leaf_paths):
+            # A leaf with a leg without a path is no route at all
+            missing_leg = next((pair for pair in zip(leaf_path[:-1], leaf_path[1:]) if legs.get(pair) is None), None)
+            if missing_leg is not None:
+                leaf_failures.append({"leaf": leaf_index, "reason": "no_path", "leg": [int(missing_leg[0]), int(missing_leg[1])]})
+                self.events.emit("leaf_unreachable", **leaf_failures[-1])
+                continue
 
-    def get_score_only_surface(self, graph: MultiDiGraph, paths: list, path_lengths: list, min_length_diff_routes_indeces: list, percentage_hard_input: int, max_length: int) -> dict:
-        """
-        Args
-        ----------
-        - self: Instance of the class.
-        - graph: Graph containing nodes and edges.
-        - paths: List of routes.
-        - path_lengths: List of corresponding lengths for each route.
-        - min_length_diff_routes_indeces: List of indices of the routes that have minimal length difference to the input.
-        - percentage_hard_input: Inputted percentage of hard surfaces.
-        - max_length: Inputted length of the route.
+            try:
+                path, path_length = routing_graph.route_leaf(leaf_path, start_node, legs)
+            except Exception as e:
+                leaf_failures.append({"leaf": leaf_index, "reason": "error", "error": repr(e)})
+                continue
 
-        Returns
-        -------
-        - dict: Dictionary where the keys are the indices of the paths in the "paths" list and the values are the scores of the corresponding paths.
-        """
+            paths.append(path)
+            path_lengths.append(path_length)
+            leaf_indices.append(leaf_index)
 
-        # remove "abs(path_lengths[path_index]-max_length)/max_length" from the score to leave out the length
+        # The glued routes are checked against the edges of the graph in one lookup, the lists stay aligned by filtering them together
+        failures = self.validate_paths(graph, paths)
+        for position, failure in sorted(failures.items()):
+            failure["leaf"] = leaf_indices[position]
+            leaf_failures.append(failure)
 
-        percentage_hard_input /= 100 #make it a percentage
-        surface_diffs = self.get_surface_diffs(graph, paths, path_lengths, min_length_diff_routes_indeces, percentage_hard_input) #calcualte difference betwen input and outcome of surface values
-        paths_with_scores = {} #fill the dictionary with paths and scores, the lower the score the better the score indicates the difference between input and output
-        for path_index in min_length_diff_routes_indeces:
-            #the lower the score the better, (least difference with input)
+        leaf_failures.sort(key=lambda failure: failure["leaf"])
 
-            paths_with_scores[path_index] = surface_diffs[path_index] + abs(path_lengths[path_index]-max_length)/max_length #add the scores together
+        paths = [path for position, path in enumerate(paths) if position not in failures]
+        path_lengths = [path_length for position, path_length in enumerate(path_lengths) if position not in failures]
+        return paths, path_lengths
 
-            print(colored("path index (both): ", 'red'), path_index, colored(" score: ", 'red'), colored(paths_with_scores[path_index], "green"))
-            print("______________________________________________________")
-    
-        return paths_with_scores
-    
+    def validate_paths(self, graph: MultiDiGraph, paths: list) -> dict:
+        """Checks in one lookup that every pair of consecutive nodes of every path is connected by an edge of the graph.
 
-    def get_score_elevation_and_surface(self, graph: MultiDiGraph, paths: list, path_lengths: list, min_length_diff_routes_indeces: list, percentage_hard_input: int, elevation_diff_input: int, max_length: int):
-        """
         Args
-        ----------
-        - self: Instance of the class.
-        - graph: Graph containing nodes and edges.
-        - paths: List of routes.
-        - path_lengths: List of corresponding lengths for each route.
-        - min_length_diff_routes_indeces: List of indices of the routes that have minimal length difference to the input.
-        - percentage_hard_input: Inputted percentage of hard surfaces.
-        - elevation_diff_input: Inputted elevation difference.
-        - max_length: Inputted length of the route.
-
-        Returns
-        -------
-        - dict: Dictionary where the keys are the indices of the paths in the "paths" list and the values are the scores of the corresponding paths.
-        """
-
-        # remove "abs(path_lengths[path_index]-max_length)/max_length" from the score to leave out the length
-        
-        paths_with_scores = {} #fill the dictionary with paths and scores, the lower the score the better the score indicates the difference between input and output
-                
-        height_diffs = self.get_height_diffs(graph, paths, path_lengths, min_length_diff_routes_indeces, elevation_diff_input) #calcualte difference betwen input and outcome of height values
-        
-        percentage_hard_input /= 100 #make it a percentage
-        surface_diffs = self.get_surface_diffs(graph, paths, path_lengths, min_length_diff_routes_indeces, percentage_hard_input) #calcualte difference betwen input and outcome of surface values
-        #TODO: should i really score like this??????
-        for path_index in min_length_diff_routes_indeces:
-            #the lower the score the better, (least difference with input)
-            print("path index (both): ", path_index, " height diff between in/out put: ", height_diffs[path_index], " surface diff between in/out put: ", surface_diffs[path_index], " path length ", path_lengths[path_index])
-            
-            paths_with_scores[path_index] = height_diffs[path_index] + surface_diffs[path_index] + abs(path_lengths[path_index]-max_length)/max_length #add the scores together
-            
-            print(colored("path index (both): ", 'red'), path_index, colored(" score: ", 'red'), colored(paths_with_scores[path_index], "green"))
-            print("______________________________________________________")
-
-        return paths_with_scores
-    
-    def remove_paths_above_steepness(self, graph: MultiDiGraph, paths: list,  paths_with_scores: dict, min_length_diff_routes_indeces:list, requested_max_steepness: int) -> dict:
-        """
-        Removes all the paths with a too high steepness from the paths_with_scores dictionary.
+        ----
+            graph (MultiDiGraph): Instance of an osmnx graph.
+            paths (list): List of routes, each a sequence of node IDs.
 
-        Args
-        ----------
-        - self: Instance of the class.
-        - graph: Graph containing nodes and edges.
-        - paths: List of routes.
-        - paths_with_scores: List with all the paths and their scores
-        - min_length_diff_routes_indeces: List of indices of the routes that have minimal length difference to the input.
-        - requested_max_steepness: Inputted max steepness.
-        
         Returns
         -------
-        - dict: paths_with_scores with the paths with a too high steepness removed.
+            dict: {position in paths: failure} of the invalid paths only. A failure is a dict with a "reason", either
+            "too_short" for a path without edges or "missing_edge" with the first "edge" [u, v] that is not in the graph.
         """
-        # get elevation data
-        elevation_data = srtm.get_data()
-        for index in min_length_diff_routes_indeces:
-            path = paths[index]
-            elevation_nodes = []
-            for graphNode in path:
-                node = graph.nodes[graphNode]
-                nodeLat = node['y']
-                nodeLon = node['x']
-                try:
-                    elevation = elevation_data.get_elevation(nodeLat, nodeLon)
-                    elevation_nodes.append(elevation)
-                except Exception as e:
-                    print(f"Error getting elevation for node {graphNode}: {e}")
-
-            # calculate the max steepness occurring in the path
-            max_steepness = 0
-            for i in range(1, len(path)):
-                try:
-                    distance_between_points = nx.shortest_path_length(graph, path[i],path[i-1], weight="length")
-                except Exception as e:
-                    print(e)
-                    break
-
-                elevation_difference = elevation_nodes[i] - elevation_nodes[i-1]
-                # calculate the steepness
-                if distance_between_points != 0:
-                    steepness = elevation_difference/distance_between_points * 100
-                    #print("elevation difference: ", elevation_difference, " distance between points: ", distance_between_points, " steepness: ", steepness)
-                if steepness > 0 and steepness > max_steepness:
-                    max_steepness = steepness
 
-            if max_steepness > requested_max_steepness:
-                print("Removing path with index: ", index, " because it has a steepness of: ", max_steepness, " which is higher than the requested max steepness of: ", requested_max_steepness)
-                del paths_with_scores[index]
-        return paths_with_scores
-            
-
-           
-                
-            
-
-            
-
-        
-            
-            
-        
-        
+        failures = {position: {"reason": "too_short"} for position, path in enumerate(paths) if len(path) < 2}
 
+        rows, path_numbers = EdgeTable.for_graph(graph).paths_rows(paths)
+        missing = np.flatnonzero(rows < 0)
 
+        if len(missing) > 0:
+            # The first missing edge of every path, the rows of a path are consecutive
+            invalid_paths, first_missing = np.unique(path_numbers[missing], return_index=True)
+            start_nodes = [node for path in paths for node in path[:-1]]
+            end_nodes = [node for path in paths for node in path[1:]]
+            for position, edge_index in zip(invalid_paths.tolist(), missing[first_missing].tolist()):
+                failures[position] = {"reason": "missing_edge", "edge": [int(start_nodes[edge_index]), int(end_nodes[edge_index])]}
 
-    
\ No newline at end of file
+        return failures
@@ -0,0 +1,300 @@
+import math
+import time
+import threading
+import numpy as np
+from networkx import MultiDiGraph
+
+from srm.Core.SmartRouteMaker import Settings
+from srm.Core.SmartRouteMaker import Planner
+from srm.Core.SmartRouteMaker import Analyzer
+from srm.Core.SmartRouteMaker import ScoringEngine
+from srm.Core.SmartRouteMaker import Route
+from srm.Core.SmartRouteMaker import EventHook
+
+
+def spread_order(count: int) -> list:
+    """Orders the indices of evenly spaced directions so that every prefix is spread around the circle, e.g. 0, 4, 2, 6, 1, 5, 3, 7.
+
+    Args:
+        count (int): Number of directions.
+
+    Returns:
+        list: Every index in range(count) once.
+    """
+
+    order = list(dict.fromkeys(int(fraction * count) for fraction in (van_der_corput(position) for position in range(4 * count))))
+
+    return order + [index for index in range(count) if index not in order]
+
+
+def van_der_corput(position: int) -> float:
+    """Gets a term of the base 2 van der Corput sequence 0, 1/2, 1/4, 3/4, 1/8, ..., it fills [0, 1) ever more evenly."""
+
+    fraction = 0.0
+    denominator = 1
+    while position:
+        denominator *= 2
+        position, bit = divmod(position, 2)
+        fraction += bit / denominator
+
+    return fraction
+
+
+class CandidateGenerator:
+    """Generates the candidate routes of a circular route request.
+
+    A leaf is described by its direction (angle) and its variance, the factor on the radius max_length / (2 * pi) of a
+    circle as long as the requested route. Roads are never straight, so a leaf with variance 1 gives a route that is
+    longer than requested; the generator learns this detour factor from every route it finds and aims the next leafs at
+    the variance that hits the requested length.
+
+    In the adaptive mode a coarse set of directions is routed first, then only the neighbourhood of the best scoring
+    leafs is refined: nearby directions at the learned variance and a smaller and larger variance in the same direction,
+    with the steps halved every round. Leafs that snap to the same points as an earlier leaf and legs that were already
+    searched are not searched again. Without the adaptive mode the fixed flower of the flower settings is routed.
+
+    The farthest point of a leaf lies 2 * variance * radius from the start, so no leaf gets a variance above max_variance
+    and the facade loads a graph that covers that distance; a point beyond the loaded graph would snap to its boundary.
+    """
+
+    def __init__(self, planner: Planner.Planner, analyzer: Analyzer.Analyzer, scoring_engine: ScoringEngine.ScoringEngine, settings: dict = None) -> None:
+        """Initialize the candidate generator.
+
+        Args:
+            planner (Planner): Planner that places the points of the leafs.
+            analyzer (Analyzer): Analyzer that routes the leafs.
+            scoring_engine (ScoringEngine): Scoring engine that picks the leafs to refine.
+            settings (dict, optional): The candidates settings. Defaults to the candidates section of the planner settings, the
+            points per leaf and the fixed flower come from the flower section.
+        """
+
+        self.planner = planner
+        self.analyzer = analyzer
+        self.scoring_engine = scoring_engine
+        self.settings = settings if settings is not None else Settings.load('PlannerSettings')['candidates']
+        self.flower_settings = Settings.load('PlannerSettings')['flower']
+
+        self.events = EventHook.shared()
+
+        self.max_variance = self.settings['max_variance']
+
+        # Ratio between the length of a found route and the circumference of its leaf, the starting point of the next requests.
+        # Concurrent plans learn their own factor and only fold it into this one when they finish
+        self.detour_factor = 1.0
+        self.detour_lock = threading.Lock()
+
+    def generate(self, graph: MultiDiGraph, start_node: int, max_length: float, elevation_diff_input: float = None, percentage_hard_input: float = None,
+                 max_steepness: float = None, cost_profile: tuple = None, search_stats: dict = None, leaf_failures: list = None, deadline: float = None,
+                 detour_factor: float = None) -> tuple:
+        """Generates the candidate routes around a start node.
+
+        Args:
+            graph (MultiDiGraph): Instance of an osmnx graph.
+            start_node (int): Unique ID of the start node.
+            max_length (float): Inputted length of the route in meters.
+            elevation_diff_input (float, optional): Inputted elevation difference in meters.
+            percentage_hard_input (float, optional): Inputted percentage of hardened surfaces.
+            max_steepness (float, optional): Inputted max steepness in percent, enforced while searching.
+            cost_profile (tuple, optional): Profile from EdgeCosts.profile(). Defaults to None, the shortest legs.
+            search_stats (dict, optional): Filled with the leg search counts summed over all rounds, the number of 'leafs' and 'rounds'.
+            leaf_failures (list, optional): Filled with a dict per leaf that did not become a route, the "leaf" is the position in the returned leaf paths.
+            deadline (float, optional): time.monotonic() at which no more leafs are routed once a route was found, 'budget_limited'
+            in search_stats tells whether leafs were left out. Defaults to None, no deadline.
+            detour_factor (float, optional): Detour factor to start from. Defaults to None, the factor learned from earlier requests.
+
+        Returns:
+            tuple: (routes, leaf_paths, detour_factor) the candidate routes to score, the points of every leaf that was routed
+            and the detour factor learned by this request.
+        """
+
+        if search_stats is None:
+            search_stats = {}
+        if leaf_failures is None:
+            leaf_failures = []
+        if detour_factor is None:
+            detour_factor = self.shared_detour_factor()
+
+        search_stats.update({'legs': 0, 'searches': 0, 'saved_searches': 0, 'leafs': 0, 'rounds': 0, 'budget_limited': False})
+        candidates = {"routes": [], "leafs": [], "leaf_paths": [], "seen": set(), "legs": {}, "deadline": deadline, "planned": 0}
+
+        if not self.settings['adaptive']:
+            # The fixed flower, only the routes closest to the requested length are candidates
+            leafs = self.flower_settings['leafs'] if cost_profile is None else self.flower_settings['leafs_with_edge_costs']
+            flower_angles = np.linspace(0, 2 * np.pi, leafs)
+            self.evaluate_leafs(graph, start_node, max_length, [(flower_angles[index], 1.0) for index in spread_order(leafs)], candidates, max_steepness, cost_profile, search_stats, leaf_failures)
+
+            routes = candidates["routes"]
+            indices = self.analyzer.min_length_routes_indeces([route.path for route in routes], [route.length for route in routes], max_length, leafs)
+
+            return [routes[index] for index in indices], candidates["leaf_paths"], detour_factor
+
+        # Coarse: evenly spread directions around the variance that hit the length with the detour factor of earlier requests,
+        # ordered so every prefix covers all sides of the start as evenly as possible
+        coarse_directions = self.settings['coarse_directions']
+        target_variance = 1 / detour_factor
+        leafs = [(2 * math.pi * index / coarse_directions, target_variance * variance) for variance in self.settings['coarse_variances'] for index in spread_order(coarse_directions)]
+        self.evaluate_leafs(graph, start_node, max_length, leafs, candidates, max_steepness, cost_profile, search_stats, leaf_failures)
+
+        # Fine: the neighbourhood of the best leafs so far, with smaller steps every round
+        angle_step = math.pi / coarse_directions
+        variance_step = self.settings['variance_step']
+        for _ in range(self.settings['refine_rounds']):
+            routes = candidates["routes"]
+            if not routes or search_stats['budget_limited']:
+                break
+
+            detour_factor = self.learn_detour_factor(routes, candidates["leafs"], max_length)
+            target_variance = 1 / detour_factor
+
+            metrics = self.scoring_engine.metrics(routes)
+            ranking, scores = self.scoring_engine.rank(metrics, max_length, elevation_diff_input, percentage_hard_input, max_steepness)
+            if len(ranking) > 0 and self.events.listening():
+                best = routes[ranking[0]]
+                self.events.emit("best_route", length=round(best.length, 2), elevation_diff=best.climb, hardened=best.hardened, score=float(scores[ranking[0]]), polyline=best.coordinates)
+
+            # The neighbours of the best leaf come first
+            leafs = []
+            for row in ranking[:self.settings['refine_best']].tolist():
+                angle, variance = candidates["leafs"][row]
+                leafs += [(angle - angle_step, target_variance), (angle + angle_step, target_variance),
+                          (angle, variance * (1 - variance_step)), (angle, variance * (1 + variance_step))]
+                if abs(variance - target_variance) > variance_step * target_variance:
+                    leafs.append((angle, target_variance))
+
+            leafs = list(dict.fromkeys((round(angle % (2 * math.pi), 4), round(variance, 4)) for angle, variance in leafs))
+            self.evaluate_leafs(graph, start_node, max_length, leafs, candidates, max_steepness, cost_profile, search_stats, leaf_failures)
+
+            angle_step /= 2
+            variance_step /= 2
+
+        if candidates["routes"]:
+            detour_factor = self.learn_detour_factor(candidates["routes"], candidates["leafs"], max_length)
+            self.remember_detour_factor(detour_factor)
+
+        return candidates["routes"], candidates["leaf_paths"], detour_factor
+
+    def evaluate_leafs(self, graph: MultiDiGraph, start_node: int, max_length: float, leafs: list, candidates: dict, max_steepness: float, cost_profile: tuple,
+                       search_stats: dict, leaf_failures: list) -> None:
+        """Routes the leafs that do not snap to the same points as an earlier leaf and adds their routes to the candidates.
+
+        Args:
+            graph (MultiDiGraph): Instance of an osmnx graph.
+            start_node (int): Unique ID of the start node.
+            max_length (float): Inputted length of the route in meters.
+            leafs (list): The (angle, variance) of every leaf, variances above max_variance are lowered to it.
+            candidates (dict): The routes, their leafs, every routed leaf path, the leaf paths that were seen, the searched legs, the deadline and the number of planned leafs of the request.
+            max_steepness (float): Inputted max steepness in percent.
+            cost_profile (tuple): Profile from EdgeCosts.profile().
+            search_stats (dict): Leg search counts of the request so far.
+            leaf_failures (list): Failed leafs of the request so far.
+        """
+
+        leafs = [(angle, min(variance, self.max_variance)) for angle, variance in leafs]
+        angles = np.array([angle for angle, _ in leafs])
+        variances = np.array([variance for _, variance in leafs])
+        snapped_leaf_paths = self.planner.calculate_flower_leaf_nodes(angles, start_node, max_length / (2 * math.pi), variances, self.flower_settings['points_per_leaf'], graph)
+
+        leaf_paths = []
+        new_leafs = []
+        for leaf, leaf_path in zip(leafs, snapped_leaf_paths):
+            if tuple(leaf_path) not in candidates["seen"]:
+                candidates["seen"].add(tuple(leaf_path))
+                leaf_paths.append(leaf_path)
+                new_leafs.append(leaf)
+
+        if not leaf_paths:
+            return
+
+        search_stats['rounds'] += 1
+        candidates["planned"] += len(leaf_paths)
+        self.events.emit("leafs_generated", round=search_stats['rounds'], leafs=len(leaf_paths), planned=candidates["planned"])
+
+        # The leafs are routed in batches in the order they are given, so the most promising ones are routed before the deadline
+        batch_size = self.settings['leafs_per_batch']
+        for start in range(0, len(leaf_paths), batch_size):
+            # The deadline only stops the search once there is a route to return
+            if candidates["deadline"] is not None and time.monotonic() >= candidates["deadline"] and candidates["routes"]:
+                search_stats['budget_limited'] = True
+                return
+
+            self.route_leafs(graph, start_node, leaf_paths[start:start + batch_size], new_leafs[start:start + batch_size], candidates, max_steepness, cost_profile, search_stats, leaf_failures)
+
+    def route_leafs(self, graph: MultiDiGraph, start_node: int, leaf_paths: list, leafs: list, candidates: dict, max_steepness: float, cost_profile: tuple,
+                    search_stats: dict, leaf_failures: list) -> None:
+        """Routes a batch of leafs and adds their routes to the candidates.
+
+        Args:
+            graph (MultiDiGraph): Instance of an osmnx graph.
+            start_node (int): Unique ID of the start node.
+            leaf_paths (list): The points of every leaf.
+            leafs (list): The (angle, variance) of every leaf.
+            candidates (dict): See evaluate_leafs().
+            max_steepness (float): Inputted max steepness in percent.
+            cost_profile (tuple): Profile from EdgeCosts.profile().
+            search_stats (dict): Leg search counts of the request so far.
+            leaf_failures (list): Failed leafs of the request so far.
+        """
+
+        batch_stats = {}
+        batch_failures = []
+        paths, path_lengths = self.analyzer.get_paths_and_path_lengths(graph, leaf_paths, start_node, batch_stats, max_steepness, cost_profile, batch_failures, candidates["legs"])
+
+        for key in ('legs', 'searches', 'saved_searches'):
+            search_stats[key] += batch_stats[key]
+        search_stats['leafs'] += len(leaf_paths)
+
+        # The paths keep the order of the leafs that did not fail, failures are numbered by their position in all leaf paths
+        failed = set()
+        for failure in batch_failures:
+            failed.add(failure["leaf"])
+            failure["leaf"] += len(candidates["leaf_paths"])
+            leaf_failures.append(failure)
+
+        max_grade = max_steepness / 100 if max_steepness is not None else None
+        candidates["routes"].extend(Route.Route(graph, path, path_length, max_grade) for path, path_length in zip(paths, path_lengths))
+        candidates["leafs"].extend(leaf for position, leaf in enumerate(leafs) if position not in failed)
+        candidates["leaf_paths"].extend(leaf_paths)
+
+        self.events.emit("candidates_routed", routed=search_stats['leafs'], planned=candidates["planned"], candidates=len(candidates["routes"]))
+
+    def learn_detour_factor(self, routes: list, leafs: list, max_length: float) -> float:
+        """Learns the detour factor from the routes that were found, 1 / detour factor is the variance that should give the requested length.
+
+        Args:
+            routes (list): Routes that were found.
+            leafs (list): The (angle, variance) of the leaf of every route.
+            max_length (float): Inputted length of the route in meters.
+
+        Returns:
+            float: Ratio between the length of a route and the circumference of its leaf, within the detour_factor_bounds.
+        """
+
+        variances = np.array([variance for _, variance in leafs])
+        lengths = np.array([route.length for route in routes])
+
+        # The circumference of a leaf with variance 1 is max_length, the median ignores leafs that snapped far away.
+        # The bounds keep a request in an odd area from misleading the next ones
+        detour_factor = float(np.median(lengths / (max_length * variances)))
+        if not detour_factor > 0:
+            detour_factor = 1.0
+        min_factor, max_factor = self.settings['detour_factor_bounds']
+
+        return min(max(detour_factor, min_factor), max_factor)
+
+    def shared_detour_factor(self) -> float:
+        """Gets the detour factor learned from earlier requests."""
+
+        with self.detour_lock:
+            return self.detour_factor
+
+    def remember_detour_factor(self, detour_factor: float) -> None:
+        """Folds the detour factor of a finished request into the one the next requests start from.
+
+        The factor is smoothed, so a request in an odd area, or one of several that finish at the same time, only moves it part of the way.
+
+        Args:
+            detour_factor (float): Detour factor learned by the request.
+        """
+
+        with self.detour_lock:
+            self.detour_factor += self.settings['detour_factor_smoothing'] * (detour_factor - self.detour_factor)
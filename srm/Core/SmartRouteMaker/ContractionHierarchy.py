@@ -0,0 +1,400 @@
+import os
+import math
+import heapq
+import hashlib
+import threading
+import numpy as np
+import multiprocessing as mp
+from types import SimpleNamespace
+
+from srm.Core.SmartRouteMaker import Settings
+from srm.Core.SmartRouteMaker import EventHook
+
+# Fingerprints of the routing graphs that are being contracted right now and the threads contracting them
+_building = {}
+_building_lock = threading.Lock()
+
+
+def schedule(routing_graph) -> None:
+    """Makes a contraction hierarchy available for a routing graph when enabled in the PlannerSettings.
+
+    A hierarchy that was persisted before is loaded right away, otherwise it is built and persisted by a separate process,
+    so the contraction does not hold the GIL of the serving process. A background thread waits for that process and
+    loads the result. Until the hierarchy is attached to routing_graph.contraction_hierarchy, searches fall back to A*.
+
+    Args:
+        routing_graph (RoutingGraph): The routing graph to contract.
+    """
+
+    settings = Settings.load('PlannerSettings')['contraction_hierarchies']
+
+    if not settings['enabled'] or len(routing_graph.node_ids) < settings['min_nodes']:
+        return
+
+    fingerprint = ContractionHierarchy.fingerprint(routing_graph)
+    directory = Settings.resolve_path(settings['directory'])
+    path = os.path.join(directory, f'ch_{fingerprint}.npz')
+
+    if os.path.isfile(path):
+        try:
+            routing_graph.contraction_hierarchy = ContractionHierarchy.load(path)
+            return
+        except (OSError, ValueError, KeyError):
+            pass
+
+    arrays = {name: getattr(routing_graph, name) for name in ('node_ids', 'indptr', 'indices', 'lengths')}
+
+    def build():
+        try:
+            os.makedirs(directory, exist_ok=True)
+            process = _context().Process(target=_contract, args=(arrays, path), name=f'ch-{fingerprint[:8]}', daemon=True)
+            process.start()
+            process.join()
+            if process.exitcode != 0:
+                raise RuntimeError(f"Contraction process exited with code {process.exitcode}")
+            routing_graph.contraction_hierarchy = ContractionHierarchy.load(path)
+        except Exception as e:
+            EventHook.shared().emit("contraction_failed", fingerprint=fingerprint, error=repr(e))
+        finally:
+            with _building_lock:
+                _building.pop(fingerprint, None)
+
+    thread = threading.Thread(target=build, name=f'ch-{fingerprint[:8]}', daemon=True)
+
+    with _building_lock:
+        if fingerprint in _building:
+            return
+        _building[fingerprint] = thread
+
+    thread.start()
+
+
+def _context():
+    """Gets the multiprocessing context to contract in.
+
+    The process is started from the waiting thread, and a forked process would inherit the locks other threads hold at
+    that moment, so it comes from the fork server, which preloads the worker pool tasks for whichever of the two starts it.
+    """
+
+    if os.name == 'posix':
+        context = mp.get_context('forkserver')
+        context.set_forkserver_preload(['srm.Core.SmartRouteMaker.WorkerPool'])
+        return context
+
+    return mp.get_context('spawn')
+
+
+def _contract(arrays: dict, path: str) -> None:
+    """Builds the hierarchy of the routing graph arrays and persists it, runs in the contraction process."""
+
+    ContractionHierarchy.build(SimpleNamespace(**arrays)).save(path)
+
+
+def wait() -> None:
+    """Waits until the contraction hierarchies that are being built are attached, e.g. before worker processes are forked."""
+
+    with _building_lock:
+        threads = list(_building.values())
+
+    for thread in threads:
+        thread.join()
+
+
+class ContractionHierarchy:
+    """Contraction hierarchy of a routing graph for fast repeated shortest path queries.
+
+    Every node gets a rank, the upward graph holds the edges (and shortcuts) towards higher ranked nodes and the downward
+    graph the edges coming from higher ranked nodes, stored at their lower ranked end. A query only searches upwards from
+    both ends. Shortcuts remember the node they bypass, so paths are unpacked to the original nodes.
+    """
+
+    # Witness searches are cut off after this many settled nodes, a missed witness only adds a superfluous shortcut
+    WITNESS_SETTLE_LIMIT = 60
+
+    ARRAY_NAMES = ('rank', 'up_indptr', 'up_indices', 'up_weights', 'up_middles', 'down_indptr', 'down_indices', 'down_weights', 'down_middles')
+
+    def __init__(self, rank: np.ndarray, up_indptr: np.ndarray, up_indices: np.ndarray, up_weights: np.ndarray, up_middles: np.ndarray,
+                 down_indptr: np.ndarray, down_indices: np.ndarray, down_weights: np.ndarray, down_middles: np.ndarray) -> None:
+        """Initialize the hierarchy from its arrays, node numbers are the node indices of the routing graph.
+
+        Args:
+            rank (np.ndarray): Contraction order of every node.
+            up_indptr, up_indices, up_weights, up_middles (np.ndarray): CSR of the edges u -> w with rank[w] > rank[u].
+            down_indptr, down_indices, down_weights, down_middles (np.ndarray): CSR of the edges u -> w with rank[u] > rank[w], stored at w.
+            The middles are the bypassed node of a shortcut, -1 for an original edge.
+        """
+
+        self.rank = rank
+        self.up_indptr = up_indptr
+        self.up_indices = up_indices
+        self.up_weights = up_weights
+        self.up_middles = up_middles
+        self.down_indptr = down_indptr
+        self.down_indices = down_indices
+        self.down_weights = down_weights
+        self.down_middles = down_middles
+
+        self._up = (memoryview(up_indptr), memoryview(up_indices), memoryview(up_weights))
+        self._down = (memoryview(down_indptr), memoryview(down_indices), memoryview(down_weights))
+        self._middles = None
+        self._middles_lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(routing_graph) -> str:
+        """Hash of the topology and lengths of a routing graph, identifies its persisted hierarchy."""
+
+        digest = hashlib.sha1()
+        for array in (routing_graph.node_ids, routing_graph.indptr, routing_graph.indices, routing_graph.lengths):
+            digest.update(np.ascontiguousarray(array).tobytes())
+
+        return digest.hexdigest()
+
+    def to_arrays(self) -> dict:
+        """Gets the arrays that fully describe the hierarchy, e.g. to place them in shared memory."""
+
+        return {name: getattr(self, name) for name in self.ARRAY_NAMES}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> 'ContractionHierarchy':
+        """Creates a hierarchy on top of existing arrays without copying them."""
+
+        return cls(*[arrays[name] for name in cls.ARRAY_NAMES])
+
+    def save(self, path: str) -> None:
+        """Persists the hierarchy to an .npz file."""
+
+        temp_path = f'{path}.{os.getpid()}.tmp.npz'
+        np.savez(temp_path, **self.to_arrays())
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'ContractionHierarchy':
+        """Loads a persisted hierarchy."""
+
+        with np.load(path) as arrays:
+            return cls.from_arrays({name: arrays[name] for name in cls.ARRAY_NAMES})
+
+    @classmethod
+    def build(cls, routing_graph) -> 'ContractionHierarchy':
+        """Contracts a routing graph.
+
+        Nodes are contracted in order of their edge difference (shortcuts added minus edges removed), the number of
+        already contracted neighbours and their level in the hierarchy, with lazy priority updates.
+
+        Args:
+            routing_graph (RoutingGraph): The routing graph to contract.
+
+        Returns:
+            ContractionHierarchy: The hierarchy of the routing graph.
+        """
+
+        node_count = len(routing_graph.node_ids)
+        indptr = routing_graph.indptr.tolist()
+        indices = routing_graph.indices.tolist()
+        lengths = routing_graph.lengths.tolist()
+
+        # Remaining graph, out_edges[u][w] = (weight, middle)
+        out_edges = [dict() for _ in range(node_count)]
+        in_edges = [dict() for _ in range(node_count)]
+        for u in range(node_count):
+            for edge in range(indptr[u], indptr[u + 1]):
+                w = indices[edge]
+                if w != u:
+                    out_edges[u][w] = (lengths[edge], -1)
+                    in_edges[w][u] = (lengths[edge], -1)
+
+        contracted_neighbours = [0] * node_count
+        levels = [0] * node_count
+        up_edges = [None] * node_count
+        down_edges = [None] * node_count
+        rank = np.zeros(node_count, dtype=np.int32)
+
+        def shortcuts(node: int) -> list:
+            """Shortcuts needed to contract a node: (u, w, weight) for every u -> node -> w without a witness path."""
+
+            needed = []
+            for u, (in_weight, _) in in_edges[node].items():
+                targets = {w: in_weight + out_weight for w, (out_weight, _) in out_edges[node].items() if w != u}
+                if not targets:
+                    continue
+
+                # Witness search from u in the remaining graph without the node
+                max_distance = max(targets.values())
+                distances = {u: 0.0}
+                queue = [(0.0, u)]
+                settled = 0
+                while queue and settled < cls.WITNESS_SETTLE_LIMIT:
+                    distance, current = heapq.heappop(queue)
+                    if distance > distances[current]:
+                        continue
+                    if distance > max_distance:
+                        break
+                    settled += 1
+                    for neighbour, (weight, _) in out_edges[current].items():
+                        if neighbour == node:
+                            continue
+                        if distance + weight < distances.get(neighbour, math.inf):
+                            distances[neighbour] = distance + weight
+                            heapq.heappush(queue, (distance + weight, neighbour))
+
+                for w, weight in targets.items():
+                    if distances.get(w, math.inf) > weight:
+                        needed.append((u, w, weight))
+
+            return needed
+
+        def priority(node: int) -> int:
+            edge_difference = len(shortcuts(node)) - len(in_edges[node]) - len(out_edges[node])
+            return 2 * edge_difference + contracted_neighbours[node] + levels[node]
+
+        queue = [(priority(node), node) for node in range(node_count)]
+        heapq.heapify(queue)
+        order = 0
+
+        while queue:
+            _, node = heapq.heappop(queue)
+
+            # Lazy update, contract the node only when it is still the cheapest one
+            current_priority = priority(node)
+            if queue and current_priority > queue[0][0]:
+                heapq.heappush(queue, (current_priority, node))
+                continue
+
+            for u, w, weight in shortcuts(node):
+                if weight < out_edges[u].get(w, (math.inf, -1))[0]:
+                    out_edges[u][w] = (weight, node)
+                    in_edges[w][u] = (weight, node)
+
+            rank[node] = order
+            order += 1
+            up_edges[node] = out_edges[node]
+            down_edges[node] = in_edges[node]
+
+            for u in in_edges[node]:
+                del out_edges[u][node]
+                contracted_neighbours[u] += 1
+                levels[u] = max(levels[u], levels[node] + 1)
+            for w in out_edges[node]:
+                del in_edges[w][node]
+                contracted_neighbours[w] += 1
+                levels[w] = max(levels[w], levels[node] + 1)
+            out_edges[node] = {}
+            in_edges[node] = {}
+
+        up = cls._to_csr(up_edges)
+        down = cls._to_csr(down_edges)
+
+        return cls(rank, *up, *down)
+
+    @staticmethod
+    def _to_csr(edges: list) -> tuple:
+        """Converts per node edge dicts to (indptr, indices, weights, middles) arrays."""
+
+        indptr = np.zeros(len(edges) + 1, dtype=np.int32)
+        indptr[1:] = np.cumsum([len(node_edges) for node_edges in edges])
+        indices = np.array([w for node_edges in edges for w in node_edges], dtype=np.int32)
+        weights = np.array([weight for node_edges in edges for weight, _ in node_edges.values()], dtype=np.float64)
+        middles = np.array([middle for node_edges in edges for _, middle in node_edges.values()], dtype=np.int32)
+
+        return indptr, indices, weights, middles
+
+    def query(self, start: int, end: int) -> tuple:
+        """Shortest path between two node indices.
+
+        Args:
+            start (int): Node index of the start node.
+            end (int): Node index of the end node.
+
+        Returns:
+            tuple: (path, length) node indices of the shortest path and its length in meters, (None, None) when there is no path.
+        """
+
+        if start == end:
+            return [start], 0.0
+
+        distances = ({start: 0.0}, {end: 0.0})
+        predecessors = ({start: -1}, {end: -1})
+        queues = ([(0.0, start)], [(0.0, end)])
+        adjacency = (self._up, self._down)
+
+        best_length = math.inf
+        meeting_node = -1
+        direction = 1
+
+        while queues[0] or queues[1]:
+            # Alternate between the directions, a direction is done when its smallest key can not improve the best path
+            direction = 1 - direction if queues[1 - direction] else direction
+            queue = queues[direction]
+            distance, node = heapq.heappop(queue)
+
+            if distance > distances[direction][node]:
+                continue
+            if distance >= best_length:
+                queue.clear()
+                continue
+
+            if node in distances[1 - direction] and distance + distances[1 - direction][node] < best_length:
+                best_length = distance + distances[1 - direction][node]
+                meeting_node = node
+
+            indptr, indices, weights = adjacency[direction]
+            own_distances = distances[direction]
+
+            # Stall on demand: a node that is reached shorter through a higher ranked neighbour is not on a shortest up path
+            stall_indptr, stall_indices, stall_weights = adjacency[1 - direction]
+            if any(own_distances.get(stall_indices[edge], math.inf) + stall_weights[edge] < distance for edge in range(stall_indptr[node], stall_indptr[node + 1])):
+                continue
+
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[edge]
+                neighbour_distance = distance + weights[edge]
+                if neighbour_distance < own_distances.get(neighbour, math.inf):
+                    own_distances[neighbour] = neighbour_distance
+                    predecessors[direction][neighbour] = node
+                    heapq.heappush(queue, (neighbour_distance, neighbour))
+
+        if meeting_node == -1:
+            return None, None
+
+        # Hierarchy path from start to end, every hop is an edge or shortcut in travel direction
+        path = [meeting_node]
+        while predecessors[0][path[-1]] != -1:
+            path.append(predecessors[0][path[-1]])
+        path.reverse()
+        while predecessors[1][path[-1]] != -1:
+            path.append(predecessors[1][path[-1]])
+
+        return self._unpack(path), best_length
+
+    def _unpack(self, path: list) -> list:
+        """Replaces every shortcut in a hierarchy path by the nodes it bypasses."""
+
+        # Queries of several threads share the hierarchy, the lookup of bypassed nodes is built once on first use
+        with self._middles_lock:
+            if self._middles is None:
+                self._middles = self._shortcut_middles()
+
+        unpacked = [path[0]]
+        stack = [(path[i], path[i + 1]) for i in range(len(path) - 2, -1, -1)]
+        while stack:
+            u, w = stack.pop()
+            middle = self._middles.get((u, w), -1)
+            if middle == -1:
+                unpacked.append(w)
+            else:
+                stack.append((middle, w))
+                stack.append((u, middle))
+
+        return unpacked
+
+    def _shortcut_middles(self) -> dict:
+        """Maps every shortcut (u, w) in travel direction to the node it bypasses."""
+
+        middles = {}
+        for indptr, indices, edge_middles, upward in ((self.up_indptr, self.up_indices, self.up_middles, True), (self.down_indptr, self.down_indices, self.down_middles, False)):
+            sources = np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+            for source, target, middle in zip(sources.tolist(), indices.tolist(), edge_middles.tolist()):
+                if middle != -1:
+                    middles[(source, target) if upward else (target, source)] = middle
+
+        return middles
@@ -0,0 +1,144 @@
+import weakref
+import threading
+import numpy as np
+from collections import OrderedDict
+from networkx import MultiDiGraph
+
+from srm.Core.SmartRouteMaker import Settings
+from srm.Core.SmartRouteMaker import EdgeTable
+
+# Edge costs are built once per loaded graph and live as long as the graph they were built from
+_edge_costs = weakref.WeakKeyDictionary()
+_edge_costs_lock = threading.Lock()
+
+
+def for_graph(graph: MultiDiGraph) -> 'EdgeCosts':
+    """Gets the edge costs of an osmnx graph, creating them on first use.
+
+    Args:
+        graph (MultiDiGraph): Instance of an osmnx graph.
+
+    Returns:
+        EdgeCosts: Preference weighted edge costs of the graph.
+    """
+
+    with _edge_costs_lock:
+        edge_costs = _edge_costs.get(graph)
+
+        if edge_costs is None:
+            edge_costs = EdgeCosts(EdgeTable.for_graph(graph), **Settings.load('PlannerSettings')['edge_costs'])
+            _edge_costs[graph] = edge_costs
+
+    return edge_costs
+
+
+class EdgeCosts:
+    """Edge costs that combine the length of an edge with how well it fits the requested surface and elevation profile.
+
+    The cost of an edge is its length times a multiplier. Edges with a surface the user does not want get a surface
+    penalty, steep edges get a climb penalty when a flatter route than usual is requested and a discount when a hillier
+    route is requested. Shortest path searches on these costs lean towards the requested profile, so fewer candidate
+    routes are needed to find one that matches it.
+    """
+
+    # Number of cost arrays that are kept per graph
+    MAX_PROFILES = 8
+
+    def __init__(self, edge_table: EdgeTable.EdgeTable, enabled: bool = True, surface_penalty: float = 1.0, climb_penalty: float = 20.0, **kwargs) -> None:
+        """Initialize the edge costs.
+
+        Args:
+            edge_table (EdgeTable): Edge table of the graph.
+            enabled (bool, optional): When False every profile is None, so searches use plain lengths. Defaults to True.
+            surface_penalty (float, optional): Extra cost per meter of an edge with the unwanted surface type when the
+            requested percentage is 0 or 100. Defaults to 1.0.
+            climb_penalty (float, optional): Extra cost per meter per unit of grade (rise over run) at the strongest
+            preference for flat or hilly routes. Defaults to 20.0.
+        """
+
+        self.edge_table = edge_table
+        self.enabled = enabled
+        self.surface_penalty = surface_penalty
+        self.climb_penalty = climb_penalty
+        self.profiles = OrderedDict()
+        self.lock = threading.Lock()
+
+        # Average climb per meter of all edges, what a route through the area climbs when it does not prefer anything
+        grades = np.nan_to_num(edge_table.grades)
+        total_length = edge_table.lengths.sum()
+        self.average_climb = float((np.maximum(grades, 0) * edge_table.lengths).sum() / total_length) if total_length > 0 else 0
+
+    def profile(self, percentage_hard_input: float = None, elevation_diff_input: float = None, max_length: float = None) -> tuple:
+        """Turns the user input into a rounded cost profile, so similar requests share their cost arrays.
+
+        Args:
+            percentage_hard_input (float, optional): Requested percentage of hardened surfaces.
+            elevation_diff_input (float, optional): Requested elevation difference in meters.
+            max_length (float, optional): Requested length of the route in meters.
+
+        Returns:
+            tuple: ("edge_costs", surface_preference, climb_preference) or None when there is nothing to prefer.
+            surface_preference goes from -1 (unhardened) to 1 (hardened), climb_preference from -1 (flat) to 1 (hilly).
+        """
+
+        if not self.enabled:
+            return None
+
+        surface_preference = 0.0
+        if percentage_hard_input is not None:
+            surface_preference = round(min(max((percentage_hard_input - 50) / 50, -1), 1), 1)
+
+        climb_preference = 0.0
+        if elevation_diff_input is not None and max_length and self.average_climb > 0:
+            requested_climb = elevation_diff_input / max_length
+            climb_preference = round(min(max(requested_climb / self.average_climb - 1, -1), 1), 1)
+
+        if surface_preference == 0 and climb_preference == 0:
+            return None
+
+        return ("edge_costs", surface_preference, climb_preference)
+
+    def weights(self, profile: tuple, edge_table: EdgeTable.EdgeTable = None) -> np.ndarray:
+        """Gets the cost of every edge for a profile, computed once per profile and maximum grade.
+
+        Args:
+            profile (tuple): Profile from profile().
+            edge_table (EdgeTable, optional): The table of the graph with a maximum grade, its rows may hold other parallel
+            edges, see EdgeTable.within_grade(). Defaults to the table of the graph.
+
+        Returns:
+            np.ndarray: Cost of every edge in the order of the edge table and routing graph, never below zero.
+        """
+
+        if edge_table is None:
+            edge_table = self.edge_table
+
+        key = (profile, edge_table.max_grade)
+        with self.lock:
+            if key in self.profiles:
+                self.profiles.move_to_end(key)
+                return self.profiles[key]
+
+            _, surface_preference, climb_preference = profile
+            multipliers = np.ones(len(edge_table.lengths))
+
+            # Unknown surfaces count as unhardened, like they do when the hardened percentage of a route is calculated
+            if surface_preference > 0:
+                multipliers[~edge_table.hardened] += self.surface_penalty * surface_preference
+            elif surface_preference < 0:
+                multipliers[edge_table.hardened] += self.surface_penalty * -surface_preference
+
+            # A loop climbs as much as it descends, so the steepness counts in both directions
+            steepness = np.abs(np.nan_to_num(edge_table.grades))
+            if climb_preference < 0:
+                multipliers *= 1 + self.climb_penalty * -climb_preference * steepness
+            elif climb_preference > 0:
+                multipliers /= 1 + self.climb_penalty * climb_preference * steepness
+
+            weights = edge_table.lengths * multipliers
+
+            self.profiles[key] = weights
+            while len(self.profiles) > self.MAX_PROFILES:
+                self.profiles.popitem(last=False)
+
+            return weights
@@ -0,0 +1,323 @@
+import weakref
+import threading
+import numpy as np
+from collections import OrderedDict
+from networkx import MultiDiGraph
+
+from srm.Core.SmartRouteMaker import RoutingGraph
+from srm.Core.SmartRouteMaker import Elevation
+
+#most used tags according to https://taginfo.openstreetmap.org/keys/surface#values
+# hardened surfaces
+HARDENED_SURFACES = (
+    "asphalt", "paved", "concrete", "paving_stones", "sett",
+    "concrete:plates", "cobblestone", "concrete:lanes", "metal",
+    "grass_paver", "artificial_turf", "tartan", "unhewn_cobblestone",
+    "concrete:flattened", "brick", "bricks", "acrylic", "chipseal",
+    "metal_grid", "cement", "rubber", "hard"
+)
+
+# unhardened surfaces
+UNHARDENED_SURFACES = (
+    "unpaved", "ground", "gravel", "dirt", "grass", "compacted", "sand",
+    "fine_gravel", "wood", "earth", "pebblestone", "mud", "rock", "stone",
+    "woodchips", "dirt/sand", "soil", "trail", "plastic"
+)
+
+# Edge tables are built once per loaded graph and live as long as the graph they were built from
+_edge_tables = weakref.WeakKeyDictionary()
+_edge_tables_lock = threading.Lock()
+
+
+def too_steep(grades: np.ndarray, max_grade: float) -> np.ndarray:
+    """Tells which grades are steeper than a maximum, the one check the leg searches and the scoring of routes share.
+
+    Args:
+        grades (np.ndarray): Grades (rise over run), NaN when unknown.
+        max_grade (float): Maximum uphill grade (rise over run).
+
+    Returns:
+        np.ndarray: Boolean of every grade above the maximum, an unknown grade is never too steep.
+    """
+
+    return np.asarray(grades) > max_grade
+
+
+def for_graph(graph: MultiDiGraph, max_grade: float = None) -> 'EdgeTable':
+    """Gets the edge table of an osmnx graph, building it on first use.
+
+    Args:
+        graph (MultiDiGraph): Instance of an osmnx graph.
+        max_grade (float, optional): Maximum uphill grade (rise over run), see EdgeTable.within_grade(). Defaults to None, no limit.
+
+    Returns:
+        EdgeTable: Columnar edge attributes of the graph.
+    """
+
+    with _edge_tables_lock:
+        edge_table = _edge_tables.get(graph)
+
+        if edge_table is None:
+            # The grades are derived from the node elevations, make sure the graph has them
+            Elevation.for_graph(graph)
+            edge_table = EdgeTable.from_graph(graph, RoutingGraph.for_graph(graph))
+            _edge_tables[graph] = edge_table
+
+    if max_grade is not None:
+        return edge_table.within_grade(max_grade)
+
+    return edge_table
+
+
+class EdgeTable:
+    """Columnar per-edge attributes of a graph, so path metrics are array gathers instead of dicts per edge.
+
+    There is one row per (u, v) pair in the order of the edges of the routing graph, holding the attributes of the
+    shortest parallel edge like osmnx picks it for a route. Rows are found by (u, v) through a sorted key index.
+    With a maximum grade the rows hold the shortest parallel edge that is not too steep instead, see within_grade().
+    """
+
+    UNKNOWN_SURFACE = "unknown"
+
+    # Number of tables with a maximum grade that are kept, one per requested max steepness
+    MAX_GRADE_TABLES = 8
+
+    def __init__(self, node_ids: np.ndarray, keys: np.ndarray, lengths: np.ndarray, surface_codes: np.ndarray, surface_names: list, grades: np.ndarray,
+                 parallel_edges: tuple = None, usable: np.ndarray = None, max_grade: float = None) -> None:
+        """Initialize the edge table from its columns.
+
+        Args:
+            node_ids (np.ndarray): Sorted int64 osm IDs of the nodes, the position of an ID is its node index.
+            keys (np.ndarray): Sorted u_index * number_of_nodes + v_index key of every row.
+            lengths (np.ndarray): Length in meters of every edge.
+            surface_codes (np.ndarray): Position in surface_names of the surface of every edge.
+            surface_names (list): Surface name of every code, code 0 is the unknown surface.
+            grades (np.ndarray): Grade (rise over run) of every edge, NaN when it is unknown.
+            parallel_edges (tuple, optional): (rows, lengths, surface_codes, grades) of every edge of the graph, sorted by row and
+            then length, the edges a table with a maximum grade picks from. Defaults to None.
+            usable (np.ndarray, optional): Boolean of every row that has an edge, False for the rows of which every parallel
+            edge is too steep. Defaults to all rows.
+            max_grade (float, optional): The maximum grade the rows were picked with. Defaults to None, no limit.
+        """
+
+        self.node_ids = node_ids
+        self.keys = keys
+        self.lengths = lengths
+        self.surface_codes = surface_codes
+        self.surface_names = surface_names
+        self.hardened = np.isin(np.array(surface_names, dtype=object), HARDENED_SURFACES)[surface_codes]
+        self.grades = grades
+        self.parallel_edges = parallel_edges
+        self.usable = np.ones(len(keys), dtype=bool) if usable is None else usable
+        self.max_grade = max_grade
+
+        self.grade_tables = OrderedDict()
+        self.grade_tables_lock = threading.Lock()
+
+    @classmethod
+    def from_graph(cls, graph: MultiDiGraph, routing_graph: RoutingGraph.RoutingGraph) -> 'EdgeTable':
+        """Builds the edge table of an osmnx graph, aligned with the edges of its routing graph.
+
+        Args:
+            graph (MultiDiGraph): Instance of an osmnx graph.
+            routing_graph (RoutingGraph): Routing graph of the same graph.
+
+        Returns:
+            EdgeTable: Columnar edge attributes of the graph.
+        """
+
+        node_ids = routing_graph.node_ids
+        number_of_nodes = len(node_ids)
+        keys = np.repeat(np.arange(number_of_nodes, dtype=np.int64), np.diff(routing_graph.indptr)) * number_of_nodes + routing_graph.indices
+
+        edges = list(graph.edges(data=True))
+        u = np.searchsorted(node_ids, np.array([edge[0] for edge in edges], dtype=np.int64))
+        v = np.searchsorted(node_ids, np.array([edge[1] for edge in edges], dtype=np.int64))
+        lengths = np.array([edge[2]['length'] for edge in edges], dtype=np.float64)
+
+        # Edges that were merged while simplifying carry a list of surfaces, the first one is used like the analyzer always did
+        surface_names = [cls.UNKNOWN_SURFACE]
+        surface_lookup = {cls.UNKNOWN_SURFACE: 0}
+        surface_codes = np.zeros(len(edges), dtype=np.int16)
+        grades = np.full(len(edges), np.nan)
+        for i, (_, _, data) in enumerate(edges):
+            surface = data.get('surface')
+            if isinstance(surface, list):
+                surface = surface[0]
+            if isinstance(surface, str):
+                if surface not in surface_lookup:
+                    surface_lookup[surface] = len(surface_names)
+                    surface_names.append(surface)
+                surface_codes[i] = surface_lookup[surface]
+            if 'grade' in data:
+                grades[i] = data['grade']
+
+        # Keep the shortest of every set of parallel edges, the same edge the routing graph keeps
+        edge_keys = u * number_of_nodes + v
+        order = np.lexsort((lengths, edge_keys))
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = edge_keys[order][1:] != edge_keys[order][:-1]
+
+        # All edges stay available in the same order, a maximum grade may rule out the shortest of some parallel edges
+        parallel_edges = (np.searchsorted(keys, edge_keys[order]), lengths[order], surface_codes[order], grades[order])
+
+        rows = parallel_edges[0][first]
+        order = order[first]
+        table_lengths = np.empty(len(keys))
+        table_surface_codes = np.zeros(len(keys), dtype=np.int16)
+        table_grades = np.full(len(keys), np.nan)
+        table_lengths[rows] = lengths[order]
+        table_surface_codes[rows] = surface_codes[order]
+        table_grades[rows] = grades[order]
+
+        return cls(node_ids, keys, table_lengths, table_surface_codes, surface_names, table_grades, parallel_edges)
+
+    def within_grade(self, max_grade: float) -> 'EdgeTable':
+        """Gets the table of the edges that are not too steep, built once per maximum grade and kept with this table.
+
+        The too steep edges are left out before the parallel edges are merged, so a row holds the shortest parallel edge
+        that is not too steep. When the shortest edge between two nodes is too steep a longer one is used instead, only
+        when every edge between them is too steep the row is not usable. The rows stay those of this table, so they
+        remain aligned with the edges of the routing graph.
+
+        Args:
+            max_grade (float): Maximum uphill grade (rise over run), checked with too_steep().
+
+        Returns:
+            EdgeTable: Table with the same rows, the attributes of the picked edges and the usable rows.
+        """
+
+        with self.grade_tables_lock:
+            if max_grade in self.grade_tables:
+                self.grade_tables.move_to_end(max_grade)
+                return self.grade_tables[max_grade]
+
+            rows, lengths, surface_codes, grades = self.parallel_edges
+            allowed = np.flatnonzero(~too_steep(grades, max_grade))
+
+            # The parallel edges are sorted by row and length, so the first allowed edge of a row is the shortest
+            first = np.ones(len(allowed), dtype=bool)
+            first[1:] = rows[allowed][1:] != rows[allowed][:-1]
+            picked = allowed[first]
+
+            table_lengths = self.lengths.copy()
+            table_surface_codes = self.surface_codes.copy()
+            table_grades = self.grades.copy()
+            usable = np.zeros(len(self.keys), dtype=bool)
+            table_lengths[rows[picked]] = lengths[picked]
+            table_surface_codes[rows[picked]] = surface_codes[picked]
+            table_grades[rows[picked]] = grades[picked]
+            usable[rows[picked]] = True
+
+            table = EdgeTable(self.node_ids, self.keys, table_lengths, table_surface_codes, self.surface_names, table_grades, usable=usable, max_grade=max_grade)
+
+            self.grade_tables[max_grade] = table
+            while len(self.grade_tables) > self.MAX_GRADE_TABLES:
+                self.grade_tables.popitem(last=False)
+
+            return table
+
+    def edge_rows(self, path: list) -> np.ndarray:
+        """Gets the rows of the consecutive edges of a path.
+
+        Args:
+            path (list): Sequence of node IDs that form a route.
+
+        Returns:
+            np.ndarray: Row of every edge of the path, -1 for node pairs that are not connected by an edge.
+        """
+
+        return self.pair_rows(path[:-1], path[1:])
+
+    def pair_rows(self, start_nodes: np.ndarray, end_nodes: np.ndarray) -> np.ndarray:
+        """Gets the rows of the edges between arrays of start and end nodes in one lookup.
+
+        Args:
+            start_nodes (np.ndarray): Node IDs the edges start at.
+            end_nodes (np.ndarray): Node IDs the edges end at.
+
+        Returns:
+            np.ndarray: Row of every edge, -1 for node pairs that are not connected by an edge.
+        """
+
+        start_nodes = np.asarray(start_nodes, dtype=np.int64)
+        end_nodes = np.asarray(end_nodes, dtype=np.int64)
+        if len(start_nodes) == 0 or len(self.keys) == 0:
+            return np.full(len(start_nodes), -1, dtype=np.int64)
+
+        u = np.searchsorted(self.node_ids, start_nodes).clip(0, len(self.node_ids) - 1)
+        v = np.searchsorted(self.node_ids, end_nodes).clip(0, len(self.node_ids) - 1)
+        known = (self.node_ids[u] == start_nodes) & (self.node_ids[v] == end_nodes)
+
+        keys = u * len(self.node_ids) + v
+        rows = np.searchsorted(self.keys, keys).clip(0, len(self.keys) - 1)
+
+        return np.where(known & (self.keys[rows] == keys), rows, -1)
+
+    def paths_rows(self, paths: list) -> tuple:
+        """Gets the edge rows of many paths in one lookup.
+
+        Args:
+            paths (list): List of routes, each a sequence of node IDs.
+
+        Returns:
+            tuple: (rows, path_numbers) the rows of the edges of all paths after each other, and the position in paths of the path every row belongs to.
+        """
+
+        start_nodes = [node for path in paths for node in path[:-1]]
+        end_nodes = [node for path in paths for node in path[1:]]
+        path_numbers = np.repeat(np.arange(len(paths)), [max(len(path) - 1, 0) for path in paths])
+
+        return self.pair_rows(start_nodes, end_nodes), path_numbers
+
+    def path_lengths(self, paths: list) -> np.ndarray:
+        """Gets the length of many paths in one gather.
+
+        Args:
+            paths (list): List of routes, each a sequence of node IDs.
+
+        Returns:
+            np.ndarray: Length in meters of every path.
+        """
+
+        rows, path_numbers = self.paths_rows(paths)
+        found = rows >= 0
+
+        return np.bincount(path_numbers[found], weights=self.lengths[rows[found]], minlength=len(paths))
+
+    def hardened_lengths(self, paths: list) -> np.ndarray:
+        """Gets the length on hardened surfaces of many paths in one gather.
+
+        Args:
+            paths (list): List of routes, each a sequence of node IDs.
+
+        Returns:
+            np.ndarray: Meters on hardened surfaces of every path.
+        """
+
+        rows, path_numbers = self.paths_rows(paths)
+        found = rows >= 0
+        rows, path_numbers = rows[found], path_numbers[found]
+
+        return np.bincount(path_numbers, weights=self.lengths[rows] * self.hardened[rows], minlength=len(paths))
+
+    def max_grades(self, paths: list) -> np.ndarray:
+        """Gets the steepest uphill grade of many paths in one gather.
+
+        Args:
+            paths (list): List of routes, each a sequence of node IDs.
+
+        Returns:
+            np.ndarray: Highest grade (rise over run) of every path, 0 when a path has no uphill edge with a known grade.
+        """
+
+        rows, path_numbers = self.paths_rows(paths)
+        found = rows >= 0
+        grades = self.grades[rows[found]]
+        path_numbers = path_numbers[found]
+        known = ~np.isnan(grades)
+
+        max_grades = np.zeros(len(paths))
+        np.maximum.at(max_grades, path_numbers[known], grades[known])
+
+        return max_grades
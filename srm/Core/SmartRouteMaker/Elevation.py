@@ -0,0 +1,205 @@
+import weakref
+import threading
+import numpy as np
+import srtm
+import networkx as nx
+from networkx import MultiDiGraph
+
+from srm.Core.SmartRouteMaker import Settings
+from srm.Core.SmartRouteMaker import RoutingGraph
+from srm.Core.SmartRouteMaker import SrtmTileStore
+from srm.Core.SmartRouteMaker import EventHook
+
+# Elevation arrays are built once per loaded graph and live as long as the graph they were built from
+_elevations = weakref.WeakKeyDictionary()
+_elevations_lock = threading.Lock()
+
+_srtm_data = None
+_srtm_lock = threading.Lock()
+
+
+def for_graph(graph: MultiDiGraph) -> 'Elevation':
+    """Gets the node elevations of an osmnx graph, adding them to the graph on first use.
+
+    Args:
+        graph (MultiDiGraph): Instance of an osmnx graph.
+
+    Returns:
+        Elevation: Elevation of every node of the graph.
+    """
+
+    with _elevations_lock:
+        elevation = _elevations.get(graph)
+
+        if elevation is None:
+            add_elevations(graph)
+            elevation = Elevation.from_graph(graph, RoutingGraph.for_graph(graph))
+            _elevations[graph] = elevation
+
+    return elevation
+
+
+def add_elevations(graph: MultiDiGraph) -> MultiDiGraph:
+    """Adds the "elevation" attribute to every node and the "grade" attribute to every edge of a graph.
+
+    Nodes that already have an elevation are not looked up again, so a graph only pays for the lookups once
+    when it is stored in the graph caches afterwards.
+
+    Args:
+        graph (MultiDiGraph): Instance of an osmnx graph.
+
+    Returns:
+        MultiDiGraph: The same graph with elevations and grades.
+    """
+
+    missing = [node for node, elevation in graph.nodes(data='elevation') if elevation is None]
+    if not missing:
+        return graph
+
+    lat = np.array([graph.nodes[node]['y'] for node in missing], dtype=float)
+    lon = np.array([graph.nodes[node]['x'] for node in missing], dtype=float)
+    nx.set_node_attributes(graph, dict(zip(missing, lookup(lat, lon).tolist())), 'elevation')
+
+    # Grade is rise over run like osmnx.add_edge_grades, NaN when an elevation is unknown
+    for u, v, data in graph.edges(data=True):
+        if data['length'] > 0:
+            data['grade'] = (graph.nodes[v]['elevation'] - graph.nodes[u]['elevation']) / data['length']
+        else:
+            data['grade'] = float('nan')
+
+    return graph
+
+
+def lookup(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Looks up the elevations of arrays of coordinates from the configured elevation source.
+
+    With "source" set to "tiles" the elevations are sampled from local HGT tiles without any downloads, with
+    "srtm" they come from srtm.py, which downloads missing tiles.
+
+    Args:
+        lat (np.ndarray): Latitudes in degrees.
+        lon (np.ndarray): Longitudes in degrees.
+
+    Returns:
+        np.ndarray: Elevation in meters of every coordinate, NaN when it is not available.
+    """
+
+    settings = Settings.load('GraphSettings')['elevation']
+
+    if settings['source'] == "tiles":
+        return SrtmTileStore.shared(settings['tiles']).sample(lat, lon)
+
+    return srtm_lookup(lat, lon)
+
+
+def srtm_lookup(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Looks up the SRTM elevations of arrays of coordinates through srtm.py, with one vectorized read per tile.
+
+    Gives the same values as srtm.py its get_elevation, without going through it point by point.
+
+    Args:
+        lat (np.ndarray): Latitudes in degrees.
+        lon (np.ndarray): Longitudes in degrees.
+
+    Returns:
+        np.ndarray: Elevation in meters of every coordinate, NaN when it is not available.
+    """
+
+    global _srtm_data
+
+    with _srtm_lock:
+        if _srtm_data is None:
+            _srtm_data = srtm.get_data()
+
+    lat = np.asarray(lat, dtype=float)
+    lon = np.asarray(lon, dtype=float)
+    elevations = np.full(len(lat), np.nan)
+
+    tiles = np.column_stack((np.floor(lat), np.floor(lon)))
+    for tile_lat, tile_lon in np.unique(tiles, axis=0).tolist():
+        in_tile = (tiles[:, 0] == tile_lat) & (tiles[:, 1] == tile_lon)
+
+        try:
+            tile = _srtm_data.get_file(tile_lat + 0.5, tile_lon + 0.5)
+        except Exception as e:
+            EventHook.shared().emit("elevation_failed", tile=[tile_lat, tile_lon], error=repr(e))
+            continue
+
+        if tile is None:
+            continue
+
+        heights = np.frombuffer(tile.data, dtype='>i2').reshape(tile.square_side, tile.square_side)
+        rows = np.floor((tile.latitude + 1 - lat[in_tile]) * (tile.square_side - 1)).astype(int).clip(0, tile.square_side - 1)
+        columns = np.floor((lon[in_tile] - tile.longitude) * (tile.square_side - 1)).astype(int).clip(0, tile.square_side - 1)
+
+        values = heights[rows, columns].astype(float)
+        values[(values < SrtmTileStore.MIN_VALID_ELEVATION) | (values > SrtmTileStore.MAX_VALID_ELEVATION)] = np.nan
+        elevations[in_tile] = values
+
+    return elevations
+
+
+class Elevation:
+    """Elevation of every node of a graph as an array, so elevation metrics of paths are vectorized lookups."""
+
+    def __init__(self, node_ids: np.ndarray, elevations: np.ndarray) -> None:
+        """Initialize the node elevations.
+
+        Args:
+            node_ids (np.ndarray): Sorted int64 osm IDs of the nodes.
+            elevations (np.ndarray): Elevation in meters of every node, NaN when it is unknown.
+        """
+
+        self.node_ids = node_ids
+        self.elevations = elevations
+
+    @classmethod
+    def from_graph(cls, graph: MultiDiGraph, routing_graph: RoutingGraph.RoutingGraph) -> 'Elevation':
+        """Collects the "elevation" node attributes of a graph in the node order of its routing graph.
+
+        Args:
+            graph (MultiDiGraph): Instance of an osmnx graph with elevations, see add_elevations.
+            routing_graph (RoutingGraph): Routing graph of the same graph.
+
+        Returns:
+            Elevation: Elevation of every node of the graph.
+        """
+
+        elevations = np.array([graph.nodes[node_id].get('elevation', np.nan) for node_id in routing_graph.node_ids.tolist()], dtype=float)
+
+        return cls(routing_graph.node_ids, elevations)
+
+    def path_elevations(self, path: list) -> np.ndarray:
+        """Gets the elevations of the nodes of a path.
+
+        Args:
+            path (list): Sequence of node IDs that form a route.
+
+        Returns:
+            np.ndarray: Elevation in meters of every node of the path, NaN when it is unknown.
+        """
+
+        return self.elevations[np.searchsorted(self.node_ids, np.asarray(path, dtype=np.int64))]
+
+    def elevation_gains(self, paths: list) -> np.ndarray:
+        """Calculates the total positive elevation difference of many paths in one pass.
+
+        Args:
+            paths (list): List of routes, each a sequence of node IDs.
+
+        Returns:
+            np.ndarray: Sum of all upward elevation changes in meters of every path, unknown elevations are skipped.
+        """
+
+        if not paths:
+            return np.zeros(0)
+
+        elevations = self.path_elevations([node for path in paths for node in path])
+        path_numbers = np.repeat(np.arange(len(paths)), [len(path) for path in paths])
+
+        # Differences between the last node of a path and the first node of the next path are not part of a path
+        rises = np.diff(elevations)
+        within_path = path_numbers[1:] == path_numbers[:-1]
+        upward = within_path & (rises > 0)
+
+        return np.bincount(path_numbers[1:][upward], weights=rises[upward], minlength=len(paths))
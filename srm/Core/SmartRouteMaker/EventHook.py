@@ -0,0 +1,129 @@
+import json
+import time
+import threading
+from contextlib import contextmanager
+from termcolor import colored
+
+from srm.Core.SmartRouteMaker import Settings
+
+_shared_hook = None
+_shared_lock = threading.Lock()
+
+# Events about something that went wrong, the console printer shows them in red
+FAILURE_EVENTS = ("leg_failed", "leaf_unreachable", "pool_fallback", "elevation_failed", "contraction_failed")
+
+
+def shared() -> 'EventHook':
+    """Gets the process-wide event hook, creating it on first use.
+
+    With "print" in the events settings the events are printed to the console, like the planner always did.
+
+    Returns:
+        EventHook: The event hook every planner in this process emits to.
+    """
+
+    global _shared_hook
+
+    with _shared_lock:
+        if _shared_hook is None:
+            _shared_hook = EventHook()
+            if Settings.load('PlannerSettings')['events']['print']:
+                _shared_hook.subscribe(print_event, passive=True)
+
+    return _shared_hook
+
+
+def print_event(event: dict) -> None:
+    """Prints an event to the console, the listener used instead of the prints of the planner."""
+
+    data = {key: value for key, value in event.items() if key not in ('event', 'time')}
+    if 'polyline' in data:
+        # A polyline is for maps, the console only gets its size
+        data['polyline'] = f"{len(data['polyline'])} points"
+
+    print(colored(event['event'], 'red' if event['event'] in FAILURE_EVENTS else 'cyan'), json.dumps(data, default=str))
+
+
+class EventHook:
+    """Delivers the progress events of planning to whoever listens.
+
+    Listeners subscribed with subscribe() get the events of every thread, listeners registered with listen() only get
+    the events emitted on the thread that registered them, so a job only hears about its own plan. When nobody listens
+    emit() returns right away, and listening() lets the caller skip building data that is expensive to gather. Passive
+    listeners, like the console printer, get the events that are emitted anyway but do not count as listening.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the event hook without listeners."""
+
+        self.listeners = ()
+        self.passive_listeners = ()
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def subscribe(self, listener, passive: bool = False) -> None:
+        """Adds a listener for the events of every thread.
+
+        Args:
+            listener (callable): Called as listener(event) with the event dict, see emit().
+            passive (bool, optional): Leave the listener out of listening(), it then misses the events that are only
+            emitted when someone listens. Defaults to False.
+        """
+
+        with self.lock:
+            if passive:
+                self.passive_listeners = self.passive_listeners + (listener,)
+            else:
+                self.listeners = self.listeners + (listener,)
+
+    def unsubscribe(self, listener) -> None:
+        """Removes a listener added with subscribe()."""
+
+        with self.lock:
+            self.listeners = tuple(subscribed for subscribed in self.listeners if subscribed is not listener)
+            self.passive_listeners = tuple(subscribed for subscribed in self.passive_listeners if subscribed is not listener)
+
+    @contextmanager
+    def listen(self, listener):
+        """Adds a listener for the events emitted on this thread while the with block runs.
+
+        Args:
+            listener (callable): Called as listener(event) with the event dict, see emit().
+        """
+
+        previous = getattr(self.local, 'listeners', ())
+        self.local.listeners = previous + (listener,)
+        try:
+            yield listener
+        finally:
+            self.local.listeners = previous
+
+    def listening(self) -> bool:
+        """Tells whether an event emitted on this thread reaches any listener.
+
+        Returns:
+            bool: True when there is a listener that is not passive.
+        """
+
+        return bool(self.listeners) or bool(getattr(self.local, 'listeners', ()))
+
+    def emit(self, event: str, **data) -> None:
+        """Sends an event to the listeners of this thread and of every thread.
+
+        A listener that raises does not stop planning or the other listeners.
+
+        Args:
+            event (str): Name of the event, e.g. "graph_loaded".
+            **data: Details of the event, they have to be JSON serializable.
+        """
+
+        listeners = self.listeners + self.passive_listeners + getattr(self.local, 'listeners', ())
+        if not listeners:
+            return
+
+        payload = {"event": event, "time": time.time(), **data}
+        for listener in listeners:
+            try:
+                listener(payload)
+            except Exception as e:
+                print(colored(f"Event listener failed on {event}: {e!r}", "red"))
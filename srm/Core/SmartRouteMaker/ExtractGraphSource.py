@@ -0,0 +1,179 @@
+import os
+import re
+import tempfile
+import importlib.util
+import threading
+import numpy as np
+import osmnx as ox
+import networkx as nx
+from networkx import MultiDiGraph
+
+from srm.Core.SmartRouteMaker import Settings
+from srm.Core.SmartRouteMaker import Elevation
+from srm.Core.SmartRouteMaker.GraphCache import bbox_subgraph
+
+PBF_REQUIRES_OSMIUM = "Reading .osm.pbf extracts requires pyosmium (pip install osmium, it is in requirements.txt), or convert the extract to .osm first."
+
+
+class ExtractGraphSource:
+    """Serves graphs from a regional OSM extract on the local disk instead of downloading them through Overpass.
+
+    The extract is parsed once per network type and kept in memory, every request is answered by cutting
+    the requested area out of the loaded region.
+    """
+
+    # Regions are shared by all instances, the facade is created per request but the region should only be loaded once
+    _regions = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path: str, **kwargs) -> None:
+        """Initialize the source.
+
+        Args:
+            path (str): Path to an .osm or .osm.pbf extract, a relative path is inside the project folder.
+
+        Raises:
+            ImportError: When the extract is an .osm.pbf file and pyosmium is not installed, so this shows at startup
+            instead of on the first request.
+        """
+
+        self.path = Settings.resolve_path(path)
+
+        if self.path.endswith('.pbf') and importlib.util.find_spec('osmium') is None:
+            raise ImportError(PBF_REQUIRES_OSMIUM)
+
+    def point_graph(self, coordinates: tuple, radius: float, network_type: str, kind: str) -> MultiDiGraph:
+        """Cuts a graph around a set of coordinates from the extract.
+
+        Args:
+            coordinates (tuple): Coordinates that should be the center of the graph.
+            radius (float): Radius around the center, the same bounding box osmnx would download is used.
+            network_type (str): Type of road network.
+            kind (str): Kind of graph, "simple" or "full_geometry".
+
+        Returns:
+            MultiDiGraph: Instance of an osmnx graph.
+        """
+
+        graph, node_coordinates = self.region(network_type, kind)
+        bbox = ox.utils_geo.bbox_from_point(coordinates, radius)
+
+        return bbox_subgraph(graph, bbox, node_coordinates)
+
+    def region(self, network_type: str, kind: str) -> tuple:
+        """Gets the complete graph of the extract, loading it when this is the first request for it.
+
+        Args:
+            network_type (str): Type of road network.
+            kind (str): Kind of graph, "simple" or "full_geometry".
+
+        Returns:
+            tuple: (graph, (node_ids, lat, lon)) the region graph and its node coordinates as arrays.
+        """
+
+        key = (os.path.abspath(self.path), network_type, kind, tuple(ox.settings.useful_tags_way))
+
+        with ExtractGraphSource._lock:
+            if key not in ExtractGraphSource._regions:
+                graph = self._load(network_type, kind)
+
+                node_ids = np.array(list(graph.nodes))
+                lat = np.array([data['y'] for _, data in graph.nodes(data=True)], dtype=float)
+                lon = np.array([data['x'] for _, data in graph.nodes(data=True)], dtype=float)
+
+                ExtractGraphSource._regions[key] = (graph, (node_ids, lat, lon))
+
+        return ExtractGraphSource._regions[key]
+
+    def _load(self, network_type: str, kind: str) -> MultiDiGraph:
+        """Parses the extract into a graph that matches what osmnx would download for the network type."""
+
+        if not os.path.isfile(self.path):
+            raise FileNotFoundError(f"OSM extract not found: {self.path}")
+
+        useful_tags_way = list(ox.settings.useful_tags_way)
+        osm_filter = self._parse_osm_filter(ox.downloader._get_osm_filter(network_type))
+
+        # The tags the network filter looks at have to be parsed as well, they are removed again after filtering
+        ox.settings.useful_tags_way = list(dict.fromkeys(useful_tags_way + [key for key, _, _ in osm_filter]))
+
+        try:
+            if self.path.endswith('.pbf'):
+                xml_path = self._pbf_to_xml(self.path)
+                try:
+                    graph = ox.graph_from_xml(xml_path, bidirectional=network_type in ox.settings.bidirectional_network_types, simplify=False, retain_all=True)
+                finally:
+                    os.remove(xml_path)
+            else:
+                graph = ox.graph_from_xml(self.path, bidirectional=network_type in ox.settings.bidirectional_network_types, simplify=False, retain_all=True)
+        finally:
+            ox.settings.useful_tags_way = useful_tags_way
+
+        # Apply the same filter Overpass would apply to the ways of this network type
+        unwanted_edges = [(u, v, k) for u, v, k, data in graph.edges(keys=True, data=True) if not self._matches_filter(data, osm_filter)]
+        graph.remove_edges_from(unwanted_edges)
+        graph.remove_nodes_from(list(nx.isolates(graph)))
+
+        for _, _, data in graph.edges(data=True):
+            for tag in [tag for tag in data if tag not in useful_tags_way and tag not in ('osmid', 'length', 'geometry')]:
+                del data[tag]
+
+        graph = ox.simplify_graph(graph)
+
+        if kind == "full_geometry":
+            nodes, edges = ox.graph_to_gdfs(graph, fill_edge_geometry=True)
+            graph = ox.graph_from_gdfs(nodes, edges, graph_attrs=graph.graph)
+
+        # Elevations are looked up once for the whole region, the graphs cut from it inherit them
+        return Elevation.add_elevations(graph)
+
+    def _parse_osm_filter(self, osm_filter: str) -> list:
+        """Parses an Overpass way filter like ["highway"]["bicycle"!~"no"] into (key, operator, regex) clauses."""
+
+        return [(key, operator, re.compile(value) if value else None) for key, operator, value in re.findall(r'\["([^"]+)"(?:(!?~)"([^"]*)")?\]', osm_filter)]
+
+    def _matches_filter(self, tags: dict, osm_filter: list) -> bool:
+        """Checks the tags of a way against the parsed clauses of an Overpass filter."""
+
+        for key, operator, regex in osm_filter:
+            value = tags.get(key)
+
+            if operator == '':
+                if value is None:
+                    return False
+            elif operator == '~':
+                if value is None or not regex.search(str(value)):
+                    return False
+            elif value is not None and regex.search(str(value)):
+                return False
+
+        return True
+
+    def _pbf_to_xml(self, pbf_path: str) -> str:
+        """Converts a .osm.pbf extract to a temporary .osm file osmnx can parse. Requires pyosmium."""
+
+        try:
+            import osmium
+        except ImportError as e:
+            raise ImportError(PBF_REQUIRES_OSMIUM) from e
+
+        handle, xml_path = tempfile.mkstemp(suffix='.osm')
+        os.close(handle)
+        os.remove(xml_path)
+
+        writer = osmium.SimpleWriter(xml_path)
+
+        class HighwayCopier(osmium.SimpleHandler):
+            def node(self, node):
+                writer.add_node(node)
+
+            def way(self, way):
+                if 'highway' in way.tags:
+                    writer.add_way(way)
+
+        try:
+            HighwayCopier().apply_file(pbf_path)
+        finally:
+            writer.close()
+
+        return xml_path
@@ -1,81 +1,117 @@
 import time
 from typing import Tuple
 import math
-import numpy as np
-import multiprocessing as mp
 from networkx import MultiDiGraph
-from functools import partial
-from termcolor import colored
 import colorama
 
 from ...SmartRouteMaker import Analyzer
 from ...SmartRouteMaker import Visualizer
 from ...SmartRouteMaker import Graph
 from ...SmartRouteMaker import Planner
+from ...SmartRouteMaker import Settings
+from ...SmartRouteMaker import EdgeCosts
+from ...SmartRouteMaker import ScoringEngine
+from ...SmartRouteMaker import Route
+from ...SmartRouteMaker import CandidateGenerator
+from ...SmartRouteMaker import EventHook
+from ...SmartRouteMaker import ResultCache
 
 class SmartRouteMakerFacade():
 
-    def __init__(self) -> None:
+    def __init__(self, graph_settings: dict = None) -> None:
         """Initialize the facade.
+
+        Args:
+            graph_settings (dict, optional): Overrides config/GraphSettings.json, e.g. to plan on a local OSM extract.
         """        
 
         self.analyzer = Analyzer.Analyzer()
         self.visualizer = Visualizer.Visualizer()
-        self.graph = Graph.Graph()
+        self.graph = Graph.Graph(graph_settings)
         self.planner = Planner.Planner()
+        self.scoring_engine = ScoringEngine.ScoringEngine()
+        self.candidate_generator = CandidateGenerator.CandidateGenerator(self.planner, self.analyzer, self.scoring_engine)
+        self.events = EventHook.shared()
+
+        result_cache_settings = Settings.load('PlannerSettings')['result_cache']
+        if result_cache_settings['enabled']:
+            self.result_cache = ResultCache.shared(result_cache_settings)
+        else:
+            self.result_cache = None
 
     # Route
-    def plan_route(self, start_coordinates: tuple, end_coordinates: tuple, options: dict) -> dict:
+    def plan_route(self, start_coordinates: tuple, end_coordinates: tuple, options: dict, time_budget: float = None) -> dict:
         """Plan a route between two coordinates.
 
+        The progress is emitted to the event hook: plan_started, graph_loaded, route_found and plan_finished.
+        A route that was planned before between the same nodes is taken from the result cache, see render_cached().
+
         Args:
             start_coordinates (tuple): Tuple of two coordinates that represent the start point.
             end_coordinates (tuple): Tuple of two coordinates that represent the end point.
-            options (dict): Analysis options, see the documentation.
+            options (dict): Analysis options, see the documentation. With "visualize" set to False the images of the result page
+            are not drawn, e.g. for the JSON API.
+            time_budget (float, optional): Seconds the request may take. The shortest path is the only candidate, so it is always
+            returned and "budget_limited" tells whether it took longer. Defaults to the time budget settings.
 
         Returns:
             dict: Route and analysis data.
         """        
 
-        print(start_coordinates, end_coordinates)
+        deadline = self.deadline(time_budget, "route")
+        start_time_full = time.time()
+        self.events.emit("plan_started", kind="route", start=list(start_coordinates), end=list(end_coordinates))
         #calculate the point from where the graph should be loaded
         mid_lat = (start_coordinates[0] + end_coordinates[0]) / 2
         mid_lon = (start_coordinates[1] + end_coordinates[1]) / 2
         graph_start_point_coordinates = (mid_lat, mid_lon)
-        print("graph start point", graph_start_point_coordinates)
         #calculate the radius of the graph from the middlepoint to get the radius to load the graph with
         loading_radius = (math.sqrt((end_coordinates[1] - start_coordinates[1])**2 + (end_coordinates[0] - start_coordinates[0])**2) * 111000)/2 #to convert to meters
-        print("radius", loading_radius)
-        graph = self.graph.full_geometry_point_graph(graph_start_point_coordinates, radius = loading_radius * 1.1) #create a slightly larger graph than necessary for more headroom
         start_time = time.time()
-        print("graph loaded.... calculating route")
-        end_time = time.time()
-        print("Time to load graph: ", end_time - start_time)
+        graph = self.graph.full_geometry_point_graph(graph_start_point_coordinates, radius = loading_radius * 1.1) #create a slightly larger graph than necessary for more headroom
+        self.events.emit("graph_loaded", center=list(graph_start_point_coordinates), radius=loading_radius * 1.1, nodes=graph.number_of_nodes(), edges=graph.number_of_edges(), seconds=time.time() - start_time)
 
         # Get start/end nodes closest to the coordinates filled in the form
         start_node = self.graph.closest_node(graph, start_coordinates)
         end_node = self.graph.closest_node(graph, end_coordinates)
 
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self.result_cache.key("route", graph, start_node, end_node, options)
+            output = self.result_cache.get(cache_key)
+            if output is not None:
+                return self.render_cached(output, graph, "route", start_time_full, options)
+
         # Get shortest path between start and end node
         path = self.planner.shortest_path(graph, start_node, end_node)
-        self.visualizer.visualize_best_path(path, graph)
+        if path is None:
+            raise ValueError(f"No route found from {start_coordinates} to {end_coordinates}")
+
+        # The images are files that every request writes, the JSON API leaves them out so its jobs do not overwrite each other
+        visualize = options.get("visualize", True)
+        if visualize:
+            self.visualizer.visualize_best_path(path, graph)
 
-        path_length = self.analyzer.shortest_path_length(graph, start_node, end_node) * 1000    # Convert to meters
+        # The length comes from the path that was found instead of a second search, the metrics are shared by the analysis and the visualizations
+        route = Route.Route(graph, path)
+        path_length = round(route.length / 1000, 2) * 1000    # Convert to meters
 
-        elevation_diff = self.analyzer.calculate_elevation_diff(graph, path)
-        percentage_hardened = self.analyzer.calculate_percentage_hardened_surfaces(graph, path, path_length)
-        print(percentage_hardened)
-        self.visualizer.visualize_surface_percentage(percentage_hardened)
-        self.visualizer.visualize_elevations(graph, path)
+        elevation_diff = route.climb
+        percentage_hardened = route.hardened
+        if self.events.listening():
+            self.events.emit("route_found", length=path_length, elevation_diff=elevation_diff, hardened=percentage_hardened, polyline=route.coordinates)
+        if visualize:
+            self.visualizer.visualize_surface_percentage(percentage_hardened)
+            self.visualizer.visualize_elevations(route)
         
         if "analyze" in options and options['analyze']:
-            route_analysis = self.analyzer.get_path_attributes(graph, path)
+            route_analysis = route.edge_attributes
         else:
             route_analysis = None
         
         if "surface_dist" in options and options['surface_dist']:
-            surface_dist = self.analyzer.get_path_surface_distribution(route_analysis)
-            surface_dist_visualisation = self.visualizer.build_surface_dist_visualisation(route_analysis, graph)
+            surface_dist = route.surface_distribution
+            surface_dist_visualisation = self.visualizer.build_surface_dist_visualisation(route.edge_attributes, graph)
 
             surface_dist_legenda = {}
 
@@ -96,15 +132,23 @@ class SmartRouteMakerFacade():
             "surface_dist_visualisation": surface_dist_visualisation,
             "surface_dist_legenda": surface_dist_legenda,
             "simple_polylines": simple_polylines,
-            "elevation_diff": elevation_diff
+            "elevation_diff": elevation_diff,
+            "budget_limited": deadline is not None and time.monotonic() > deadline,
+            "candidates_evaluated": 1,
+            "cached": False
         }
 
+        if cache_key is not None:
+            self.result_cache.put(cache_key, output)
+
+        self.events.emit("plan_finished", kind="route", seconds=time.time() - start_time_full, budget_limited=output["budget_limited"])
+
         return output
 
     
 
 
-    def plan_circular_route_flower(self, start_coordinates: tuple, max_length: int, elevation_diff_input: int, percentage_hard_input:int, requested_steepness:int, options: dict) -> dict:
+    def plan_circular_route_flower(self, start_coordinates: tuple, max_length: int, elevation_diff_input: int, percentage_hard_input:int, requested_steepness:int, options: dict, time_budget: float = None) -> dict:
 
         """
         Generates a flower-like route structure on a given graph, where each leaf represents a leaf path(a leaf path is a paths of generated nodes 
@@ -126,7 +170,10 @@ class SmartRouteMakerFacade():
         requested_steepness : int
             The maximum desired steepness of the generated route. This is a hard cap so the route will never be steeper than this.
         options : dict
-            Additional options for analysis and visualization.
+            Additional options for analysis and visualization, with "visualize" set to False the images are not drawn.
+        time_budget : float, optional
+            Seconds the request may take, the time to load the graph included. When it is up no more leafs are routed and the
+            best route found so far is returned, "budget_limited" in the output is then True. Defaults to the time budget settings.
 
         Returns
         -------
@@ -135,10 +182,14 @@ class SmartRouteMakerFacade():
 
         Notes
         -----
-        - Generates a circular pattern with a configurable number of leafs around the starting node.
+        - Generates leafs around the starting node coarse to fine, refining around the best leafs and learning the radius that hits the length.
         - Calculates the route by connecting points on each leaf.
-        - Evaluates multiple paths and selects the one closest to the specified user input.
+        - Evaluates multiple paths, the most promising first, and selects the one closest to the specified user input.
         - Performs path analysis, surface distribution analysis, and optionally visualizes the route.
+        - A request that was planned before from the same start node with (almost) the same inputs is answered from the
+          result cache, only the images are drawn again.
+        - Emits its progress to the event hook: plan_started, graph_loaded, leafs_generated and candidates_routed for every
+          round and batch of leafs, best_route while refining, candidates_scored, best_route and plan_finished.
         - This function is designed for route planning on a graph, considering geographical coordinates and various path attributes.
 
         Example
@@ -151,179 +202,113 @@ class SmartRouteMakerFacade():
         options = {"analyze": True, "surface_dist": True}
         """
         colorama.init()
+        deadline = self.deadline(time_budget, "circular_route")
         start_time_full = time.time()
-        print(f"Route from point {start_coordinates}")
+        self.events.emit("plan_started", kind="circular_route", start=list(start_coordinates), max_length=max_length, elevation_diff=elevation_diff_input,
+                         percentage_hardened=percentage_hard_input, max_steepness=requested_steepness, time_budget=time_budget)
         #region Initial parameters and variables
-
-        # Number of circles(leafs) drawn around start as flower
-        leafs = 64
-        # Amount of points calculated per leaf, increasing this drastically impact performance
-        points_per_leaf = 5
-        
         # calculate the radius the circles(leafs) need to be according to the length given by the user
         radius = (max_length) / (2 * math.pi)
-        # Variance, to be used to create headroom in the loaded graph
-        variance = 1
-        additonal_variance = 1.1 #used for loading in a larger graph than necessary for more headroom additive to variance ALWAYS > 1
+        # The farthest point of a leaf lies 2 * variance * radius from the start, the largest variance the candidate generator uses sets the loaded area
+        variance = self.candidate_generator.max_variance
+        additonal_variance = 0.1 #used for loading in a larger graph than necessary for more headroom
+        loading_radius = radius * (2 * variance + additonal_variance)
         
         # Load the graph
-        graph = self.graph.full_geometry_point_graph(start_coordinates, radius = radius * (variance + additonal_variance)) #create a slightly larger map than necessary for more headroom
+        start_time = time.time()
+        graph = self.graph.full_geometry_point_graph(start_coordinates, radius = loading_radius) #create a slightly larger map than necessary for more headroom
+        self.events.emit("graph_loaded", center=list(start_coordinates), radius=loading_radius, nodes=graph.number_of_nodes(), edges=graph.number_of_edges(), seconds=time.time() - start_time,
+                         cache=self.graph.cache.stats() if self.graph.cache is not None else None,
+                         memory_cache=self.graph.memory_cache.stats() if self.graph.memory_cache is not None else None)
         
         # Determine the start node based on the start coordinates
         start_node = self.graph.closest_node(graph, start_coordinates) #this is the actual center_node( flower center node )
-        print("Inputted route length: ", max_length)
-        print("Inputted elevation difference: ", elevation_diff_input)
-        print("Inputted percentage hardened: ", percentage_hard_input)
-        print("Inputted steepness: ", requested_steepness)
-        #endregion
-
-        #______________________________________________________________
 
-        #region Calculate the leaf paths
-        # Generate array of 360 equal sized angles, basically a circle
-        flower_angles = np.linspace(0, 2 * np.pi, leafs)
-        start_time_leafs = time.time()
-        print("spreading load over: ", mp.cpu_count(), " cores")
-
-        # create list of multiple leaf paths to evaluate LATER with multiprocessing
-        with mp.Pool(mp.cpu_count()) as pool:
-            func = partial(self.planner.calculate_leaf_nodes, start_node=start_node, radius=radius, variance=variance, points_per_leaf=points_per_leaf, graph=graph)
-            leaf_paths = pool.map(func, flower_angles)
-        end_time_leafs = time.time()
-        print("Time to calculate all leaf nodes: ", end_time_leafs - start_time_leafs)
+        # A resubmitted form skips planning, the inputs are rounded so small changes still hit the cache
+        cache_key = None
+        if self.result_cache is not None:
+            cache_key = self.result_cache.key("circular_route", graph, start_node, start_node, options,
+                                              max_length=self.result_cache.quantize(max_length, "length"),
+                                              elevation_diff=self.result_cache.quantize(elevation_diff_input, "elevation"),
+                                              percentage_hardened=self.result_cache.quantize(percentage_hard_input, "percentage"),
+                                              max_steepness=requested_steepness)
+            output = self.result_cache.get(cache_key)
+            if output is not None:
+                return self.render_cached(output, graph, "circular_route", start_time_full, options,
+                                          requested_steepness / 100 if requested_steepness is not None else None)
+
+        # With a surface or elevation preference the legs are searched on edge costs that lean towards it, so less leafs are needed
+        cost_profile = EdgeCosts.for_graph(graph).profile(percentage_hard_input, elevation_diff_input, max_length)
         #endregion
 
         #______________________________________________________________
 
-        # Visualize the leaf points
-        self.visualizer.visualize_leaf_points(leaf_paths, graph)
+        # region get the candidate routes from the leafs
+        # The leafs are routed coarse to fine, only around the best leafs so far, see CandidateGenerator
+        # A requested steepness is enforced while searching, the legs only use edges that are not too steep
         start_time = time.time()
-        
-        # region get all the full paths from the leafs
-        # Get all the full paths from the leafs with the lengths, indices match with eachother i.e. path_lengths[2] = paths[2]
-        paths, path_lengths = self.analyzer.get_paths_and_path_lengths(graph, leaf_paths, start_node)
-
-
-        print(colored("total_paths: ", "yellow"), len(paths))
-        #remove faulty routes, first collect the valid paths and then remove the faulty ones from the original lists to avoid runtime errors then set the lists to their updated versions
-        
-        valid_paths = []
-        valid_path_lengths = []
-        for path in paths:
-            try:
-                self.analyzer.get_path_attributes(graph, path)
-                valid_paths.append(path)
-                valid_path_lengths.append(path_lengths[paths.index(path)])
-            except:
-                print(colored("removed faulty path, index: ", "red"), paths.index(path))
-                
-        paths = valid_paths
-        path_lengths = valid_path_lengths
-       
-        print(colored("valid_paths: ","green"), len(paths))
-
-        
-        end_time = time.time()
-        print("Time to calculate all FULL PATHS  ", end_time - start_time)
+        search_stats = {}
+        leaf_failures = []
+        # Every plan starts from the detour factor of the plans that finished before it, and keeps what it learns to itself until it finishes
+        detour_factor = self.candidate_generator.shared_detour_factor()
+        candidates, leaf_paths, detour_factor = self.candidate_generator.generate(graph, start_node, max_length, elevation_diff_input, percentage_hard_input, requested_steepness,
+                                                                                  cost_profile, search_stats, leaf_failures, deadline, detour_factor)
+
+        # Visualize the leaf points, the images are files that every request writes so the JSON API leaves them out
+        visualize = options.get("visualize", True)
+        if visualize:
+            self.visualizer.visualize_leaf_points(leaf_paths, graph)
+
+        if not candidates:
+            raise ValueError(f"No circular route found from {start_coordinates}" + (f" within a steepness of {requested_steepness}%" if requested_steepness != None else ""))
         #endregion
-        min_length_diff_routes_indeces = self.analyzer.min_length_routes_indeces(paths, path_lengths, max_length, leafs)
         
         #______________________________________________________________
 
         # region get the best paths based on the user input
-        if elevation_diff_input != None or percentage_hard_input != None:
-            
-            # Get the best matching path with elevation and length
-            paths_with_scores = {}
-
-            # Only length and elevation
-            
-            if elevation_diff_input != None and percentage_hard_input == None:
-                paths_with_scores = self.analyzer.get_score_only_elevation(graph, paths, path_lengths, min_length_diff_routes_indeces, elevation_diff_input, max_length)
-
-            # Only length and surface
-            elif percentage_hard_input != None and elevation_diff_input == None:
-                paths_with_scores = self.analyzer.get_score_only_surface(graph, paths, path_lengths, min_length_diff_routes_indeces, percentage_hard_input, max_length)
-
-            # Both length, elevation and surface
-            elif elevation_diff_input != None and percentage_hard_input != None:
-                paths_with_scores = self.analyzer.get_score_elevation_and_surface(graph, paths, path_lengths, min_length_diff_routes_indeces, percentage_hard_input, elevation_diff_input, max_length)
-            
-            # If the user entered a requested steepness, remove all paths that are too steep
-            if requested_steepness != None:
-                print(colored("Amount of paths above inputted steepness: ", "red"), len(paths_with_scores))
-                #this will be a paths with scores list without the paths that are too steep
-                paths_with_scores = self.analyzer.remove_paths_above_steepness(graph, paths, paths_with_scores, min_length_diff_routes_indeces, requested_steepness)
-                print(colored("Amount of paths below inputted steepness: ", "green"), len(paths_with_scores))
-
-            # Get path with the lowest score, this is the best path (the score is the difference between input and output, so the lower the better)
-            best_path_index = min(paths_with_scores, key=paths_with_scores.get)
-            print("Best path: ", best_path_index)
-
-            # set the path as the best path
-            path = paths[best_path_index]
-
+        # All candidates are scored at once on length and, when they were inputted, elevation difference and percentage of hardened surfaces
+        metrics = self.scoring_engine.metrics(candidates)
+        ranking, scores = self.scoring_engine.rank(metrics, max_length, elevation_diff_input, percentage_hard_input, requested_steepness)
+        self.events.emit("candidates_scored", candidates=len(candidates), feasible=len(ranking), failed_leafs=len(leaf_failures), seconds=time.time() - start_time,
+                         detour_factor=detour_factor, search_stats=search_stats)
+
+        if len(ranking) == 0:
+            raise ValueError(f"No circular route found from {start_coordinates} within a steepness of {requested_steepness}%")
+
+        # Get path with the lowest score, this is the best path (the score is the difference between input and output, so the lower the better)
+        # set the path as the best path, its metrics were computed while scoring
+        route = candidates[ranking[0]]
+        path = route.path
+        if self.events.listening():
+            self.events.emit("best_route", length=round(route.length, 2), elevation_diff=route.climb, hardened=route.hardened, score=float(scores[ranking[0]]), polyline=route.coordinates, final=True)
+
+        # Results
+        path_length = round(route.length,2)
+        elevation_diff = route.climb
+        percentage_hardened = route.hardened
+
+        if visualize:
             self.visualizer.visualize_best_path(path, graph)
-
-            # Results
-            path_length = round(path_lengths[best_path_index],2)
-            elevation_diff = self.analyzer.calculate_elevation_diff(graph, path)
-            percentage_hardened = self.analyzer.calculate_percentage_hardened_surfaces(graph, path, path_length)
-
             self.visualizer.visualize_surface_percentage(percentage_hardened)
-            self.visualizer.visualize_elevations(graph, path)
-            
-            # Terminal message
-            self.visualizer.final_terminal_message(path_length, elevation_diff, percentage_hardened)
-#___________________________________________________________________________________________________________________
-
-        # Only length
-        elif elevation_diff_input == None and percentage_hard_input == None:
-            # Only go for the best length, the difference in length is essentially a score
-            path_length_diff = {}
-            for path_index in min_length_diff_routes_indeces:
-                temp_path_length = path_lengths[path_index]
-                path_length_diff[path_index] = abs(temp_path_length - max_length)
-            # If the user entered a requested steepness, remove all paths that are too steep  
-            if requested_steepness != None:
-                print(colored("Amount of paths above inputted steepness: ", "red"), len(path_length_diff))
-                path_length_diff = self.analyzer.remove_paths_above_steepness(graph, paths, path_length_diff, min_length_diff_routes_indeces, requested_steepness)
-                print(colored("Amount of paths below inputted steepness: ", "green"), len(path_length_diff))
-
-            # Get path matching the length input the best and show the elevation of the path
-            best_path_index = min(path_length_diff, key=path_length_diff.get)
-            print("Best path: ", best_path_index)
-            path = paths[best_path_index]
-            self.visualizer.visualize_best_path(path, graph)
-
-            # Results
-            path_length = round(path_lengths[best_path_index],2)
-            elevation_diff = self.analyzer.calculate_elevation_diff(graph, path)
-            percentage_hardened = self.analyzer.calculate_percentage_hardened_surfaces(graph, path, path_length)
-            print(percentage_hardened)
-
-            self.visualizer.visualize_surface_percentage(percentage_hardened)
-            self.visualizer.visualize_elevations(graph, path)
-            
-            
-            # Terminal message
+            self.visualizer.visualize_elevations(route)
+        
+        # Terminal message, with the images of the result page, the JSON API only reports through the events
+        if visualize:
             self.visualizer.final_terminal_message(path_length, elevation_diff, percentage_hardened)
         #endregion
         
         #______________________________________________________________
-        end_time_full = time.time()
-        print("Total time: ", end_time_full - start_time_full)
         #region Visualize the route
 
             # Visualize the route
         if "analyze" in options and options['analyze']:
-            route_analysis = self.analyzer.get_path_attributes(graph, path)
+            route_analysis = route.edge_attributes
         else:
             route_analysis = None
 
         if "surface_dist" in options and options['surface_dist']:
-            surface_dist = self.analyzer.get_path_surface_distribution(route_analysis)
-            surface_dist_visualisation = self.visualizer.build_surface_dist_visualisation(route_analysis, graph)
+            surface_dist = route.surface_distribution
+            surface_dist_visualisation = self.visualizer.build_surface_dist_visualisation(route.edge_attributes, graph)
 
             surface_dist_legenda = {}
             for type in surface_dist:
@@ -348,12 +333,75 @@ class SmartRouteMakerFacade():
             "surface_dist_visualisation": surface_dist_visualisation,
             "surface_dist_legenda": surface_dist_legenda,
             "simple_polylines": simple_polylines,
-            "elevation_diff": elevation_diff
+            "elevation_diff": elevation_diff,
+            "search_stats": search_stats,
+            "leaf_failures": leaf_failures,
+            "budget_limited": search_stats['budget_limited'],
+            "candidates_evaluated": search_stats['leafs'],
+            "cached": False
         }
-        
-        
+
+        # A route cut short by the time budget is not the route the request deserves, it is planned again next time
+        if cache_key is not None and not output["budget_limited"]:
+            self.result_cache.put(cache_key, output)
+
+        self.events.emit("plan_finished", kind="circular_route", seconds=time.time() - start_time_full, budget_limited=output["budget_limited"], candidates_evaluated=output["candidates_evaluated"])
+
         return output
     
+    def render_cached(self, output: dict, graph: MultiDiGraph, kind: str, start_time_full: float, options: dict, max_grade: float = None) -> dict:
+        """Renders a result from the result cache, the images of the route are drawn again and planning is skipped.
+
+        Args:
+            output (dict): The cached output of plan_route or plan_circular_route_flower.
+            graph (MultiDiGraph): The graph the route was planned on.
+            kind (str): "route" or "circular_route".
+            start_time_full (float): time.time() at which the request started.
+            options (dict): Analysis options of the request, the images are not drawn when "visualize" is False.
+            max_grade (float, optional): Maximum uphill grade (rise over run) the route was planned with. Defaults to None.
+
+        Returns:
+            dict: The cached output with "cached" set to True.
+        """
+
+        route = Route.Route(graph, output["path"], max_grade=max_grade)
+        output["cached"] = True
+
+        self.events.emit("cache_hit", kind=kind, cache=self.result_cache.stats())
+        if self.events.listening():
+            if kind == "route":
+                self.events.emit("route_found", length=output["path_length"], elevation_diff=output["elevation_diff"], hardened=route.hardened, polyline=route.coordinates)
+            else:
+                self.events.emit("best_route", length=output["path_length"], elevation_diff=output["elevation_diff"], hardened=route.hardened, polyline=route.coordinates, final=True)
+
+        if options.get("visualize", True):
+            self.visualizer.visualize_best_path(output["path"], graph)
+            self.visualizer.visualize_surface_percentage(route.hardened)
+            self.visualizer.visualize_elevations(route)
+
+        self.events.emit("plan_finished", kind=kind, seconds=time.time() - start_time_full, budget_limited=output["budget_limited"], candidates_evaluated=0, cached=True)
+
+        return output
+
+    def deadline(self, time_budget: float, planner: str) -> float:
+        """Turns a time budget into the time.monotonic() at which planning has to stop.
+
+        Args:
+            time_budget (float): Seconds the request may take, None for the time budget settings of the planner.
+            planner (str): "route" or "circular_route", the key in the time budget settings.
+
+        Returns:
+            float: The deadline, None when there is no time budget.
+        """
+
+        if time_budget is None:
+            time_budget = Settings.load('PlannerSettings')['time_budget'][planner]
+
+        if time_budget is None:
+            return None
+
+        return time.monotonic() + time_budget
+
     def export_GPX(self, node_ids: list):
         return self.graph.export_GPX(node_ids)
     
@@ -1,3 +1,7 @@
+import os
+import time
+import threading
+import numpy as np
 import osmnx as ox
 from networkx import MultiDiGraph
 import requests
@@ -5,8 +9,53 @@ from xml.etree.ElementTree import Element, SubElement, tostring
 from xml.dom import minidom
 from flask import Flask, Response
 
+from srm.Core.SmartRouteMaker import Settings
+from srm.Core.SmartRouteMaker import GraphCache
+from srm.Core.SmartRouteMaker import GraphMemoryCache
+from srm.Core.SmartRouteMaker import ExtractGraphSource
+from srm.Core.SmartRouteMaker import SpatialIndex
+from srm.Core.SmartRouteMaker import Elevation
+from srm.Core.SmartRouteMaker import EdgeCosts
+from srm.Core.SmartRouteMaker import ContractionHierarchy
+from srm.Core.SmartRouteMaker import ResultCache
+
 class Graph:
 
+    # Preloaded regions are shared by all instances, as (bbox, network type, source, graph) in the order they were loaded
+    _preloaded = []
+    _preloaded_lock = threading.Lock()
+
+    def __init__(self, settings: dict = None) -> None:
+        """Initialize the graph loader.
+
+        Args:
+            settings (dict, optional): Graph settings, defaults to config/GraphSettings.json. With "source" set to
+            "extract" graphs are cut from a local OSM extract, with "overpass" they are downloaded and cached on disk
+            when the disk cache is enabled. Loaded graphs are kept in a process-wide memory cache when enabled.
+        """
+
+        if settings is None:
+            settings = Settings.load('GraphSettings')
+
+        if settings['source'] == "extract":
+            self.source = ExtractGraphSource.ExtractGraphSource(**settings['extract'])
+            self.source_name = f"extract:{os.path.abspath(self.source.path)}"
+        else:
+            self.source = None
+            self.source_name = "overpass"
+
+        if self.source is None and settings['disk_cache']['enabled']:
+            self.cache = GraphCache.GraphCache(**settings['disk_cache'])
+        else:
+            self.cache = None
+
+        if settings['memory_cache']['enabled']:
+            self.memory_cache = GraphMemoryCache.shared(settings['memory_cache'])
+        else:
+            self.memory_cache = None
+
+        self.preload_regions = settings.get('preload', {}).get('regions', [])
+
     def simple_point_graph(self, coordinates: tuple, radius: int = 5000, type: str = "bike") -> MultiDiGraph:
         """Creates a MultiDiGraph from a set of coordinates and a radius.
 
@@ -26,7 +75,39 @@ class Graph:
             'lon', 'lat'
         ]
 
-        return ox.graph_from_point(coordinates, radius, network_type=type)
+        # Requests from the same area share an already loaded graph, the quantized area always covers the requested one
+        if self.memory_cache is not None:
+            key = self.memory_cache.quantize(coordinates, radius, type, "simple", self.source_name)
+            graph = self.memory_cache.get(key)
+            if graph is not None:
+                return graph
+
+            graph = self._load_simple_point_graph(key[:2], key[2], type)
+            self.memory_cache.put(key, graph)
+            return graph
+
+        return self._load_simple_point_graph(coordinates, radius, type)
+
+    def _load_simple_point_graph(self, coordinates: tuple, radius: int, type: str) -> MultiDiGraph:
+        """Loads a simple graph from the configured source, see simple_point_graph."""
+
+        if self.source is not None:
+            return self.source.point_graph(coordinates, radius, type, kind="simple")
+
+        # Graphs cached before they carried elevations get them added here
+        if self.cache is not None:
+            graph = self.cache.get(coordinates, radius, type, kind="simple")
+            if graph is not None:
+                return Elevation.add_elevations(graph)
+
+        start_time = time.time()
+        graph = ox.graph_from_point(coordinates, radius, network_type=type)
+        Elevation.add_elevations(graph)
+
+        if self.cache is not None:
+            self.cache.put(coordinates, radius, type, "simple", graph, time.time() - start_time)
+
+        return graph
     
     def full_geometry_point_graph(self, coordinates: tuple, radius: int = 5000, type: str = "bike") -> MultiDiGraph:
         """Creates a MultiDiGraph that contains all geometry attributes from a set of coordinates and a radius.
@@ -47,11 +128,113 @@ class Graph:
             'lon', 'lat'
         ]
 
+        # A preloaded region is planned on as a whole, everything built from it is ready and shared by the workers
+        region = self.preloaded_region(coordinates, radius, type)
+        if region is not None:
+            return region
+
+        # Requests from the same area share an already loaded graph, the quantized area always covers the requested one
+        if self.memory_cache is not None:
+            key = self.memory_cache.quantize(coordinates, radius, type, "full_geometry", self.source_name)
+            graph = self.memory_cache.get(key)
+            if graph is not None:
+                return graph
+
+            graph = self._load_full_geometry_point_graph(key[:2], key[2], type)
+            self.memory_cache.put(key, graph)
+            return graph
+
+        return self._load_full_geometry_point_graph(coordinates, radius, type)
+
+    def _load_full_geometry_point_graph(self, coordinates: tuple, radius: int, type: str) -> MultiDiGraph:
+        """Loads a full geometry graph from the configured source, see full_geometry_point_graph."""
+
+        # A local extract replaces the download entirely
+        if self.source is not None:
+            return self.source.point_graph(coordinates, radius, type, kind="full_geometry")
+
+        # A cached graph that covers the requested area saves the download
+        if self.cache is not None:
+            graph = self.cache.get(coordinates, radius, type, kind="full_geometry")
+            if graph is not None:
+                return Elevation.add_elevations(graph)
+
         # Download graph and convert to nodes and edges
+        start_time = time.time()
         graph = ox.graph_from_point(coordinates, radius, network_type=type)
         nodes, edges = ox.graph_to_gdfs(graph, fill_edge_geometry=True)
-        
-        return ox.graph_from_gdfs(nodes, edges, graph_attrs=graph.graph)
+        graph = ox.graph_from_gdfs(nodes, edges, graph_attrs=graph.graph)
+
+        # Elevations are looked up once and stored with the graph in the caches
+        Elevation.add_elevations(graph)
+
+        if self.cache is not None:
+            self.cache.put(coordinates, radius, type, "full_geometry", graph, time.time() - start_time)
+
+        return graph
+
+    def preload(self, regions: list = None) -> list:
+        """Loads region graphs together with their spatial index, routing graph, edge table, elevations and edge costs.
+
+        This is meant for application startup before the WSGI server forks its workers: the workers share the memory of
+        the regions copy-on-write and every request inside a region is planned on it without loading anything.
+
+        Args:
+            regions (list, optional): [{"center": [lat, lon], "radius": 15000, "type": "bike"}, ...] the areas to load.
+            Defaults to the regions in the preload section of the graph settings.
+
+        Returns:
+            list: The loaded region graphs.
+        """
+
+        if regions is None:
+            regions = self.preload_regions
+
+        graphs = []
+        for region in regions:
+            center = tuple(region['center'])
+            type = region.get('type', 'bike')
+            graph = self.full_geometry_point_graph(center, region['radius'], type)
+
+            SpatialIndex.for_graph(graph)
+            Elevation.for_graph(graph)
+            EdgeCosts.for_graph(graph)
+            ResultCache.graph_version(graph)
+
+            with Graph._preloaded_lock:
+                Graph._preloaded.append((ox.utils_geo.bbox_from_point(center, region['radius']), type, self.source_name, graph))
+            graphs.append(graph)
+
+        # A hierarchy that is contracted on a thread would be lost in the forked workers
+        ContractionHierarchy.wait()
+
+        return graphs
+
+    def preloaded_region(self, coordinates: tuple, radius: float, type: str) -> MultiDiGraph:
+        """Finds the smallest region preloaded from the source of this instance that covers a requested area.
+
+        Args:
+            coordinates (tuple): Coordinates that should be the center of the graph.
+            radius (float): Radius around the center that is requested.
+            type (str): Type of road network.
+
+        Returns:
+            MultiDiGraph: The graph of the region, or None when no preloaded region covers the area.
+        """
+
+        if not Graph._preloaded:
+            return None
+
+        north, south, east, west = ox.utils_geo.bbox_from_point(coordinates, radius)
+        covering = [
+            (bbox, graph) for bbox, region_type, source_name, graph in Graph._preloaded
+            if region_type == type and source_name == self.source_name and bbox[0] >= north and bbox[1] <= south and bbox[2] >= east and bbox[3] <= west
+        ]
+
+        if not covering:
+            return None
+
+        return min(covering, key=lambda region: (region[0][0] - region[0][1]) * (region[0][2] - region[0][3]))[1]
 
     def closest_node(self, graph: MultiDiGraph, coordinates: tuple) -> int:
         """Fetches the closest node to a set of coordinates within a graph.
@@ -64,8 +247,22 @@ class Graph:
             int: Unique ID of the closest node in the graph.
         """
 
-        return ox.nearest_nodes(graph, coordinates[1], coordinates[0])     
-        # return ox.nearest_nodes(graph, longtitude(x), latitude(y))   
+        return int(SpatialIndex.for_graph(graph).nearest_nodes([coordinates[0]], [coordinates[1]])[0])
+
+    def closest_nodes(self, graph: MultiDiGraph, coordinates: np.ndarray) -> np.ndarray:
+        """Fetches the closest nodes to an array of coordinates within a graph in a single query.
+
+        Args:
+            graph (MultiDiGraph): Instance of an osmnx graph.
+            coordinates (np.ndarray): (n, 2) array of (latitude, longitude) coordinates.
+
+        Returns:
+            np.ndarray: Unique IDs of the closest nodes, in the order of the coordinates.
+        """
+
+        coordinates = np.asarray(coordinates, dtype=float)
+
+        return SpatialIndex.for_graph(graph).nearest_nodes(coordinates[:, 0], coordinates[:, 1])
 
     def insert_start_node_and_rearrange(self, leaf_nodes: list, start_node: int, start_point_index: float) -> list:
             """
@@ -0,0 +1,279 @@
+import os
+import json
+import time
+import uuid
+import pickle
+import threading
+from contextlib import contextmanager
+import numpy as np
+import osmnx as ox
+from networkx import MultiDiGraph
+
+from srm.Core.SmartRouteMaker import Settings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Seconds after which a graph file that is not in the index is considered left behind
+ORPHAN_AGE = 600
+
+
+def bbox_subgraph(graph: MultiDiGraph, bbox: tuple, node_coordinates: tuple = None) -> MultiDiGraph:
+    """Cuts the part of a graph that lies within a bounding box.
+
+    Args:
+        graph (MultiDiGraph): Instance of an osmnx graph.
+        bbox (tuple): (north, south, east, west) bounding box in degrees.
+        node_coordinates (tuple, optional): Precomputed (node_ids, lat, lon) arrays of the graph. Defaults to None.
+
+    Returns:
+        MultiDiGraph: The largest weakly connected component of the nodes inside the bounding box,
+        the same way osmnx truncates a downloaded graph.
+    """
+
+    north, south, east, west = bbox
+
+    if node_coordinates is None:
+        node_ids = np.array(list(graph.nodes))
+        lat = np.array([data['y'] for _, data in graph.nodes(data=True)], dtype=float)
+        lon = np.array([data['x'] for _, data in graph.nodes(data=True)], dtype=float)
+    else:
+        node_ids, lat, lon = node_coordinates
+
+    inside = (lat <= north) & (lat >= south) & (lon <= east) & (lon >= west)
+    subgraph = graph.subgraph(node_ids[inside].tolist()).copy()
+
+    return ox.utils_graph.get_largest_component(subgraph)
+
+
+class GraphCache:
+    """Persistent on-disk cache of downloaded graphs.
+
+    Every stored graph is recorded in an index together with the bounding box it covers. A request whose
+    bounding box lies completely inside a cached one is answered by cutting a subgraph out of the cached graph.
+    """
+
+    def __init__(self, directory: str, max_size_mb: float = 2048, **kwargs) -> None:
+        """Initialize the cache.
+
+        Args:
+            directory (str): Folder the graphs and the index are stored in, a relative folder is inside the project folder.
+            max_size_mb (float, optional): Size the cache may take on disk before the least recently used graphs are evicted. Defaults to 2048.
+        """
+
+        self.directory = Settings.resolve_path(directory)
+        self.max_size = max_size_mb * 1024 * 1024
+        self.index_path = os.path.join(self.directory, 'index.json')
+        self.lock_path = os.path.join(self.directory, 'index.lock')
+        self.lock = threading.Lock()
+
+        # Lookups of this process, the index only changes when graphs are stored or evicted
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get(self, coordinates: tuple, radius: float, network_type: str, kind: str) -> MultiDiGraph:
+        """Fetches a graph from the cache.
+
+        Args:
+            coordinates (tuple): Coordinates that should be the center of the graph.
+            radius (float): Radius around the center that is requested.
+            network_type (str): Type of road network.
+            kind (str): Kind of graph, e.g. "simple" or "full_geometry".
+
+        Returns:
+            MultiDiGraph: The requested graph, or None when no cached graph covers the requested area.
+        """
+
+        bbox = ox.utils_geo.bbox_from_point(coordinates, radius)
+
+        with self._locked(exclusive=False):
+            entry = self._find_covering_entry(self._read_index(), bbox, network_type, kind)
+
+        if entry is None:
+            self._count(hit=False)
+            return None
+
+        graph_path = os.path.join(self.directory, entry['file'])
+        try:
+            with open(graph_path, 'rb') as graph_file:
+                cached_graph = pickle.load(graph_file)
+            # The modification time of the file is its last use, so a lookup does not have to rewrite the index
+            os.utime(graph_path)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            # The file is gone or broken, forget about it and treat this as a miss
+            with self._locked(exclusive=True):
+                index = self._read_index()
+                index['entries'] = [cached for cached in index['entries'] if cached['file'] != entry['file']]
+                self._write_index(index)
+            self._count(hit=False)
+            return None
+
+        # Estimate the download time saved by scaling the measured download time to the requested area
+        requested_area = (bbox[0] - bbox[1]) * (bbox[2] - bbox[3])
+        cached_area = (entry['bbox'][0] - entry['bbox'][1]) * (entry['bbox'][2] - entry['bbox'][3])
+        self._count(hit=True, saved_seconds=float(entry['download_time'] * requested_area / cached_area))
+
+        return bbox_subgraph(cached_graph, bbox)
+
+    def put(self, coordinates: tuple, radius: float, network_type: str, kind: str, graph: MultiDiGraph, download_time: float) -> None:
+        """Stores a downloaded graph in the cache and evicts the least recently used graphs when the cache is too large.
+
+        Args:
+            coordinates (tuple): Coordinates that are the center of the graph.
+            radius (float): Radius around the center that was downloaded.
+            network_type (str): Type of road network.
+            kind (str): Kind of graph, e.g. "simple" or "full_geometry".
+            graph (MultiDiGraph): The downloaded graph.
+            download_time (float): Seconds it took to download the graph.
+        """
+
+        file_name = f'{uuid.uuid4().hex}.pickle'
+        file_path = os.path.join(self.directory, file_name)
+
+        with open(file_path, 'wb') as graph_file:
+            pickle.dump(graph, graph_file, protocol=pickle.HIGHEST_PROTOCOL)
+
+        # Other processes store graphs in the same directory, the index is read, changed and written under the file lock
+        with self._locked(exclusive=True):
+            index = self._read_index()
+            index['entries'].append({
+                'file': file_name,
+                'center': list(coordinates),
+                'radius': radius,
+                'bbox': list(ox.utils_geo.bbox_from_point(coordinates, radius)),
+                'network_type': network_type,
+                'kind': kind,
+                'size': os.path.getsize(file_path),
+                'download_time': download_time,
+                'last_used': time.time()
+            })
+            self._evict(index)
+            self._write_index(index)
+
+    def stats(self) -> dict:
+        """Gets the hit/miss statistics of the lookups of this process and the contents of the cache.
+
+        Returns:
+            dict: {'hits': 3, 'misses': 1, 'hit_rate': 0.75, 'saved_seconds': 41.2, 'evictions': 0, 'entries': 1, 'size_mb': 12.5}
+        """
+
+        with self._locked(exclusive=False):
+            index = self._read_index()
+
+        with self.lock:
+            lookups = self.hits + self.misses
+            stats = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'saved_seconds': self.saved_seconds
+            }
+
+        stats['evictions'] = index['stats']['evictions']
+        stats['entries'] = len(index['entries'])
+        stats['size_mb'] = round(sum(entry['size'] for entry in index['entries']) / (1024 * 1024), 2)
+
+        return stats
+
+    def _count(self, hit: bool, saved_seconds: float = 0.0) -> None:
+        """Counts a lookup of this process."""
+
+        with self.lock:
+            if hit:
+                self.hits += 1
+                self.saved_seconds += saved_seconds
+            else:
+                self.misses += 1
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        """Holds the lock of the index, a file lock that the processes sharing the directory respect.
+
+        Without fcntl (Windows) only the threads of this process are kept out.
+
+        Args:
+            exclusive (bool): True to change the index, False to only read it.
+        """
+
+        if fcntl is None:
+            with self.lock:
+                yield
+            return
+
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _find_covering_entry(self, index: dict, bbox: tuple, network_type: str, kind: str) -> dict:
+        """Finds the smallest cached graph that fully covers a bounding box."""
+
+        north, south, east, west = bbox
+        covering = [
+            entry for entry in index['entries']
+            if entry['network_type'] == network_type and entry['kind'] == kind
+            and entry['bbox'][0] >= north and entry['bbox'][1] <= south
+            and entry['bbox'][2] >= east and entry['bbox'][3] <= west
+        ]
+
+        if not covering:
+            return None
+
+        return min(covering, key=lambda entry: entry['radius'])
+
+    def _evict(self, index: dict) -> None:
+        """Removes the least recently used graphs until the cache fits within its maximum size, the caller holds the exclusive lock.
+
+        Graph files that are in no entry, e.g. of a process that stopped between writing the file and the index, are removed as well.
+        """
+
+        for entry in index['entries']:
+            try:
+                entry['last_used'] = max(entry['last_used'], os.path.getmtime(os.path.join(self.directory, entry['file'])))
+            except OSError:
+                pass
+
+        index['entries'].sort(key=lambda entry: entry['last_used'])
+
+        while len(index['entries']) > 1 and sum(entry['size'] for entry in index['entries']) > self.max_size:
+            entry = index['entries'].pop(0)
+            index['stats']['evictions'] += 1
+            try:
+                os.remove(os.path.join(self.directory, entry['file']))
+            except OSError:
+                pass
+
+        # A file that another process is writing right now is not in the index yet, only old files are orphans
+        indexed = {entry['file'] for entry in index['entries']}
+        orphaned_before = time.time() - ORPHAN_AGE
+        for file in os.scandir(self.directory):
+            if file.name.endswith('.pickle') and file.name not in indexed:
+                try:
+                    if file.stat().st_mtime < orphaned_before:
+                        os.remove(file.path)
+                except OSError:
+                    pass
+
+    def _read_index(self) -> dict:
+        """Reads the index from disk, other processes may have changed it."""
+
+        try:
+            with open(self.index_path, 'r') as index_file:
+                return json.load(index_file)
+        except (OSError, ValueError):
+            return {'entries': [], 'stats': {'evictions': 0}}
+
+    def _write_index(self, index: dict) -> None:
+        """Writes the index to disk atomically."""
+
+        temp_path = f'{self.index_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'w') as index_file:
+            json.dump(index, index_file)
+        os.replace(temp_path, self.index_path)
@@ -0,0 +1,144 @@
+import math
+import threading
+from collections import OrderedDict
+from networkx import MultiDiGraph
+
+# Rough memory use of an osmnx graph with full edge geometry, used to estimate the size of a cached graph
+BYTES_PER_NODE = 1000
+BYTES_PER_EDGE = 3000
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+
+def shared(settings: dict) -> 'GraphMemoryCache':
+    """Gets the process-wide graph cache, creating it on first use.
+
+    Args:
+        settings (dict): The memory_cache section of the graph settings.
+
+    Returns:
+        GraphMemoryCache: The cache shared by every Graph instance in this process.
+    """
+
+    global _shared_cache
+
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = GraphMemoryCache(**settings)
+
+    return _shared_cache
+
+
+class GraphMemoryCache:
+    """In-memory LRU of loaded graphs, shared across requests.
+
+    Graphs are keyed by a quantized center, radius, network type and source, so requests from (almost) the same
+    location reuse the same graph object. Cached graphs are shared and must not be modified by the caller.
+    """
+
+    def __init__(self, max_memory_mb: float = 1024, coordinate_precision: int = 3, radius_step: float = 250, **kwargs) -> None:
+        """Initialize the cache.
+
+        Args:
+            max_memory_mb (float, optional): Estimated memory the cached graphs may use before the least recently used ones are evicted. Defaults to 1024.
+            coordinate_precision (int, optional): Number of decimals the center coordinates are rounded to. Defaults to 3 (about 100 meters).
+            radius_step (float, optional): Meters the radius is rounded up to. Defaults to 250.
+        """
+
+        self.max_memory = max_memory_mb * 1024 * 1024
+        self.coordinate_precision = coordinate_precision
+        self.radius_step = radius_step
+        self.graphs = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def quantize(self, coordinates: tuple, radius: float, network_type: str, kind: str, source: str) -> tuple:
+        """Quantizes a graph request to the key of a cached graph.
+
+        The quantized center can be up to half a rounding step away from the requested center, the radius is
+        enlarged by that distance before rounding it up so the cached graph always covers the requested area.
+
+        Args:
+            coordinates (tuple): Coordinates that should be the center of the graph.
+            radius (float): Radius around the center that is requested.
+            network_type (str): Type of road network.
+            kind (str): Kind of graph, e.g. "simple" or "full_geometry".
+            source (str): Where the graph is loaded from, e.g. "overpass" or "extract:/data/region.osm.pbf".
+
+        Returns:
+            tuple: (lat, lon, radius, network_type, kind, source) the key and the area that should be loaded for it.
+        """
+
+        lat = round(coordinates[0], self.coordinate_precision)
+        lon = round(coordinates[1], self.coordinate_precision)
+
+        # 111000 is the amount of meters in 1 degree of latitude, a degree of longitude is never longer.
+        # Both coordinates can be off by half a step, so the center can move diagonally
+        quantization_error = math.sqrt(2) * 0.5 * 10 ** -self.coordinate_precision * 111000
+        radius = math.ceil((radius + quantization_error) / self.radius_step) * self.radius_step
+
+        return (lat, lon, radius, network_type, kind, source)
+
+    def get(self, key: tuple) -> MultiDiGraph:
+        """Fetches a graph from the cache and marks it as most recently used.
+
+        Args:
+            key (tuple): Key from quantize().
+
+        Returns:
+            MultiDiGraph: The cached graph, or None when it is not cached.
+        """
+
+        with self.lock:
+            graph = self.graphs.get(key)
+
+            if graph is None:
+                self.misses += 1
+                return None
+
+            self.graphs.move_to_end(key)
+            self.hits += 1
+
+            return graph
+
+    def put(self, key: tuple, graph: MultiDiGraph) -> None:
+        """Stores a graph and evicts the least recently used graphs when the memory cap is exceeded.
+
+        Args:
+            key (tuple): Key from quantize().
+            graph (MultiDiGraph): The loaded graph.
+        """
+
+        with self.lock:
+            self.graphs[key] = graph
+            self.graphs.move_to_end(key)
+
+            while len(self.graphs) > 1 and self.memory_usage() > self.max_memory:
+                self.graphs.popitem(last=False)
+                self.evictions += 1
+
+    def memory_usage(self) -> int:
+        """Estimates the memory used by the cached graphs in bytes."""
+
+        return sum(len(graph) * BYTES_PER_NODE + graph.number_of_edges() * BYTES_PER_EDGE for graph in self.graphs.values())
+
+    def stats(self) -> dict:
+        """Gets the hit/miss statistics of the cache.
+
+        Returns:
+            dict: {'hits': 3, 'misses': 1, 'hit_rate': 0.75, 'evictions': 0, 'graphs': 1, 'memory_mb': 120.5}
+        """
+
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'evictions': self.evictions,
+                'graphs': len(self.graphs),
+                'memory_mb': round(self.memory_usage() / (1024 * 1024), 2)
+            }
@@ -0,0 +1,314 @@
+import time
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from srm.Core.SmartRouteMaker import EventHook
+from srm.Core.SmartRouteMaker import JobStore
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the job manager already holds as many unfinished jobs as it may."""
+
+
+class Job:
+    """A planning job and everything a client can poll: its status, progress, events and result or error."""
+
+    def __init__(self, job_id: str, kind: str, store: JobStore.JobStore = None) -> None:
+        """Initialize the job.
+
+        Args:
+            job_id (str): Unique ID of the job.
+            kind (str): What the job plans, e.g. "circular_route".
+            store (JobStore, optional): Store the events are written to, for the other server processes. Defaults to None.
+        """
+
+        self.job_id = job_id
+        self.kind = kind
+        self.status = QUEUED
+        self.progress = {}
+        self.result = None
+        self.error = None
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.events = []
+        self.store = store
+        self.lock = threading.Lock()
+        self.changed = threading.Condition(self.lock)
+
+    def report(self, event: dict) -> None:
+        """Stores an event of the planner and makes it the progress of the job, the listener of the job thread.
+
+        Args:
+            event (dict): Event from the event hook, e.g. {"event": "candidates_routed", "routed": 16, ...}.
+        """
+
+        with self.changed:
+            number = len(self.events)
+            self.events.append(event)
+            self.progress = {"stage": event["event"], **{key: value for key, value in event.items() if key not in ('event', 'polyline')}}
+            progress = self.progress
+            self.changed.notify_all()
+
+        # Only the job thread reports, so the events reach the store in order
+        if self.store is not None:
+            self.store.add_event(self.job_id, number, event, progress)
+
+    def finished(self) -> bool:
+        """Tells whether the job is done or failed."""
+
+        return self.status in (DONE, FAILED)
+
+    def wait_for_events(self, known: int, timeout: float) -> tuple:
+        """Waits until the job has more than a number of events or finished.
+
+        Args:
+            known (int): Number of events the caller already has.
+            timeout (float): Seconds to wait at most.
+
+        Returns:
+            tuple: (events, finished) the events after the known ones and whether the job finished.
+        """
+
+        with self.changed:
+            self.changed.wait_for(lambda: len(self.events) > known or self.finished(), timeout)
+            return self.events[known:], self.finished()
+
+    def to_dict(self) -> dict:
+        """Gets the state of the job as it is sent to clients.
+
+        Returns:
+            dict: {"job_id", "kind", "status", "progress", "submitted_at", "started_at", "finished_at"} and "result" when the job
+            is done or "error" when it failed.
+        """
+
+        with self.lock:
+            state = {
+                "job_id": self.job_id,
+                "kind": self.kind,
+                "status": self.status,
+                "progress": dict(self.progress),
+                "submitted_at": self.submitted_at,
+                "started_at": self.started_at,
+                "finished_at": self.finished_at
+            }
+
+            if self.status == DONE:
+                state["result"] = self.result
+            elif self.status == FAILED:
+                state["error"] = self.error
+
+        return state
+
+
+class StoredJob(Job):
+    """A job that runs in another server process, read from the job store whenever it is polled."""
+
+    def __init__(self, state: dict, store: JobStore.JobStore) -> None:
+        """Initialize the job from its stored state.
+
+        Args:
+            state (dict): State from JobStore.load().
+            store (JobStore): The store the job was read from.
+        """
+
+        super().__init__(state["job_id"], state["kind"], store)
+        self.load(state)
+
+    def load(self, state: dict) -> None:
+        """Takes over the stored state of the job."""
+
+        with self.lock:
+            self.status = state["status"]
+            self.progress = state["progress"]
+            self.result = state["result"]
+            self.error = state["error"]
+            self.submitted_at = state["submitted_at"]
+            self.started_at = state["started_at"]
+            self.finished_at = state["finished_at"]
+
+    def wait_for_events(self, known: int, timeout: float) -> tuple:
+        """Waits until the job has more than a number of events or finished, by reading the store until either happened.
+
+        Args:
+            known (int): Number of events the caller already has.
+            timeout (float): Seconds to wait at most.
+
+        Returns:
+            tuple: (events, finished) the events after the known ones and whether the job finished.
+        """
+
+        deadline = time.monotonic() + timeout
+        while True:
+            # The status is read before the events, the events of a finished job are all stored before it finished
+            state = self.store.load(self.job_id)
+            if state is not None:
+                self.load(state)
+            finished = state is None or self.finished()
+
+            events = self.store.events(self.job_id, known)
+            if events or finished or time.monotonic() >= deadline:
+                return events, finished
+
+            time.sleep(self.store.poll_interval)
+
+
+class JobManager:
+    """Runs planning jobs on a bounded number of threads, so heavy requests do not block the web server.
+
+    At most max_workers jobs run at the same time and at most max_queued more wait for a thread, a job submitted beyond
+    that is rejected with QueueFullError instead of piling up. Finished jobs can be polled for result_ttl seconds.
+    The leg searches of the jobs share the routing worker processes, so a few job threads keep every core busy.
+    With a job store every server process can answer for the jobs of the others, the limits hold per process.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queued: int = 8, result_ttl: float = 600, store: dict = None, **kwargs) -> None:
+        """Initialize the job manager.
+
+        Args:
+            max_workers (int, optional): Number of jobs that run at the same time. Defaults to 2.
+            max_queued (int, optional): Number of jobs that may wait for a thread. Defaults to 8.
+            result_ttl (float, optional): Seconds a finished job is kept. Defaults to 600.
+            store (dict, optional): {"enabled", "path", "poll_interval"} of the job store. Defaults to None, the jobs
+            are only known to this process.
+        """
+
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="srm-job")
+        self.jobs = OrderedDict()
+        self.unfinished = 0
+        self.lock = threading.Lock()
+        self.pruned_at = 0
+
+        if store is not None and store.get('enabled'):
+            self.store = JobStore.JobStore(**store)
+        else:
+            self.store = None
+
+    def submit(self, kind: str, function, *args, **kwargs) -> Job:
+        """Submits a job, it runs function(*args, **kwargs) on a job thread and the events it emits there go to the job.
+
+        Args:
+            kind (str): What the job plans, e.g. "circular_route".
+            function (callable): Planner function, its return value is the result of the job.
+
+        Raises:
+            QueueFullError: When max_workers + max_queued jobs are unfinished.
+
+        Returns:
+            Job: The submitted job.
+        """
+
+        with self.lock:
+            self.prune()
+
+            if self.unfinished >= self.max_workers + self.max_queued:
+                raise QueueFullError(f"{self.unfinished} jobs are queued or running, try again later")
+
+            job = Job(uuid.uuid4().hex, kind, self.store)
+            if self.store is not None:
+                self.store.add(job.job_id, job.kind, job.status, job.submitted_at)
+            self.jobs[job.job_id] = job
+            self.unfinished += 1
+
+        self.executor.submit(self.run, job, function, args, kwargs)
+
+        return job
+
+    def run(self, job: Job, function, args: tuple, kwargs: dict) -> None:
+        """Runs a job on a job thread and stores its result or error."""
+
+        with job.lock:
+            job.status = RUNNING
+            job.started_at = time.time()
+
+        if self.store is not None:
+            self.store.update(job.job_id, status=job.status, started_at=job.started_at)
+
+        try:
+            with EventHook.shared().listen(job.report):
+                result = function(*args, **kwargs)
+            status, error = DONE, None
+        except Exception as e:
+            result, status, error = None, FAILED, str(e)
+
+        # The store is updated first, a process that sees the job finished finds the result
+        if self.store is not None:
+            try:
+                self.store.update(job.job_id, status=status, result=result, error=error, finished_at=time.time())
+            except Exception as e:
+                result, status, error = None, FAILED, f"The result could not be stored: {e}"
+                self.store.update(job.job_id, status=status, error=error, finished_at=time.time())
+
+        with job.changed:
+            job.result = result
+            job.error = error
+            job.status = status
+            job.finished_at = time.time()
+            job.changed.notify_all()
+
+        with self.lock:
+            self.unfinished -= 1
+
+    def get(self, job_id: str) -> Job:
+        """Gets a job by its ID.
+
+        Args:
+            job_id (str): ID returned when the job was submitted.
+
+        Returns:
+            Job: The job, None when it does not exist or was finished longer than result_ttl ago. A job of another server
+            process is read from the store.
+        """
+
+        with self.lock:
+            self.prune()
+            job = self.jobs.get(job_id)
+
+        if job is None and self.store is not None:
+            state = self.store.load(job_id)
+            if state is not None:
+                job = StoredJob(state, self.store)
+
+        return job
+
+    def prune(self) -> None:
+        """Forgets the jobs that finished longer than result_ttl ago, the caller holds the lock."""
+
+        now = time.time()
+        expired = now - self.result_ttl
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished_at is not None and job.finished_at < expired]:
+            del self.jobs[job_id]
+
+        # The store is shared with the other processes, it does not have to be pruned on every request
+        if self.store is not None and now - self.pruned_at > 10:
+            self.store.prune(expired, (QUEUED, RUNNING), FAILED)
+            self.pruned_at = now
+
+    def stats(self) -> dict:
+        """Gets the number of jobs per status, of all server processes when there is a job store.
+
+        Returns:
+            dict: {'queued': x, 'running': y, 'done': z, 'failed': w, 'capacity': max_workers + max_queued} the capacity is per process.
+        """
+
+        counts = {status: 0 for status in (QUEUED, RUNNING, DONE, FAILED)}
+        if self.store is not None:
+            counts.update(self.store.counts())
+        else:
+            with self.lock:
+                for job in self.jobs.values():
+                    counts[job.status] += 1
+
+        counts['capacity'] = self.max_workers + self.max_queued
+
+        return counts
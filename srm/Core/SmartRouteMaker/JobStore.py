@@ -0,0 +1,176 @@
+import os
+import json
+import time
+import pickle
+import sqlite3
+from contextlib import contextmanager
+
+from srm.Core.SmartRouteMaker import Settings
+
+
+class JobStore:
+    """Keeps the state, events and results of planning jobs in a SQLite database that every server process opens.
+
+    A job runs in the process it was submitted to, but its status and event stream can be requested from any process
+    that shares the database file, so the requests of a client do not have to reach the same worker. The processes
+    have to run on the same machine, a job whose process stopped is marked as failed.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.25, **kwargs) -> None:
+        """Initialize the store, the database is created when it does not exist.
+
+        Args:
+            path (str): Path of the database file, a relative path is inside the project folder.
+            poll_interval (float, optional): Seconds between two reads of a job that runs in another process. Defaults to 0.25.
+        """
+
+        self.path = Settings.resolve_path(path)
+        self.poll_interval = poll_interval
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        with self._connection() as connection:
+            # Readers do not wait for the job threads that write, and the other way around
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS jobs (job_id TEXT PRIMARY KEY, kind TEXT, status TEXT, progress TEXT, result BLOB, '
+                               'error TEXT, submitted_at REAL, started_at REAL, finished_at REAL, pid INTEGER)')
+            connection.execute('CREATE TABLE IF NOT EXISTS events (job_id TEXT, number INTEGER, event TEXT, PRIMARY KEY (job_id, number))')
+
+    def add(self, job_id: str, kind: str, status: str, submitted_at: float) -> None:
+        """Stores a submitted job, owned by this process.
+
+        Args:
+            job_id (str): Unique ID of the job.
+            kind (str): What the job plans, e.g. "circular_route".
+            status (str): Status of the job, "queued".
+            submitted_at (float): time.time() at which the job was submitted.
+        """
+
+        with self._connection() as connection:
+            connection.execute('INSERT INTO jobs (job_id, kind, status, progress, submitted_at, pid) VALUES (?, ?, ?, ?, ?, ?)',
+                               (job_id, kind, status, '{}', submitted_at, os.getpid()))
+
+    def update(self, job_id: str, **state) -> None:
+        """Changes the state of a job.
+
+        Args:
+            job_id (str): ID of the job.
+            **state: The columns to change: status, result, error, started_at or finished_at.
+        """
+
+        if 'result' in state:
+            state['result'] = pickle.dumps(state['result'], protocol=pickle.HIGHEST_PROTOCOL)
+
+        columns = ', '.join(f'{column} = ?' for column in state)
+        with self._connection() as connection:
+            connection.execute(f'UPDATE jobs SET {columns} WHERE job_id = ?', (*state.values(), job_id))
+
+    def add_event(self, job_id: str, number: int, event: dict, progress: dict) -> None:
+        """Stores an event of a job and its progress after the event.
+
+        Args:
+            job_id (str): ID of the job.
+            number (int): Number of the event, the first event of a job is 0.
+            event (dict): Event from the event hook.
+            progress (dict): The progress of the job.
+        """
+
+        with self._connection() as connection:
+            connection.execute('INSERT INTO events (job_id, number, event) VALUES (?, ?, ?)', (job_id, number, json.dumps(event, default=str)))
+            connection.execute('UPDATE jobs SET progress = ? WHERE job_id = ?', (json.dumps(progress, default=str), job_id))
+
+    def load(self, job_id: str) -> dict:
+        """Reads the state of a job.
+
+        Args:
+            job_id (str): ID of the job.
+
+        Returns:
+            dict: {"job_id", "kind", "status", "progress", "result", "error", "submitted_at", "started_at", "finished_at"},
+            None when the job is not in the store.
+        """
+
+        with self._connection() as connection:
+            row = connection.execute('SELECT job_id, kind, status, progress, result, error, submitted_at, started_at, finished_at FROM jobs WHERE job_id = ?',
+                                     (job_id,)).fetchone()
+
+        if row is None:
+            return None
+
+        state = dict(zip(('job_id', 'kind', 'status', 'progress', 'result', 'error', 'submitted_at', 'started_at', 'finished_at'), row))
+        state['progress'] = json.loads(state['progress'])
+        state['result'] = pickle.loads(state['result']) if state['result'] is not None else None
+
+        return state
+
+    def events(self, job_id: str, known: int) -> list:
+        """Reads the events of a job after the ones a caller already has.
+
+        Args:
+            job_id (str): ID of the job.
+            known (int): Number of events the caller already has.
+
+        Returns:
+            list: The events in the order they were emitted.
+        """
+
+        with self._connection() as connection:
+            rows = connection.execute('SELECT event FROM events WHERE job_id = ? AND number >= ? ORDER BY number', (job_id, known)).fetchall()
+
+        return [json.loads(event) for event, in rows]
+
+    def prune(self, expired: float, unfinished: tuple, failed: str) -> None:
+        """Removes the jobs that finished before a time and fails the unfinished jobs of processes that stopped.
+
+        Args:
+            expired (float): time.time() before which finished jobs are removed.
+            unfinished (tuple): The statuses of jobs that did not finish.
+            failed (str): The status of a failed job.
+        """
+
+        placeholders = ', '.join('?' for _ in unfinished)
+        with self._connection() as connection:
+            owners = connection.execute(f'SELECT DISTINCT pid FROM jobs WHERE status IN ({placeholders})', unfinished).fetchall()
+            for pid, in owners:
+                if not self._alive(pid):
+                    connection.execute(f'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE pid = ? AND status IN ({placeholders})',
+                                       (failed, "The server process that ran the job stopped", time.time(), pid, *unfinished))
+
+            connection.execute('DELETE FROM events WHERE job_id IN (SELECT job_id FROM jobs WHERE finished_at < ?)', (expired,))
+            connection.execute('DELETE FROM jobs WHERE finished_at < ?', (expired,))
+
+    def counts(self) -> dict:
+        """Counts the jobs of all processes per status.
+
+        Returns:
+            dict: {status: number of jobs}
+        """
+
+        with self._connection() as connection:
+            return dict(connection.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall())
+
+    @contextmanager
+    def _connection(self):
+        """Opens the database for a single transaction, connections are not shared between threads or forked processes."""
+
+        connection = sqlite3.connect(self.path, timeout=30)
+        try:
+            with connection:
+                yield connection
+        finally:
+            connection.close()
+
+    def _alive(self, pid: int) -> bool:
+        """Tells whether a process of this machine is still running, which is assumed where that can not be checked."""
+
+        if pid == os.getpid() or os.name != 'posix':
+            return True
+
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+
+        return True
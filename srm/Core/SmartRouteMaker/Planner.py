@@ -1,15 +1,20 @@
 import osmnx as ox
+import networkx as nx
 from typing import Tuple, List
 from networkx import MultiDiGraph
 import math
 import numpy as np
 
 import srm.Core.SmartRouteMaker.Graph as Graph
+import srm.Core.SmartRouteMaker.RoutingGraph as RoutingGraph
+import srm.Core.SmartRouteMaker.SpatialIndex as SpatialIndex
+import srm.Core.SmartRouteMaker.EventHook as EventHook
 
 class Planner:
 
     def __init__(self) -> None:
         self.graph = Graph.Graph()
+        self.events = EventHook.shared()
         
 
     def shortest_path(self, graph: MultiDiGraph, start_node: int, end_node: int) -> List:
@@ -21,10 +26,14 @@ class Planner:
             end_node (int): Unique ID of the end node within the graph.
 
         Returns:
-            List: [xxx, yyy, zzz] A sequence of nodes that form the shortest path.
+            List: [xxx, yyy, zzz] A sequence of nodes that form the shortest path, None when there is no path.
         """        
 
-        return ox.shortest_path(graph, start_node, end_node)
+        try:
+            return RoutingGraph.for_graph(graph).shortest_path(start_node, end_node)
+        except nx.exception.NetworkXNoPath:
+            self.events.emit("leg_failed", start=int(start_node), end=int(end_node), reason="no_path")
+            return None
     
     def calculate_start_point_index(self, flower_angle: float, points_per_leaf: int) -> float:
         """
@@ -59,8 +68,8 @@ class Planner:
     
     def calculate_leaf_nodes(self, flower_angle: float, start_node: int, radius: float, variance: float, points_per_leaf: int, graph: MultiDiGraph) -> list:
         """
-        This method generates the nodes for each leaf in a flower-like pattern. Each iteration of this function rerurns 1 "incomplete" route.
-        In the main function of the SmartRouteMaker, this function is called multiple times to generate multiple routes.
+        This method generates the nodes for one leaf in a flower-like pattern, it returns 1 "incomplete" route.
+        See calculate_flower_leaf_nodes to generate all the leafs of the flower at once.
 
         Parameters
         ----------
@@ -73,47 +82,59 @@ class Planner:
 
         Returns
         -------
-        list: A list of node IDs representing the nodes for each leaf in the flower pattern.
+        list: A list of node IDs representing the nodes for the leaf in the flower pattern.
+        """
+
+        return self.calculate_flower_leaf_nodes([flower_angle], start_node, radius, variance, points_per_leaf, graph)[0]
 
-        The method first calculates the center of each leaf based on the flower_angle, radius, and variance.
-        It then generates a number of points (nodes) evenly spaced around the circumference of each leaf.
-        The nodes are ordered in the list such that the start node is first (this happens in methods used within this method). 
+    def calculate_flower_leaf_nodes(self, flower_angles: np.ndarray, start_node: int, radius: float, variance: float, points_per_leaf: int, graph: MultiDiGraph) -> list:
         """
-        #calculate where to put the start point in the circle
-        start_point_index = self.calculate_start_point_index(flower_angle, points_per_leaf)
+        This method generates the nodes for every leaf in a flower-like pattern. Every leaf is 1 "incomplete" route.
 
-        flower_direction = flower_angle
+        Parameters
+        ----------
+        flower_angles (np.ndarray): The angles of the leafs in radians.
+        points_per_leaf (int): The number of points (nodes) to generate for each leaf.
+        radius (float): The radius of each leaf in the flower pattern.
+        variance (float or np.ndarray): The variance in the radius of each leaf, one value for all leafs or one per leaf.
+        start_node (int): The node ID of the start node.
+        graph (networkx.Graph): The graph representing the area.
 
-        # Calculate the center of each leaf, based on the direction and the radius. Needs to be converted back to lon and lat, 111000 is the amount of meters in 1 degree of longitude/latitude
-        difference_lon = math.cos(flower_direction) * radius * variance / 111000
-        difference_lat = math.sin(flower_direction) * radius * variance / 111000
+        Returns
+        -------
+        list: A list with a list of node IDs per leaf, in the order of the flower angles.
 
-        leaf_center_lon = float(graph.nodes[start_node]["x"]) + float(difference_lon)
-        leaf_center_lat = float(graph.nodes[start_node]["y"]) + float(difference_lat)
+        The method first calculates the centers of all leafs based on the flower angles, radius, and variance and snaps them to
+        the graph in one query. It then generates a number of points evenly spaced around the circumference of every leaf
+        and snaps all of those in one query as well. The nodes are ordered such that the start node is first.
+        """
+        flower_angles = np.asarray(flower_angles, dtype=float)
+        leaf_radii = radius * np.broadcast_to(np.asarray(variance, dtype=float), flower_angles.shape)
+        spatial_index = SpatialIndex.for_graph(graph)
 
-        # Get the node closest to the center of the leaf
-        leaf_center_node = self.graph.closest_node(graph, (leaf_center_lat, leaf_center_lon)) # lat = y, lon = x
+        # Calculate the center of each leaf, based on the direction and the radius. Needs to be converted back to lon and lat, 111000 is the amount of meters in 1 degree of longitude/latitude
+        start_lon = float(graph.nodes[start_node]["x"])
+        start_lat = float(graph.nodes[start_node]["y"])
+        leaf_center_lon = start_lon + np.cos(flower_angles) * leaf_radii / 111000
+        leaf_center_lat = start_lat + np.sin(flower_angles) * leaf_radii / 111000
 
-        # generate leaf angles depending on the number of leafs to be generated
-        leaf_angles = np.linspace(0, 2 * np.pi, points_per_leaf)
-        #create leaf nodes list for each leaf
-        leaf_nodes = []
-        # Create a circle around the current leaf_center_node an dcreate points on this leaf to make a route
-        for leaf_angle in leaf_angles:
+        # Get the nodes closest to the centers of the leafs
+        leaf_center_indices = spatial_index.nearest_indices(leaf_center_lat, leaf_center_lon) # lat = y, lon = x
 
-            leaf_direction = leaf_angle
-            # Calculate the center of each leaf, based on the direction and the radius. Needs to be converted back to lon and lat, 111000 is the amount of meters in 1 degree of longitude/latitude
-            difference_lon = math.cos(leaf_direction) * radius * variance / 111000
-            difference_lat = math.sin(leaf_direction) * radius * variance / 111000
+        # Create a circle around every leaf center node and create points on it to make a route, one row per leaf
+        leaf_angles = np.linspace(0, 2 * np.pi, points_per_leaf)
+        leaf_node_lon = spatial_index.lon[leaf_center_indices][:, None] + np.cos(leaf_angles)[None, :] * leaf_radii[:, None] / 111000
+        leaf_node_lat = spatial_index.lat[leaf_center_indices][:, None] + np.sin(leaf_angles)[None, :] * leaf_radii[:, None] / 111000
 
-            leaf_node_lon = float(graph.nodes[leaf_center_node]["x"]) + float(difference_lon)
-            leaf_node_lat = float(graph.nodes[leaf_center_node]["y"]) + float(difference_lat)
+        leaf_nodes = spatial_index.nearest_nodes(leaf_node_lat.ravel(), leaf_node_lon.ravel()).reshape(len(flower_angles), points_per_leaf)
 
-            leaf_node = self.graph.closest_node(graph, (leaf_node_lat, leaf_node_lon))
+        leaf_paths = []
+        for flower_angle, nodes in zip(flower_angles, leaf_nodes):
+            #calculate where to put the start point in the circle
+            start_point_index = self.calculate_start_point_index(flower_angle, points_per_leaf)
 
-            leaf_nodes.append(leaf_node)
+            # Get the list in the correct order with the start node included
+            #leaf paths only consist of the calculated nodes, these are later then converted to actual paths with all nodes
+            leaf_paths.append(self.graph.insert_start_node_and_rearrange(nodes.tolist(), start_node, start_point_index))
 
-        # Get the list in the correct order with the start node included
-        leaf_nodes = self.graph.insert_start_node_and_rearrange(leaf_nodes, start_node, start_point_index)
-        #leaf paths only consist of the calculated nodes, these are later then converted to actual paths with all nodes
-        return leaf_nodes
+        return leaf_paths
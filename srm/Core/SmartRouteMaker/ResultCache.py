@@ -0,0 +1,291 @@
+import os
+import time
+import pickle
+import hashlib
+import threading
+import weakref
+import numpy as np
+from collections import OrderedDict
+from networkx import MultiDiGraph
+
+from srm.Core.SmartRouteMaker import Settings
+
+_shared_cache = None
+_shared_lock = threading.Lock()
+
+_graph_versions = weakref.WeakKeyDictionary()
+_graph_versions_lock = threading.Lock()
+
+
+def shared(settings: dict) -> 'ResultCache':
+    """Gets the process-wide result cache, creating it on first use.
+
+    Args:
+        settings (dict): The result_cache section of the planner settings.
+
+    Returns:
+        ResultCache: The cache shared by every facade in this process.
+    """
+
+    global _shared_cache
+
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ResultCache(**settings)
+
+    return _shared_cache
+
+
+def graph_version(graph: MultiDiGraph) -> str:
+    """Gets a version of a graph that changes when its nodes or edges change, computed once per graph.
+
+    The version is derived from the content instead of the object, so the same area loaded again, in this or
+    another process, gets the same version and the results planned on it stay valid.
+
+    Args:
+        graph (MultiDiGraph): Instance of an osmnx graph.
+
+    Returns:
+        str: Hex digest of the node IDs and the number of edges.
+    """
+
+    with _graph_versions_lock:
+        version = _graph_versions.get(graph)
+
+    if version is None:
+        node_ids = np.sort(np.fromiter(graph.nodes, dtype=np.int64, count=graph.number_of_nodes()))
+        digest = hashlib.sha1(node_ids.tobytes())
+        digest.update(str(graph.number_of_edges()).encode())
+        version = digest.hexdigest()
+
+        with _graph_versions_lock:
+            _graph_versions[graph] = version
+
+    return version
+
+
+class ResultCache:
+    """Cache of planned routes, so a request that was planned before is answered without planning it again.
+
+    Results are keyed by the snapped start and end node, the quantized inputs and the version of the graph, so
+    resubmitting (almost) the same form hits the cache while a changed graph never serves an old route. Entries
+    expire after ttl seconds and the least recently used ones are evicted when the cache grows beyond max_size_mb.
+    With a disk directory the results are also stored on disk, where other processes and restarts find them.
+    """
+
+    def __init__(self, ttl: float = 3600, max_size_mb: float = 64, length_step: float = 100, elevation_step: float = 10,
+                 percentage_step: float = 5, disk: dict = None, **kwargs) -> None:
+        """Initialize the cache.
+
+        Args:
+            ttl (float, optional): Seconds a result is served. Defaults to 3600.
+            max_size_mb (float, optional): Size the results in memory may take before the least recently used ones are evicted. Defaults to 64.
+            length_step (float, optional): Meters a requested length is rounded to in the key. Defaults to 100.
+            elevation_step (float, optional): Meters a requested elevation difference is rounded to in the key. Defaults to 10.
+            percentage_step (float, optional): Percents a requested percentage of hardened surfaces is rounded to in the key. Defaults to 5.
+            disk (dict, optional): {"enabled", "directory", "max_size_mb"} of the on-disk backend. Defaults to None, memory only.
+        """
+
+        self.ttl = ttl
+        self.max_size = max_size_mb * 1024 * 1024
+        self.steps = {'length': length_step, 'elevation': elevation_step, 'percentage': percentage_step}
+        self.results = OrderedDict()
+        self.size = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if disk is not None and disk.get('enabled'):
+            self.directory = Settings.resolve_path(disk['directory'])
+            self.max_disk_size = disk.get('max_size_mb', 512) * 1024 * 1024
+            os.makedirs(self.directory, exist_ok=True)
+        else:
+            self.directory = None
+
+    def quantize(self, value: float, step: str) -> float:
+        """Rounds an input to its step in the key, None stays None.
+
+        Args:
+            value (float): The input, e.g. the requested length.
+            step (str): "length", "elevation" or "percentage".
+
+        Returns:
+            float: The rounded input.
+        """
+
+        if value is None:
+            return None
+
+        return round(value / self.steps[step]) * self.steps[step]
+
+    def key(self, kind: str, graph: MultiDiGraph, start_node: int, end_node: int, options: dict, **inputs) -> str:
+        """Builds the key of a result.
+
+        Args:
+            kind (str): What was planned, "route" or "circular_route".
+            graph (MultiDiGraph): The graph the result is planned on.
+            start_node (int): Snapped start node.
+            end_node (int): Snapped end node.
+            options (dict): Analysis options, they change what the result contains. "visualize" only draws images and is left out.
+            **inputs: The inputs of the planner, already quantized.
+
+        Returns:
+            str: Hex digest that identifies the result.
+        """
+
+        options = sorted((option, value) for option, value in options.items() if option != 'visualize')
+        parts = (kind, graph_version(graph), int(start_node), int(end_node), options, sorted(inputs.items()))
+
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def get(self, key: str) -> dict:
+        """Fetches a result from memory, or from disk when it is not in memory.
+
+        Args:
+            key (str): Key from key().
+
+        Returns:
+            dict: A copy of the cached result, None when it is not cached or expired.
+        """
+
+        with self.lock:
+            entry = self.results.get(key)
+
+            if entry is not None and entry[0] + self.ttl < time.time():
+                self._remove(key)
+                entry = None
+
+            if entry is not None:
+                self.results.move_to_end(key)
+                self.hits += 1
+                return pickle.loads(entry[1])
+
+        entry = self._read_disk(key)
+
+        with self.lock:
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self.disk_hits += 1
+            self._store(key, entry)
+
+        return pickle.loads(entry[1])
+
+    def put(self, key: str, result: dict) -> None:
+        """Stores a result and evicts the least recently used ones when the cache is too large.
+
+        Args:
+            key (str): Key from key().
+            result (dict): Output of the planner, it has to be picklable.
+        """
+
+        entry = (time.time(), pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL))
+
+        with self.lock:
+            self._store(key, entry)
+
+        self._write_disk(key, entry)
+
+    def stats(self) -> dict:
+        """Gets the hit/miss statistics of the cache.
+
+        Returns:
+            dict: {'hits': 3, 'disk_hits': 1, 'misses': 1, 'hit_rate': 0.75, 'evictions': 0, 'entries': 1, 'size_mb': 0.2, 'steps': {...}}
+        """
+
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0,
+                'evictions': self.evictions,
+                'entries': len(self.results),
+                'size_mb': round(self.size / (1024 * 1024), 2),
+                'steps': dict(self.steps)
+            }
+
+    def _store(self, key: str, entry: tuple) -> None:
+        """Puts an entry in memory and evicts the least recently used entries, the caller holds the lock."""
+
+        if key in self.results:
+            self._remove(key)
+
+        self.results[key] = entry
+        self.size += len(entry[1])
+
+        while len(self.results) > 1 and self.size > self.max_size:
+            self._remove(next(iter(self.results)))
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        """Removes an entry from memory, the caller holds the lock."""
+
+        _, data = self.results.pop(key)
+        self.size -= len(data)
+
+    def _read_disk(self, key: str) -> tuple:
+        """Reads an entry from disk, None when there is no disk backend or the entry is missing, broken or expired."""
+
+        if self.directory is None:
+            return None
+
+        path = os.path.join(self.directory, f'{key}.pickle')
+        try:
+            with open(path, 'rb') as result_file:
+                entry = pickle.load(result_file)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+
+        if entry[0] + self.ttl < time.time():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        # The modification time orders the entries on disk from least to most recently used
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+        return entry
+
+    def _write_disk(self, key: str, entry: tuple) -> None:
+        """Writes an entry to disk atomically and removes the oldest entries when the directory is too large."""
+
+        if self.directory is None:
+            return
+
+        path = os.path.join(self.directory, f'{key}.pickle')
+        temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as result_file:
+            pickle.dump(entry, result_file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, path)
+
+        files = []
+        for file in os.scandir(self.directory):
+            if file.name.endswith('.pickle'):
+                try:
+                    stat = file.stat()
+                except OSError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, file.path))
+
+        files.sort()
+        total_size = sum(size for _, size, _ in files)
+        while len(files) > 1 and total_size > self.max_disk_size:
+            _, size, oldest = files.pop(0)
+            total_size -= size
+            try:
+                os.remove(oldest)
+            except OSError:
+                pass
+            with self.lock:
+                self.evictions += 1
@@ -0,0 +1,125 @@
+import numpy as np
+import osmnx as ox
+from functools import cached_property
+from typing import OrderedDict
+from networkx import MultiDiGraph
+
+from srm.Core.SmartRouteMaker import EdgeTable
+from srm.Core.SmartRouteMaker import Elevation
+
+
+class Route:
+    """A route through a graph together with its metrics.
+
+    Every metric is computed the first time it is needed and then kept, so the analyzer, the facade and the visualizer
+    can share one Route and no metric is computed twice in a request. compute_metrics() fills the metrics of many
+    candidate routes at once.
+    """
+
+    def __init__(self, graph: MultiDiGraph, path: list, length: float = None, max_grade: float = None) -> None:
+        """Initialize the route.
+
+        Args:
+            graph (MultiDiGraph): Instance of an osmnx graph the route goes through.
+            path (list): Sequence of node IDs that form the route.
+            length (float, optional): Length of the route in meters when it is already known. Defaults to the sum of the edge lengths.
+            max_grade (float, optional): Maximum uphill grade (rise over run) the route was searched with, between two nodes
+            it then takes the shortest edge that is not too steep. Defaults to None, the shortest edge.
+        """
+
+        self.graph = graph
+        self.path = path
+        self.edge_table = EdgeTable.for_graph(graph, max_grade)
+
+        if length is not None:
+            self.__dict__['length'] = length
+
+    @staticmethod
+    def compute_metrics(routes: list) -> None:
+        """Computes the length, climb, hardened fraction and max grade of many routes through the same graph in one gather per metric.
+
+        Args:
+            routes (list): Routes through the same graph with the same max_grade, the routes that already have their metrics are skipped.
+        """
+
+        routes = [route for route in routes if 'climb' not in route.__dict__]
+        if not routes:
+            return
+
+        graph = routes[0].graph
+        paths = [route.path for route in routes]
+        edge_table = routes[0].edge_table
+
+        lengths = edge_table.path_lengths(paths)
+        climbs = Elevation.for_graph(graph).elevation_gains(paths)
+        hardened_lengths = edge_table.hardened_lengths(paths)
+        max_grades = edge_table.max_grades(paths)
+
+        for route, length, climb, hardened_length, max_grade in zip(routes, lengths.tolist(), climbs.tolist(), hardened_lengths.tolist(), max_grades.tolist()):
+            route.__dict__.setdefault('length', length)
+            route.__dict__['climb'] = climb
+            route.__dict__['hardened'] = hardened_length / route.length if route.length > 0 else 0
+            route.__dict__['max_grade'] = max_grade
+
+    @cached_property
+    def length(self) -> float:
+        """Length of the route in meters."""
+
+        return float(self.edge_table.path_lengths([self.path])[0])
+
+    @cached_property
+    def node_elevations(self) -> np.ndarray:
+        """Elevation in meters of every node of the route, NaN when it is unknown."""
+
+        return Elevation.for_graph(self.graph).path_elevations(self.path)
+
+    @cached_property
+    def climb(self) -> float:
+        """Total positive elevation difference of the route in meters."""
+
+        return float(Elevation.for_graph(self.graph).elevation_gains([self.path])[0])
+
+    @cached_property
+    def hardened(self) -> float:
+        """Fraction (0 to 1) of the length of the route on hardened surfaces."""
+
+        if self.length <= 0:
+            return 0
+
+        return float(self.edge_table.hardened_lengths([self.path])[0] / self.length)
+
+    @cached_property
+    def max_grade(self) -> float:
+        """Steepest uphill grade (rise over run) of the route, like the grades of the edges it is compared with."""
+
+        return float(self.edge_table.max_grades([self.path])[0])
+
+    @cached_property
+    def coordinates(self) -> list:
+        """[latitude, longitude] of every node of the route."""
+
+        return [[self.graph.nodes[node]['y'], self.graph.nodes[node]['x']] for node in self.path]
+
+    @cached_property
+    def edge_attributes(self) -> OrderedDict:
+        """Attributes per edge of the route, the edge data of the graph so they must not be modified."""
+
+        return ox.utils_graph.get_route_edge_attributes(self.graph, self.path)
+
+    @cached_property
+    def surface_distribution(self) -> dict:
+        """Distribution of surface types within the route.
+
+        Returns:
+            dict: {'surface_name': 83.22, ...} kilometers per surface, in the order the surfaces first appear along the route.
+        """
+
+        edge_table = self.edge_table
+        rows = edge_table.edge_rows(self.path)
+        rows = rows[rows >= 0]
+
+        surface_codes = edge_table.surface_codes[rows]
+        distances = np.bincount(surface_codes, weights=edge_table.lengths[rows], minlength=len(edge_table.surface_names)).tolist()
+        codes, first_positions = np.unique(surface_codes, return_index=True)
+
+        return {edge_table.surface_names[code]: round(distances[code] / 1000, 2) for code in codes[np.argsort(first_positions)].tolist()}
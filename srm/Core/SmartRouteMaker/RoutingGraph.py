@@ -0,0 +1,480 @@
+import math
+import heapq
+import weakref
+import threading
+import numpy as np
+import networkx as nx
+from collections import OrderedDict, defaultdict
+from networkx import MultiDiGraph
+
+from srm.Core.SmartRouteMaker import ContractionHierarchy
+from srm.Core.SmartRouteMaker import EventHook
+
+# Routing graphs are built once per loaded graph and live as long as the graph they were built from
+_routing_graphs = weakref.WeakKeyDictionary()
+_routing_graphs_lock = threading.Lock()
+
+
+def for_graph(graph: MultiDiGraph) -> 'RoutingGraph':
+    """Gets the routing graph of an osmnx graph, building it on first use.
+
+    Args:
+        graph (MultiDiGraph): Instance of an osmnx graph.
+
+    Returns:
+        RoutingGraph: Compact routing representation of the graph.
+    """
+
+    with _routing_graphs_lock:
+        routing_graph = _routing_graphs.get(graph)
+
+        if routing_graph is None:
+            routing_graph = RoutingGraph.from_graph(graph)
+            _routing_graphs[graph] = routing_graph
+            ContractionHierarchy.schedule(routing_graph)
+
+    return routing_graph
+
+
+class RoutingGraph:
+    """Compact array-backed routing representation of a graph.
+
+    Nodes are numbered 0..n-1 in the order of their sorted osm IDs, the adjacency is stored as CSR arrays with
+    one edge per (u, v) pair carrying the length of the shortest parallel edge, like osmnx picks it for routing.
+    The reversed adjacency is stored as well for backward searches. All public methods take and return osm node IDs.
+    """
+
+    EARTH_RADIUS = 6371009
+    # The heuristic has to stay below the real distance, edge lengths are rounded by osmnx and stored as float32
+    HEURISTIC_FACTOR = 0.99
+
+    # Number of restricted or reweighted versions of a routing graph that are kept, e.g. one per requested max steepness
+    MAX_VARIANTS = 8
+
+    ARRAY_NAMES = ('node_ids', 'lat', 'lon', 'indptr', 'indices', 'lengths', 'reverse_indptr', 'reverse_indices', 'reverse_lengths', 'heuristic_factor')
+
+    def __init__(self, node_ids: np.ndarray, lat: np.ndarray, lon: np.ndarray, indptr: np.ndarray, indices: np.ndarray, lengths: np.ndarray,
+                 reverse_indptr: np.ndarray, reverse_indices: np.ndarray, reverse_lengths: np.ndarray, heuristic_factor: np.ndarray = None) -> None:
+        """Initialize the routing graph from its arrays.
+
+        Args:
+            node_ids (np.ndarray): Sorted int64 osm IDs, the position of an ID is its node index.
+            lat (np.ndarray): Latitude of every node.
+            lon (np.ndarray): Longitude of every node.
+            indptr (np.ndarray): CSR row pointers, the outgoing edges of node i are indptr[i]:indptr[i + 1].
+            indices (np.ndarray): Target node index of every edge.
+            lengths (np.ndarray): float32 length in meters of every edge.
+            reverse_indptr (np.ndarray): CSR row pointers of the incoming edges.
+            reverse_indices (np.ndarray): Source node index of every incoming edge.
+            reverse_lengths (np.ndarray): float32 length in meters of every incoming edge.
+            heuristic_factor (np.ndarray, optional): Single value the haversine distance is multiplied with in the heuristic,
+            has to be lower when edges cost less than their length. Defaults to HEURISTIC_FACTOR.
+        """
+
+        self.node_ids = node_ids
+        self.lat = lat
+        self.lon = lon
+        self.indptr = indptr
+        self.indices = indices
+        self.lengths = lengths
+        self.reverse_indptr = reverse_indptr
+        self.reverse_indices = reverse_indices
+        self.reverse_lengths = reverse_lengths
+        self.heuristic_factor = np.array([self.HEURISTIC_FACTOR]) if heuristic_factor is None else heuristic_factor
+
+        # Indexing a memoryview gives python numbers without copying the arrays, much faster than numpy scalars in the search loop
+        self._forward = (memoryview(indptr), memoryview(indices), memoryview(lengths))
+        self._backward = (memoryview(reverse_indptr), memoryview(reverse_indices), memoryview(reverse_lengths))
+        lat_radians = np.radians(lat)
+        self._coordinates = (memoryview(lat_radians), memoryview(np.radians(lon)), memoryview(np.cos(lat_radians)))
+        self._heuristic_scale = 2 * self.EARTH_RADIUS * float(self.heuristic_factor[0])
+
+        # Attached once it is loaded or built in the background, searches use A* until then
+        self.contraction_hierarchy = None
+
+        # Restricted and reweighted versions of this routing graph, see variant()
+        self.variants = OrderedDict()
+        self.variants_lock = threading.Lock()
+
+        self.searches = 0
+        self.settled_nodes = 0
+
+    def to_arrays(self) -> dict:
+        """Gets the arrays that fully describe the routing graph, e.g. to place them in shared memory.
+
+        Returns:
+            dict: {'node_ids': array, 'lat': array, ...} every array in ARRAY_NAMES.
+        """
+
+        return {name: getattr(self, name) for name in self.ARRAY_NAMES}
+
+    @classmethod
+    def from_arrays(cls, arrays: dict) -> 'RoutingGraph':
+        """Creates a routing graph on top of existing arrays without copying them.
+
+        Args:
+            arrays (dict): Arrays from to_arrays().
+
+        Returns:
+            RoutingGraph: Routing graph using the given arrays.
+        """
+
+        return cls(*[arrays[name] for name in cls.ARRAY_NAMES])
+
+    @classmethod
+    def from_graph(cls, graph: MultiDiGraph) -> 'RoutingGraph':
+        """Builds the routing graph of an osmnx graph.
+
+        Args:
+            graph (MultiDiGraph): Instance of an osmnx graph.
+
+        Returns:
+            RoutingGraph: Compact routing representation of the graph.
+        """
+
+        node_ids = np.array(sorted(graph.nodes), dtype=np.int64)
+        lat = np.array([graph.nodes[node_id]['y'] for node_id in node_ids.tolist()], dtype=np.float64)
+        lon = np.array([graph.nodes[node_id]['x'] for node_id in node_ids.tolist()], dtype=np.float64)
+        edges = list(graph.edges(data='length'))
+
+        u = np.searchsorted(node_ids, np.array([edge[0] for edge in edges], dtype=np.int64))
+        v = np.searchsorted(node_ids, np.array([edge[1] for edge in edges], dtype=np.int64))
+        lengths = np.array([edge[2] for edge in edges], dtype=np.float64)
+
+        # Sort the edges by (u, v, length) and keep the shortest of every set of parallel edges
+        keys = u * len(node_ids) + v
+        order = np.lexsort((lengths, keys))
+        keys, u, v, lengths = keys[order], u[order], v[order], lengths[order]
+        first = np.ones(len(keys), dtype=bool)
+        first[1:] = keys[1:] != keys[:-1]
+
+        return cls.from_edges(node_ids, lat, lon, u[first], v[first], lengths[first])
+
+    @classmethod
+    def from_edges(cls, node_ids: np.ndarray, lat: np.ndarray, lon: np.ndarray, u: np.ndarray, v: np.ndarray, lengths: np.ndarray, heuristic_factor: float = None) -> 'RoutingGraph':
+        """Builds the routing graph of a set of edges.
+
+        Args:
+            node_ids (np.ndarray): Sorted int64 osm IDs, the position of an ID is its node index.
+            lat (np.ndarray): Latitude of every node.
+            lon (np.ndarray): Longitude of every node.
+            u (np.ndarray): Start node index of every edge, sorted by start and then end node index without duplicates.
+            v (np.ndarray): End node index of every edge.
+            lengths (np.ndarray): Length in meters, or cost, of every edge.
+            heuristic_factor (float, optional): See __init__. Defaults to HEURISTIC_FACTOR.
+
+        Returns:
+            RoutingGraph: Compact routing representation of the edges.
+        """
+
+        indptr = np.searchsorted(u, np.arange(len(node_ids) + 1)).astype(np.int32)
+
+        # The same edges ordered by target node for the backward search
+        reverse_order = np.lexsort((u, v))
+        reverse_indptr = np.searchsorted(v[reverse_order], np.arange(len(node_ids) + 1)).astype(np.int32)
+
+        return cls(node_ids, lat, lon, indptr, v.astype(np.int32), lengths.astype(np.float32),
+                   reverse_indptr, u[reverse_order].astype(np.int32), lengths[reverse_order].astype(np.float32),
+                   None if heuristic_factor is None else np.array([heuristic_factor]))
+
+    def variant(self, key: tuple, keep: np.ndarray = None, costs: np.ndarray = None) -> 'RoutingGraph':
+        """Gets a version of the routing graph with only some of the edges, e.g. only the edges that are not too steep, or
+        with other edge costs than their length, e.g. costs that prefer a surface type.
+
+        The versions are built once per key and kept with this routing graph, the least recently used one is dropped
+        when there are more than MAX_VARIANTS. Searches on a version with costs return the cost of the path as its length.
+
+        Args:
+            key (tuple): Identifies the version, e.g. (("max_grade", 0.08),).
+            keep (np.ndarray, optional): Boolean per edge, in the order of the edges of this routing graph, of the edges to keep. Defaults to all edges.
+            costs (np.ndarray, optional): Cost of every edge, in the order of the edges of this routing graph. Defaults to the lengths.
+
+        Returns:
+            RoutingGraph: Routing graph with the same nodes and the kept edges.
+        """
+
+        with self.variants_lock:
+            if key in self.variants:
+                self.variants.move_to_end(key)
+                return self.variants[key]
+
+            if keep is None:
+                keep = np.ones(len(self.indices), dtype=bool)
+
+            heuristic_factor = float(self.heuristic_factor[0])
+            if costs is None:
+                costs = self.lengths
+            else:
+                # The heuristic stays a lower bound when it is scaled down by the largest discount on any edge
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    discounts = costs / self.lengths
+                discounts = discounts[np.isfinite(discounts)]
+                if len(discounts):
+                    heuristic_factor *= min(float(discounts.min()), 1)
+
+            u = np.repeat(np.arange(len(self.node_ids), dtype=np.int64), np.diff(self.indptr))
+            variant = RoutingGraph.from_edges(self.node_ids, self.lat, self.lon, u[keep], self.indices[keep].astype(np.int64), costs[keep], heuristic_factor)
+
+            self.variants[key] = variant
+            while len(self.variants) > self.MAX_VARIANTS:
+                self.variants.popitem(last=False)
+
+            return variant
+
+    def node_index(self, node_id: int) -> int:
+        """Gets the node index of an osm node ID.
+
+        Args:
+            node_id (int): Unique ID of a node within the graph.
+
+        Returns:
+            int: Index of the node in the arrays.
+        """
+
+        index = int(np.searchsorted(self.node_ids, node_id))
+
+        if index >= len(self.node_ids) or self.node_ids[index] != node_id:
+            raise nx.NodeNotFound(f"Node {node_id} not in graph")
+
+        return index
+
+    def shortest_path(self, start_node: int, end_node: int) -> list:
+        """Get the shortest path between two nodes.
+
+        Args:
+            start_node (int): Unique ID of the start node within the graph.
+            end_node (int): Unique ID of the end node within the graph.
+
+        Raises:
+            nx.NetworkXNoPath: When the end node can not be reached from the start node.
+
+        Returns:
+            list: [xxx, yyy, zzz] A sequence of node IDs that form the shortest path.
+        """
+
+        return self.shortest_path_and_length(start_node, end_node)[0]
+
+    def shortest_path_length(self, start_node: int, end_node: int) -> float:
+        """Get the length of the shortest path between two nodes.
+
+        Args:
+            start_node (int): Unique ID of the start node within the graph.
+            end_node (int): Unique ID of the end node within the graph.
+
+        Raises:
+            nx.NetworkXNoPath: When the end node can not be reached from the start node.
+
+        Returns:
+            float: Length in meters of the shortest path.
+        """
+
+        return self.shortest_path_and_length(start_node, end_node)[1]
+
+    def shortest_path_and_length(self, start_node: int, end_node: int) -> tuple:
+        """Get the shortest path between two nodes and its length from a single search.
+
+        Args:
+            start_node (int): Unique ID of the start node within the graph.
+            end_node (int): Unique ID of the end node within the graph.
+
+        Raises:
+            nx.NetworkXNoPath: When the end node can not be reached from the start node.
+
+        Returns:
+            tuple: (path, length) the node IDs of the shortest path and its length in meters.
+        """
+
+        if self.contraction_hierarchy is not None:
+            path, length = self.contraction_hierarchy.query(self.node_index(start_node), self.node_index(end_node))
+        else:
+            path, length, _ = self.bidirectional_search(self.node_index(start_node), self.node_index(end_node))
+
+        if path is None:
+            raise nx.NetworkXNoPath(f"No path between {start_node} and {end_node}.")
+
+        return self.node_ids[path].tolist(), length
+
+    def route_leaf(self, leaf_path: list, start_node: int, legs: dict = None) -> tuple:
+        """Glues the shortest paths between the consecutive points of a leaf path together to one full route.
+
+        Args:
+            leaf_path (list): Node IDs of the points of the leaf, starting and ending at the start node.
+            start_node (int): Unique ID of the start node.
+            legs (dict, optional): Already searched legs {(u, v): (path, length) or None when there is no path}. Legs that are
+            missing are searched and added. Defaults to None.
+
+        Returns:
+            tuple: (path, path_length) the full route and its length in meters, path is empty when a leg could not be routed.
+        """
+
+        if legs is None:
+            legs = {}
+
+        path = []
+        temp_path_lengths = []
+        # Loop through all shortest paths between the point and add them to 1 path
+        for i in range(0, len(leaf_path) - 1):
+            leg = (leaf_path[i], leaf_path[i + 1])
+            if leg not in legs:
+                legs[leg] = self.search_leg(*leg)
+
+            if legs[leg] is None:
+                # No path, a route with a gap in it is no route at all
+                EventHook.shared().emit("leg_failed", start=int(leg[0]), end=int(leg[1]), reason="no_path")
+                return [], 0
+
+            leg_path, leg_length = legs[leg]
+            temp_path_lengths.append(round(leg_length / 1000, 2))
+            # leave out the last node to prevent doubles ( start of next path is end of previous path)
+            path.extend(leg_path[:-1])
+
+        if path != []:
+            #add the start node to the end to make a full circle
+            path.append(start_node)
+
+        return path, sum(temp_path_lengths) * 1000
+
+    def search_leg(self, start_node: int, end_node: int) -> tuple:
+        """Searches one leg of a route.
+
+        Args:
+            start_node (int): Unique ID of the start node within the graph.
+            end_node (int): Unique ID of the end node within the graph.
+
+        Returns:
+            tuple: (path, length) of the leg, None when there is no path.
+        """
+
+        if start_node == end_node:
+            return [start_node], 0.0
+
+        try:
+            return self.shortest_path_and_length(start_node, end_node)
+        except nx.exception.NetworkXNoPath:
+            return None
+
+    def heuristic(self, node: int, target: int) -> float:
+        """Haversine distance in meters from a node to a target node, a lower bound of the real path length.
+
+        Args:
+            node (int): Node index of the node.
+            target (int): Node index of the target.
+
+        Returns:
+            float: Lower bound of the distance from the node to the target.
+        """
+
+        lat, lon, cos_lat = self._coordinates
+        a = math.sin((lat[node] - lat[target]) / 2) ** 2 + cos_lat[node] * cos_lat[target] * math.sin((lon[node] - lon[target]) / 2) ** 2
+
+        return self._heuristic_scale * math.asin(math.sqrt(min(a, 1)))
+
+    def bidirectional_search(self, start: int, end: int, use_heuristic: bool = True) -> tuple:
+        """Bidirectional A* search between two node indices.
+
+        Both directions use the average of the haversine distances to the end and from the start as potential, which keeps
+        the potentials of both directions consistent with each other, so the search stops as soon as the smallest keys of both
+        queues add up to the best path found. Without heuristic this is a bidirectional Dijkstra search.
+
+        Args:
+            start (int): Node index of the start node.
+            end (int): Node index of the end node.
+            use_heuristic (bool, optional): Guide the search with the haversine heuristic. Defaults to True.
+
+        Returns:
+            tuple: (path, length, settled) node indices of the shortest path, its length in meters and the number of settled
+            nodes. path and length are None when there is no path.
+        """
+
+        if start == end:
+            return [start], 0.0, 0
+
+        # The potential is only computed for the nodes the search reaches, a search settles a tiny part of a large graph
+        if use_heuristic:
+            potential = Potential(self, start, end)
+        else:
+            potential = defaultdict(float)
+
+        # Forward keys are distance + potential, backward keys distance - potential
+        distances = ({start: 0.0}, {end: 0.0})
+        predecessors = ({start: -1}, {end: -1})
+        queues = ([(potential[start], start)], [(-potential[end], end)])
+        settled = (set(), set())
+        adjacency = (self._forward, self._backward)
+        signs = (1, -1)
+
+        best_length = math.inf
+        meeting_node = -1
+
+        while queues[0] and queues[1]:
+            if queues[0][0][0] + queues[1][0][0] >= best_length:
+                break
+
+            # Expand the direction with the smallest queue
+            direction = 0 if len(queues[0]) <= len(queues[1]) else 1
+            _, node = heapq.heappop(queues[direction])
+
+            if node in settled[direction]:
+                continue
+            settled[direction].add(node)
+
+            own_distances = distances[direction]
+            other_distances = distances[1 - direction]
+            own_predecessors = predecessors[direction]
+            queue = queues[direction]
+            sign = signs[direction]
+            indptr, indices, lengths = adjacency[direction]
+            node_distance = own_distances[node]
+
+            for edge in range(indptr[node], indptr[node + 1]):
+                neighbour = indices[edge]
+                distance = node_distance + lengths[edge]
+
+                if distance < own_distances.get(neighbour, math.inf):
+                    own_distances[neighbour] = distance
+                    own_predecessors[neighbour] = node
+                    heapq.heappush(queue, (distance + sign * potential[neighbour], neighbour))
+
+                    if neighbour in other_distances and distance + other_distances[neighbour] < best_length:
+                        best_length = distance + other_distances[neighbour]
+                        meeting_node = neighbour
+
+        settled_count = len(settled[0]) + len(settled[1])
+        self.searches += 1
+        self.settled_nodes += settled_count
+
+        if meeting_node == -1:
+            return None, None, settled_count
+
+        path = [meeting_node]
+        while predecessors[0][path[-1]] != -1:
+            path.append(predecessors[0][path[-1]])
+        path.reverse()
+        while predecessors[1][path[-1]] != -1:
+            path.append(predecessors[1][path[-1]])
+
+        return path, best_length, settled_count
+
+
+class Potential(dict):
+    """Potential of a bidirectional A* search, the average of the haversine distances to the end and from the start of a
+    node, computed the first time the search asks for the node."""
+
+    def __init__(self, routing_graph: RoutingGraph, start: int, end: int) -> None:
+        """Initialize the potential of a search.
+
+        Args:
+            routing_graph (RoutingGraph): The searched routing graph.
+            start (int): Node index of the start node.
+            end (int): Node index of the end node.
+        """
+
+        super().__init__()
+        self.heuristic = routing_graph.heuristic
+        self.start = start
+        self.end = end
+
+    def __missing__(self, node: int) -> float:
+        value = (self.heuristic(node, self.end) - self.heuristic(node, self.start)) / 2
+        self[node] = value
+        return value
@@ -0,0 +1,104 @@
+import numpy as np
+
+from srm.Core.SmartRouteMaker import Settings
+from srm.Core.SmartRouteMaker import Route
+from srm.Core.SmartRouteMaker import EdgeTable
+
+
+class ScoringEngine:
+    """Scores candidate routes against the user input with array operations.
+
+    Every candidate is described by a row of metrics, see METRICS. Every objective that has a target adds its weighted
+    relative difference between metric and target to the score, the lower the score the better the route matches the input.
+    Hard constraints are masks, a candidate that breaks one is never ranked.
+    """
+
+    METRICS = ('length', 'climb', 'hardened', 'max_grade')
+    LENGTH, CLIMB, HARDENED, MAX_GRADE = range(len(METRICS))
+
+    def __init__(self, weights: dict = None) -> None:
+        """Initialize the scoring engine.
+
+        Args:
+            weights (dict, optional): Weight per objective, e.g. {'length': 1.0, 'climb': 1.0, 'hardened': 1.0}. An objective
+            with weight 0 is ignored. Defaults to the scoring settings.
+        """
+
+        self.weights = weights if weights is not None else Settings.load('PlannerSettings')['scoring']['weights']
+
+    def metrics(self, routes: list) -> np.ndarray:
+        """Builds the metric matrix of candidate routes, every metric is gathered for all candidates at once.
+
+        The metrics stay cached on the routes, so the winner does not compute them again.
+
+        Args:
+            routes (list): Candidate routes through the same graph.
+
+        Returns:
+            np.ndarray: (candidates, METRICS) length in meters, climb in meters, hardened fraction (0 to 1) and max grade (rise over run).
+        """
+
+        Route.Route.compute_metrics(routes)
+
+        return np.array([[route.length, route.climb, route.hardened, route.max_grade] for route in routes], dtype=float).reshape(len(routes), len(self.METRICS))
+
+    def scores(self, metrics: np.ndarray, max_length: float, elevation_diff_input: float = None, percentage_hard_input: float = None) -> np.ndarray:
+        """Scores every candidate, the objectives without a target are left out.
+
+        Args:
+            metrics (np.ndarray): Metric matrix from metrics().
+            max_length (float): Inputted length of the route in meters.
+            elevation_diff_input (float, optional): Inputted elevation difference in meters.
+            percentage_hard_input (float, optional): Inputted percentage of hardened surfaces.
+
+        Returns:
+            np.ndarray: Score of every candidate, the lower the better.
+        """
+
+        scores = self.weights.get('length', 1.0) * np.abs(metrics[:, self.LENGTH] - max_length) / max_length
+
+        if elevation_diff_input is not None and self.weights.get('climb', 1.0):
+            scores += self.weights.get('climb', 1.0) * np.abs(metrics[:, self.CLIMB] - elevation_diff_input) / max(elevation_diff_input, 1)
+
+        if percentage_hard_input is not None and self.weights.get('hardened', 1.0):
+            scores += self.weights.get('hardened', 1.0) * np.abs(metrics[:, self.HARDENED] - percentage_hard_input / 100)
+
+        return scores
+
+    def feasible(self, metrics: np.ndarray, max_steepness: float = None) -> np.ndarray:
+        """Applies the hard constraints.
+
+        Args:
+            metrics (np.ndarray): Metric matrix from metrics().
+            max_steepness (float, optional): Inputted max steepness in percent, the route may never be steeper.
+
+        Returns:
+            np.ndarray: Boolean of every candidate that meets all constraints.
+        """
+
+        feasible = np.ones(len(metrics), dtype=bool)
+
+        # The same check as the leg searches, so a route of legs that were found within the steepness is never rejected
+        if max_steepness is not None:
+            feasible &= ~EdgeTable.too_steep(metrics[:, self.MAX_GRADE], max_steepness / 100)
+
+        return feasible
+
+    def rank(self, metrics: np.ndarray, max_length: float, elevation_diff_input: float = None, percentage_hard_input: float = None, max_steepness: float = None) -> tuple:
+        """Ranks the candidates that meet the constraints from best to worst.
+
+        Args:
+            metrics (np.ndarray): Metric matrix from metrics().
+            max_length (float): Inputted length of the route in meters.
+            elevation_diff_input (float, optional): Inputted elevation difference in meters.
+            percentage_hard_input (float, optional): Inputted percentage of hardened surfaces.
+            max_steepness (float, optional): Inputted max steepness in percent.
+
+        Returns:
+            tuple: (ranking, scores) the rows of the feasible candidates ordered by score, and the score of every candidate.
+        """
+
+        scores = self.scores(metrics, max_length, elevation_diff_input, percentage_hard_input)
+        feasible = np.flatnonzero(self.feasible(metrics, max_steepness))
+
+        return feasible[np.argsort(scores[feasible], kind='stable')], scores
@@ -0,0 +1,37 @@
+import json
+import os
+
+config_path = os.path.join(os.path.dirname(os.path.realpath(__file__)), 'config')
+
+# The folder that holds the srm package, relative paths in the settings are resolved against it
+project_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.realpath(__file__)))))
+
+_loaded_settings = {}
+
+def load(name: str) -> dict:
+    """Loads a settings file from the config folder. Files are only read once per process.
+
+    Args:
+        name (str): Name of the settings file without the .json extension, e.g. "GraphSettings".
+
+    Returns:
+        dict: The parsed settings.
+    """
+
+    if name not in _loaded_settings:
+        with open(os.path.join(config_path, f'{name}.json'), 'r') as settings:
+            _loaded_settings[name] = json.load(settings)
+
+    return _loaded_settings[name]
+
+def resolve_path(path: str) -> str:
+    """Resolves a path from the settings, so the dev server and a WSGI server started from another folder use the same files.
+
+    Args:
+        path (str): Path as it is in the settings, e.g. "cache/graphs".
+
+    Returns:
+        str: The path itself when it is absolute, otherwise the path inside the project folder.
+    """
+
+    return os.path.join(project_path, os.path.expanduser(path))
@@ -0,0 +1,95 @@
+import math
+import weakref
+import threading
+import numpy as np
+from networkx import MultiDiGraph
+from scipy.spatial import cKDTree
+
+# Spatial indexes are built once per loaded graph and live as long as the graph they were built from
+_spatial_indexes = weakref.WeakKeyDictionary()
+_spatial_indexes_lock = threading.Lock()
+
+
+def for_graph(graph: MultiDiGraph) -> 'SpatialIndex':
+    """Gets the spatial index of an osmnx graph, building it on first use.
+
+    Args:
+        graph (MultiDiGraph): Instance of an osmnx graph.
+
+    Returns:
+        SpatialIndex: Nearest node index of the graph.
+    """
+
+    with _spatial_indexes_lock:
+        spatial_index = _spatial_indexes.get(graph)
+
+        if spatial_index is None:
+            spatial_index = SpatialIndex(graph)
+            _spatial_indexes[graph] = spatial_index
+
+    return spatial_index
+
+
+class SpatialIndex:
+    """KD-tree over the node coordinates of a graph for (batch) nearest node lookups.
+
+    The coordinates are projected to meters with an equirectangular projection around the center of the graph,
+    which is accurate well within the rounding of a nearest node lookup at the size of a routing graph.
+    """
+
+    EARTH_RADIUS = 6371009
+
+    def __init__(self, graph: MultiDiGraph) -> None:
+        """Build the index.
+
+        Args:
+            graph (MultiDiGraph): Instance of an osmnx graph.
+        """
+
+        self.node_ids = np.array(list(graph.nodes), dtype=np.int64)
+        self.lat = np.array([data['y'] for _, data in graph.nodes(data=True)], dtype=float)
+        self.lon = np.array([data['x'] for _, data in graph.nodes(data=True)], dtype=float)
+        self.lon_scale = math.cos(math.radians(float(np.mean(self.lat)))) if len(self.lat) else 1
+
+        self.tree = cKDTree(self.project(self.lat, self.lon))
+
+    def project(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Projects coordinates to meters.
+
+        Args:
+            lat (np.ndarray): Latitudes in degrees.
+            lon (np.ndarray): Longitudes in degrees.
+
+        Returns:
+            np.ndarray: (n, 2) array of projected x, y coordinates.
+        """
+
+        return np.column_stack((np.radians(lon) * self.lon_scale * self.EARTH_RADIUS, np.radians(lat) * self.EARTH_RADIUS))
+
+    def nearest_indices(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Gets the positions of the nodes closest to arrays of coordinates in one query.
+
+        Args:
+            lat (np.ndarray): Latitudes in degrees.
+            lon (np.ndarray): Longitudes in degrees.
+
+        Returns:
+            np.ndarray: Positions in node_ids, lat and lon of the closest nodes.
+        """
+
+        _, indices = self.tree.query(self.project(np.asarray(lat, dtype=float), np.asarray(lon, dtype=float)))
+
+        return indices
+
+    def nearest_nodes(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Gets the IDs of the nodes closest to arrays of coordinates in one query.
+
+        Args:
+            lat (np.ndarray): Latitudes in degrees.
+            lon (np.ndarray): Longitudes in degrees.
+
+        Returns:
+            np.ndarray: Unique IDs of the closest nodes.
+        """
+
+        return self.node_ids[self.nearest_indices(lat, lon)]
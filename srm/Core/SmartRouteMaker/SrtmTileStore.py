@@ -0,0 +1,153 @@
+import os
+import math
+import threading
+import numpy as np
+from collections import OrderedDict
+
+from srm.Core.SmartRouteMaker import Settings
+
+# Values outside this range are voids or errors in the SRTM data
+MIN_VALID_ELEVATION = -1000
+MAX_VALID_ELEVATION = 10000
+
+_shared_store = None
+_shared_lock = threading.Lock()
+
+
+def shared(settings: dict) -> 'SrtmTileStore':
+    """Gets the process-wide tile store, creating it on first use.
+
+    Args:
+        settings (dict): The tiles section of the elevation settings.
+
+    Returns:
+        SrtmTileStore: The tile store shared by every graph in this process.
+    """
+
+    global _shared_store
+
+    with _shared_lock:
+        if _shared_store is None:
+            _shared_store = SrtmTileStore(**settings)
+
+    return _shared_store
+
+
+class SrtmTileStore:
+    """Samples elevations from SRTM HGT tiles in a local directory, without downloading anything.
+
+    Tiles are memory mapped instead of read, so only the pages that are sampled are loaded from disk and the
+    operating system shares them between the processes of the application. The most recently used tiles stay mapped.
+    Both SRTM1 (3601x3601) and SRTM3 (1201x1201) tiles are supported, the files have to be unzipped.
+    """
+
+    def __init__(self, directory: str, max_open_tiles: int = 16, **kwargs) -> None:
+        """Initialize the tile store.
+
+        Args:
+            directory (str): Directory that holds the tiles, named like N52E005.hgt. A relative directory is inside the project folder.
+            max_open_tiles (int, optional): Number of tiles that stay mapped. Defaults to 16.
+        """
+
+        self.directory = Settings.resolve_path(directory)
+        self.max_open_tiles = max_open_tiles
+        self.tiles = OrderedDict()
+        self.lock = threading.Lock()
+
+    def tile_name(self, tile_lat: int, tile_lon: int) -> str:
+        """Gets the file name of the tile with its south west corner at a coordinate.
+
+        Args:
+            tile_lat (int): Latitude of the south west corner.
+            tile_lon (int): Longitude of the south west corner.
+
+        Returns:
+            str: e.g. "N52E005.hgt"
+        """
+
+        return f"{'N' if tile_lat >= 0 else 'S'}{abs(tile_lat):02d}{'E' if tile_lon >= 0 else 'W'}{abs(tile_lon):03d}.hgt"
+
+    def tile(self, tile_lat: int, tile_lon: int) -> np.memmap:
+        """Gets the heights of a tile, mapping it on first use and unmapping the least recently used tile when too many are mapped.
+
+        Args:
+            tile_lat (int): Latitude of the south west corner.
+            tile_lon (int): Longitude of the south west corner.
+
+        Returns:
+            np.memmap: (side, side) big endian heights, the first row is the northern edge. None when the tile is not in the directory.
+        """
+
+        key = (tile_lat, tile_lon)
+
+        with self.lock:
+            if key in self.tiles:
+                self.tiles.move_to_end(key)
+                return self.tiles[key]
+
+            path = os.path.join(self.directory, self.tile_name(tile_lat, tile_lon))
+            if os.path.exists(path):
+                side = math.isqrt(os.path.getsize(path) // 2)
+                heights = np.memmap(path, dtype='>i2', mode='r', shape=(side, side))
+            else:
+                heights = None
+
+            # Missing tiles are remembered as well, so the directory is not checked again for every lookup
+            self.tiles[key] = heights
+            while len(self.tiles) > self.max_open_tiles:
+                self.tiles.popitem(last=False)
+
+            return heights
+
+    def sample(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Samples the elevations of arrays of coordinates with bilinear interpolation, vectorized per tile.
+
+        Voids are left out of the interpolation, a point is only unknown when all four surrounding samples are voids.
+
+        Args:
+            lat (np.ndarray): Latitudes in degrees.
+            lon (np.ndarray): Longitudes in degrees.
+
+        Returns:
+            np.ndarray: Elevation in meters of every coordinate, NaN when it is not available.
+        """
+
+        lat = np.asarray(lat, dtype=float)
+        lon = np.asarray(lon, dtype=float)
+        elevations = np.full(len(lat), np.nan)
+
+        tiles = np.column_stack((np.floor(lat), np.floor(lon))).astype(int)
+        for tile_lat, tile_lon in np.unique(tiles, axis=0).tolist():
+            heights = self.tile(tile_lat, tile_lon)
+            if heights is None:
+                continue
+
+            in_tile = (tiles[:, 0] == tile_lat) & (tiles[:, 1] == tile_lon)
+            side = heights.shape[0]
+
+            # Position in samples from the north west corner, a tile shares its edge rows and columns with its neighbours
+            rows = (tile_lat + 1 - lat[in_tile]) * (side - 1)
+            columns = (lon[in_tile] - tile_lon) * (side - 1)
+            top = np.floor(rows).astype(int).clip(0, side - 2)
+            left = np.floor(columns).astype(int).clip(0, side - 2)
+            row_fraction = (rows - top).clip(0, 1)
+            column_fraction = (columns - left).clip(0, 1)
+
+            corners = np.stack((heights[top, left], heights[top, left + 1], heights[top + 1, left], heights[top + 1, left + 1])).astype(float)
+            weights = np.stack(((1 - row_fraction) * (1 - column_fraction), (1 - row_fraction) * column_fraction,
+                                row_fraction * (1 - column_fraction), row_fraction * column_fraction))
+
+            valid = (corners >= MIN_VALID_ELEVATION) & (corners <= MAX_VALID_ELEVATION)
+            weights = np.where(valid, weights, 0)
+            total_weight = weights.sum(axis=0)
+
+            with np.errstate(invalid='ignore', divide='ignore'):
+                values = (np.where(valid, corners, 0) * weights).sum(axis=0) / total_weight
+
+            # A point on a void sample has no weight on the valid ones, fall back to their plain average
+            without_weight = (total_weight == 0) & valid.any(axis=0)
+            values[without_weight] = np.where(valid, corners, 0).sum(axis=0)[without_weight] / valid.sum(axis=0)[without_weight]
+
+            elevations[in_tile] = values
+
+        return elevations
@@ -1,13 +1,18 @@
-import json
 import os
 import osmnx as ox
 import networkx as nx
 from typing import Dict, List, OrderedDict
 from networkx import MultiDiGraph
 from matplotlib import pyplot as plt
-import srtm
 from termcolor import colored
 import colorama
+import threading
+
+from srm.Core.SmartRouteMaker import Route
+from srm.Core.SmartRouteMaker import Settings
+
+# pyplot keeps global state, so plans that run on different threads take turns plotting
+_pyplot_lock = threading.Lock()
 
 class Visualizer:
 
@@ -60,8 +65,7 @@ class Visualizer:
             Dict: Visualisation dictionary.
         """        
 
-        with open('./srm/Core/SmartRouteMaker/config/VisualisationSettings.json', 'r') as settings:
-            visualisationSettings = json.load(settings)
+        visualisationSettings = Settings.load('VisualisationSettings')
 
         visualisation = {}
         i = 1
@@ -114,8 +118,7 @@ class Visualizer:
             str: Hex value of the surface.
         """        
 
-        with open('./srm/Core/SmartRouteMaker/config/VisualisationSettings.json', 'r') as settings:
-            visualisationSettings = json.load(settings)
+        visualisationSettings = Settings.load('VisualisationSettings')
 
         return visualisationSettings['surfaces'][surface]
     
@@ -132,24 +135,26 @@ class Visualizer:
         -------
         - None
         """
-        save_path = "srm/Core/Static/Image/leaf_points.png"
+        save_path = Settings.resolve_path("srm/Core/Static/Image/leaf_points.png")
         
-        fig, ax = plt.subplots()
+        with _pyplot_lock:
+            fig, ax = plt.subplots()
 
-        for leaf_nodes in leaf_paths:
-            # Extract x and y coordinates from leaf nodes
-            leaf_x = [graph.nodes[node]["x"] for node in leaf_nodes]
-            leaf_y = [graph.nodes[node]["y"] for node in leaf_nodes]
+            for leaf_nodes in leaf_paths:
+                # Extract x and y coordinates from leaf nodes
+                leaf_x = [graph.nodes[node]["x"] for node in leaf_nodes]
+                leaf_y = [graph.nodes[node]["y"] for node in leaf_nodes]
 
-            # Plot the leaf path
-            ax.plot(leaf_x, leaf_y, marker='o', linestyle=':')
-        # Set labels and title
-        ax.set_xlabel('Longitude')
-        ax.set_ylabel('Latitude')
-        ax.set_title('All Points')
+                # Plot the leaf path
+                ax.plot(leaf_x, leaf_y, marker='o', linestyle=':')
+            # Set labels and title
+            ax.set_xlabel('Longitude')
+            ax.set_ylabel('Latitude')
+            ax.set_title('All Points')
 
-        if save_path:
-            plt.savefig(save_path, format="png")
+            if save_path:
+                plt.savefig(save_path, format="png")
+            plt.close(fig)
 
     def visualize_best_path(self, path: list, graph: MultiDiGraph) -> None:
         """Visualize the best path.
@@ -163,63 +168,51 @@ class Visualizer:
         -------
         - None
         """
-        save_path = "srm/Core/Static/Image/best_path_points.png"
+        save_path = Settings.resolve_path("srm/Core/Static/Image/best_path_points.png")
         
-        fig, ax = plt.subplots()
+        with _pyplot_lock:
+            fig, ax = plt.subplots()
 
       
-        leaf_x = [graph.nodes[node]["x"] for node in path]
-        leaf_y = [graph.nodes[node]["y"] for node in path]
+            leaf_x = [graph.nodes[node]["x"] for node in path]
+            leaf_y = [graph.nodes[node]["y"] for node in path]
 
-        ax.plot(leaf_x, leaf_y, marker='o', linestyle=':')
+            ax.plot(leaf_x, leaf_y, marker='o', linestyle=':')
     
-        ax.set_xlabel('Longitude')
-        ax.set_ylabel('Latitude')
-        ax.set_title('Best path')
+            ax.set_xlabel('Longitude')
+            ax.set_ylabel('Latitude')
+            ax.set_title('Best path')
 
-        if save_path:
-            plt.savefig(save_path, format="png")
+            if save_path:
+                plt.savefig(save_path, format="png")
+            plt.close(fig)
 
-    def visualize_elevations(self, graph: MultiDiGraph, path: list) -> None:
+    def visualize_elevations(self, route: Route.Route) -> None:
         """
-        Visualize the elevations of a path and save the plot as an image.
+        Visualize the elevations of a route and save the plot as an image.
 
         Parameters:
-        graph (networkx.Graph): The graph representing the area.
-        path (list): A list of node IDs representing the path.
+        route (Route): The route, its node elevations are shared with the rest of the request.
 
-        This method retrieves the elevation data for each node in the path using the SRTM library.
+        This method gets the elevation of each node in the route from the elevations added to the graph when it was loaded.
         It then creates a plot of the elevation data using matplotlib, with the node index on the x-axis and the elevation on the y-axis.
         The plot is saved as a PNG image at the specified save path.
 
-        If there is an error retrieving the elevation data for a node, an error message is printed and the node is skipped.
-
-        Note: The method uses the 'y' and 'x' attributes of the nodes in the graph to represent the latitude and longitude.
+        Nodes without elevation data leave a gap in the plot.
         """
-        elevation_data = srtm.get_data()
-        elevation_nodes = []
-        plt.clf()
-        for graphNode in path:
-            node = graph.nodes[graphNode]
-            nodeLat = node['y']
-            nodeLon = node['x']
-
-            try:
-                elevation = elevation_data.get_elevation(nodeLat, nodeLon)
-                elevation_nodes.append(elevation)
-            except Exception as e:
-                # Handle the case where getting elevation gioes wrong
-                print(f"Error getting elevation for node {graphNode}: {e}")
-
-        # Visualize elevation wit matplotlib
-        save_path = "srm/Core/Static/Image/elevation.png"
-        plt.plot(elevation_nodes, marker='.', linestyle='-', color='b')
-        plt.title('Elevation Profile')
-        plt.xlabel('Node Index')
-        plt.ylabel('Elevation (meters)')
-        plt.grid(True)
-        if save_path:
-            plt.savefig(save_path, format="png")
+        elevation_nodes = route.node_elevations
+        with _pyplot_lock:
+            plt.clf()
+
+            # Visualize elevation wit matplotlib
+            save_path = Settings.resolve_path("srm/Core/Static/Image/elevation.png")
+            plt.plot(elevation_nodes, marker='.', linestyle='-', color='b')
+            plt.title('Elevation Profile')
+            plt.xlabel('Node Index')
+            plt.ylabel('Elevation (meters)')
+            plt.grid(True)
+            if save_path:
+                plt.savefig(save_path, format="png")
 
     def visualize_surface_percentage(self, percentage: float) -> None:
         """
@@ -237,14 +230,15 @@ class Visualizer:
         sizes = [0 if size < 0 else size for size in sizes]  # Be sure of that there are no negative values because i get an error if it is
         colors = ['gold', 'yellowgreen']
         explode = (0.1, 0) 
-        plt.clf()
-        plt.pie(sizes, explode=explode, labels=labels, colors=colors,
-                autopct='%1.1f%%', shadow=False, startangle=140)
-
-        plt.axis('equal')
-        save_path = "srm/Core/Static/Image/surface_percentage.png"
-        if save_path:
-            plt.savefig(save_path, format="png")
+        with _pyplot_lock:
+            plt.clf()
+            plt.pie(sizes, explode=explode, labels=labels, colors=colors,
+                    autopct='%1.1f%%', shadow=False, startangle=140)
+
+            plt.axis('equal')
+            save_path = Settings.resolve_path("srm/Core/Static/Image/surface_percentage.png")
+            if save_path:
+                plt.savefig(save_path, format="png")
 
     def final_terminal_message(self, path_length, elevation_diff, percentage_hardened):
         path_length_text = colored("path length (closest to input) meter: ", 'green') + str(round(path_length))
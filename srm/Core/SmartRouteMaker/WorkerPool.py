@@ -0,0 +1,221 @@
+import os
+import uuid
+import weakref
+import threading
+import numpy as np
+import multiprocessing as mp
+from multiprocessing import shared_memory, resource_tracker
+
+from srm.Core.SmartRouteMaker import Settings
+from srm.Core.SmartRouteMaker import RoutingGraph
+from srm.Core.SmartRouteMaker import ContractionHierarchy
+
+_pool = None
+_pool_lock = threading.Lock()
+
+# Worker side: routing graphs attached from shared memory, keyed by the token they were published under
+_attached = {}
+MAX_ATTACHED_GRAPHS = 4
+
+
+def start(processes: int = None) -> 'WorkerPool':
+    """Starts the process-wide worker pool, this should happen once at application startup before any threads are started.
+
+    Args:
+        processes (int, optional): Number of worker processes. Defaults to the worker_pool settings, or the cpu count.
+
+    Returns:
+        WorkerPool: The running pool, or None when the pool is disabled in the settings.
+    """
+
+    global _pool
+
+    settings = Settings.load('PlannerSettings')['worker_pool']
+
+    with _pool_lock:
+        if _pool is None and settings['enabled']:
+            _pool = WorkerPool(processes or settings['processes'] or mp.cpu_count())
+
+    return _pool
+
+
+def get() -> 'WorkerPool':
+    """Gets the process-wide worker pool, starting it when the application did not do so at startup.
+
+    Returns:
+        WorkerPool: The running pool, or None when the pool is disabled in the settings.
+    """
+
+    if _pool is None:
+        return start()
+
+    return _pool
+
+
+class WorkerPool:
+    """Long-lived pool of worker processes that route on graphs published through shared memory.
+
+    A graph is copied into shared memory once, after that tasks only carry the publication token and small
+    arguments like leaf waypoints. Workers attach to the shared arrays without copying them.
+    """
+
+    def __init__(self, processes: int) -> None:
+        """Start the worker processes.
+
+        Args:
+            processes (int): Number of worker processes.
+        """
+
+        # The workers have to share the resource tracker of this process, a tracker of their own would free the
+        # published graphs as soon as a worker exits. Windows frees shared memory without a tracker.
+        if os.name == 'posix':
+            resource_tracker.ensure_running()
+
+        # A forked worker inherits the locks other threads of this process hold at that moment, so when threads are already
+        # running, e.g. when the pool is started on the first request, the workers come from a clean fork server instead
+        if os.name == 'posix' and threading.active_count() > 1:
+            context = mp.get_context('forkserver')
+            # The fork server imports the tasks once, the workers forked from it start with them
+            context.set_forkserver_preload([__name__])
+        else:
+            context = mp.get_context()
+
+        self.processes = processes
+        self.pool = context.Pool(processes)
+        self.publications = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+
+    def publish(self, routing_graph: RoutingGraph.RoutingGraph) -> tuple:
+        """Copies the arrays of a routing graph into shared memory, once per routing graph.
+
+        The shared memory is released when the routing graph is garbage collected.
+
+        Args:
+            routing_graph (RoutingGraph): The routing graph to share with the workers.
+
+        Returns:
+            tuple: (token, layout) the token identifies the graph, the layout tells the workers where its arrays are.
+        """
+
+        with self.lock:
+            publication = self.publications.get(routing_graph)
+
+            # A contraction hierarchy that became available after publishing is published together with the graph again
+            if publication is not None and routing_graph.contraction_hierarchy is not None and not publication[2]:
+                publication[3]()
+                publication = None
+
+            if publication is None:
+                token = uuid.uuid4().hex
+                blocks = []
+                layout = {}
+
+                arrays = routing_graph.to_arrays()
+                if routing_graph.contraction_hierarchy is not None:
+                    arrays.update({f'ch_{name}': array for name, array in routing_graph.contraction_hierarchy.to_arrays().items()})
+
+                for name, array in arrays.items():
+                    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+                    np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+                    blocks.append(block)
+                    layout[name] = (block.name, array.dtype.str, array.shape)
+
+                release = weakref.finalize(routing_graph, _release, blocks)
+                publication = (token, layout, routing_graph.contraction_hierarchy is not None, release)
+                self.publications[routing_graph] = publication
+
+            return publication[0], publication[1]
+
+    def map(self, function, routing_graph: RoutingGraph.RoutingGraph, arguments: list, chunksize: int = None) -> list:
+        """Runs a task function for every set of arguments on the workers, results are returned in the order of the arguments.
+
+        A task that raises does not affect the other tasks, its result is a TaskFailure instead.
+
+        Args:
+            function (callable): Module level function called as function(routing_graph, *argument) in a worker.
+            routing_graph (RoutingGraph): The routing graph the tasks work on.
+            arguments (list): One tuple of (small) arguments per task.
+            chunksize (int, optional): Number of tasks sent to a worker at once. Defaults to the worker_pool settings.
+
+        Returns:
+            list: The result of every task.
+        """
+
+        token, layout = self.publish(routing_graph)
+        chunksize = chunksize or Settings.load('PlannerSettings')['worker_pool']['chunksize']
+
+        return self.pool.map(_run_task, [(function, token, layout, argument) for argument in arguments], chunksize)
+
+    def close(self) -> None:
+        """Stops the worker processes."""
+
+        self.pool.terminate()
+        self.pool.join()
+
+
+class TaskFailure:
+    """Result of a task that raised in a worker."""
+
+    def __init__(self, error: str) -> None:
+        self.error = error
+
+    def __repr__(self) -> str:
+        return f"TaskFailure({self.error})"
+
+
+def _release(blocks: list) -> None:
+    """Frees the shared memory of a published graph."""
+
+    for block in blocks:
+        try:
+            block.close()
+            block.unlink()
+        except FileNotFoundError:
+            pass
+
+
+def _attach(token: str, layout: dict) -> RoutingGraph.RoutingGraph:
+    """Worker side: gets the routing graph of a publication, attaching to its shared memory on first use."""
+
+    if token not in _attached:
+        # Only keep the most recent graphs attached, the publisher frees the memory of graphs it no longer uses
+        while len(_attached) >= MAX_ATTACHED_GRAPHS:
+            routing_graph, blocks = _attached.pop(next(iter(_attached)))
+            del routing_graph
+            for block in blocks:
+                try:
+                    block.close()
+                except BufferError:
+                    pass
+
+        blocks = []
+        arrays = {}
+        for name, (block_name, dtype, shape) in layout.items():
+            block = shared_memory.SharedMemory(name=block_name)
+            blocks.append(block)
+            arrays[name] = np.ndarray(shape, dtype=np.dtype(dtype), buffer=block.buf)
+
+        routing_graph = RoutingGraph.RoutingGraph.from_arrays(arrays)
+        if 'ch_rank' in arrays:
+            routing_graph.contraction_hierarchy = ContractionHierarchy.ContractionHierarchy.from_arrays({name[3:]: array for name, array in arrays.items() if name.startswith('ch_')})
+
+        _attached[token] = (routing_graph, blocks)
+
+    return _attached[token][0]
+
+
+def _run_task(task: tuple):
+    """Worker side: runs one task on the shared routing graph."""
+
+    function, token, layout, argument = task
+
+    try:
+        return function(_attach(token, layout), *argument)
+    except Exception as e:
+        return TaskFailure(repr(e))
+
+
+def search_leg(routing_graph: RoutingGraph.RoutingGraph, start_node: int, end_node: int) -> tuple:
+    """Task function that searches one leg of a route, see RoutingGraph.search_leg."""
+
+    return routing_graph.search_leg(start_node, end_node)
@@ -1,12 +1,12 @@
+import gc
 from flask import Flask
 from threading import Thread
 from werkzeug.serving import make_server, BaseWSGIServer
-from .Core.Routes import core
+from .Core.Routes import core, srmf
 from .Site.Routes import site
-import webview
+from .Core.SmartRouteMaker import WorkerPool
 import time
 import logging
-from screeninfo import get_monitors
 
 
 class ServerThread(Thread):
@@ -28,6 +28,10 @@ import logging
 
 
 def create_app():
+    # The desktop window is only needed here, a server without a display never imports it
+    import webview
+    from screeninfo import get_monitors
+
     app = Flask(__name__)
     app.register_blueprint(core)
     app.register_blueprint(site)
@@ -40,6 +44,9 @@ def create_app():
     file_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
     logging.getLogger().addHandler(file_handler)
 
+    # Start the routing workers before the server thread, so they are forked from a single threaded process
+    WorkerPool.start()
+
     server = ServerThread(app)
     server.start()
 
@@ -53,6 +60,34 @@ def create_app():
 
     return app
 
+
+def create_headless_app(preload: bool = True) -> Flask:
+    """Creates the app for a WSGI server, without the server thread and the window of create_app.
+
+    The routing workers are not started here, a pool forked along with the WSGI workers would not work in them. Every
+    worker starts a pool after it is forked, see gunicorn.conf.py, or else the pool is started from a fork server on first use.
+
+    Args:
+        preload (bool, optional): Load the regions in the preload section of the graph settings before returning. With
+        preload_app in gunicorn.conf.py this happens once, before the workers are forked. Defaults to True.
+
+    Returns:
+        Flask: The app.
+    """
+
+    app = Flask(__name__)
+    app.register_blueprint(core)
+    app.register_blueprint(site)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if preload:
+        srmf.graph.preload()
+        # The garbage collector leaves the preloaded objects alone, so it does not copy the pages the workers share
+        gc.freeze()
+
+    return app
+
 #old:
 """
 from flask import Flask
@@ -0,0 +1,80 @@
+import math
+import random
+import pytest
+import networkx as nx
+
+# Node IDs of the special cases in the random graph
+ZERO_LENGTH_NODE = 10000
+UNREACHABLE_NODE = 10001
+
+
+def haversine(graph: nx.MultiDiGraph, u: int, v: int) -> float:
+    """Great circle distance in meters between two nodes of a graph."""
+
+    lat_u, lon_u = math.radians(graph.nodes[u]['y']), math.radians(graph.nodes[u]['x'])
+    lat_v, lon_v = math.radians(graph.nodes[v]['y']), math.radians(graph.nodes[v]['x'])
+    a = math.sin((lat_v - lat_u) / 2) ** 2 + math.cos(lat_u) * math.cos(lat_v) * math.sin((lon_v - lon_u) / 2) ** 2
+
+    return 2 * 6371009 * math.asin(math.sqrt(a))
+
+
+@pytest.fixture(scope='session')
+def random_graph() -> nx.MultiDiGraph:
+    """A seeded 15 x 15 street grid with one-way streets, parallel edges, a node joined by zero-length edges and a node that
+    can be left but not reached. Edges are never shorter than the straight line between their ends, like osm ways."""
+
+    rng = random.Random(20)
+    size = 15
+    graph = nx.MultiDiGraph(crs='epsg:4326')
+
+    for row in range(size):
+        for column in range(size):
+            graph.add_node(row * size + column, y=52.0 + row * 0.001 + rng.uniform(-0.0002, 0.0002), x=5.0 + column * 0.0016 + rng.uniform(-0.0003, 0.0003))
+
+    for row in range(size):
+        for column in range(size):
+            u = row * size + column
+            for v in ((u + 1) if column + 1 < size else None, (u + size) if row + 1 < size else None):
+                if v is None or rng.random() < 0.1:
+                    continue
+
+                length = haversine(graph, u, v) * rng.uniform(1.0, 1.5)
+                direction = rng.random()
+                if direction < 0.8:
+                    graph.add_edge(u, v, length=length)
+                    graph.add_edge(v, u, length=length)
+                elif direction < 0.9:
+                    graph.add_edge(u, v, length=length)
+                else:
+                    graph.add_edge(v, u, length=length)
+
+                if rng.random() < 0.05:
+                    graph.add_edge(u, v, length=length * 1.2)
+
+    graph.add_node(ZERO_LENGTH_NODE, y=graph.nodes[112]['y'], x=graph.nodes[112]['x'])
+    graph.add_edge(112, ZERO_LENGTH_NODE, length=0.0)
+    graph.add_edge(ZERO_LENGTH_NODE, 112, length=0.0)
+
+    graph.add_node(UNREACHABLE_NODE, y=52.0, x=4.998)
+    graph.add_edge(UNREACHABLE_NODE, 0, length=haversine(graph, UNREACHABLE_NODE, 0) * 1.1)
+
+    return graph
+
+
+@pytest.fixture(scope='session')
+def node_pairs(random_graph: nx.MultiDiGraph) -> list:
+    """300 seeded random (start, end) pairs, the special nodes included."""
+
+    rng = random.Random(21)
+    nodes = sorted(random_graph.nodes)
+    pairs = [(rng.choice(nodes), rng.choice(nodes)) for _ in range(280)]
+    pairs += [(ZERO_LENGTH_NODE, rng.choice(nodes)) for _ in range(5)] + [(rng.choice(nodes), ZERO_LENGTH_NODE) for _ in range(5)]
+    pairs += [(UNREACHABLE_NODE, rng.choice(nodes)) for _ in range(5)] + [(rng.choice(nodes), UNREACHABLE_NODE) for _ in range(5)]
+
+    return pairs
+
+
+def path_length(graph: nx.MultiDiGraph, path: list) -> float:
+    """Length of a path over the shortest of the parallel edges, raises KeyError when an edge is missing."""
+
+    return sum(min(data['length'] for data in graph[u][v].values()) for u, v in zip(path[:-1], path[1:]))
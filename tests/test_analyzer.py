@@ -0,0 +1,69 @@
+import pytest
+import networkx as nx
+
+from srm.Core.SmartRouteMaker import Analyzer
+from srm.Core.SmartRouteMaker import EdgeTable
+from srm.Core.SmartRouteMaker import Route
+from srm.Core.SmartRouteMaker import ScoringEngine
+from srm.Core.SmartRouteMaker import WorkerPool
+
+
+@pytest.fixture
+def hill_graph() -> nx.MultiDiGraph:
+    """Four nodes in a row with a 4 m hill between the first two. Uphill there is a short steep edge (20%) and a long edge
+    within 8%, the edge to the third node has a grade of exactly 8% and the last node can only be reached by a steep edge."""
+
+    graph = nx.MultiDiGraph(crs='epsg:4326')
+    for node, (x, elevation) in enumerate([(5.0, 0.0), (5.001, 4.0), (5.002, 8.0), (5.003, 20.0)], start=1):
+        graph.add_node(node, y=52.0, x=x, elevation=elevation)
+
+    for u, v, length in [(1, 2, 20.0), (1, 2, 60.0), (2, 1, 20.0), (2, 3, 50.0), (3, 2, 50.0), (3, 4, 70.0), (4, 3, 70.0)]:
+        graph.add_edge(u, v, length=length, grade=(graph.nodes[v]['elevation'] - graph.nodes[u]['elevation']) / length)
+
+    return graph
+
+
+@pytest.fixture
+def analyzer(monkeypatch) -> Analyzer.Analyzer:
+    # The legs are searched in this process, the worker pool is not needed for a graph this small
+    monkeypatch.setattr(WorkerPool, 'get', lambda: None)
+
+    return Analyzer.Analyzer()
+
+
+def test_longer_parallel_edge_replaces_too_steep_shortest_edge(hill_graph, analyzer):
+    edge_table = EdgeTable.for_graph(hill_graph, 0.08)
+    row = edge_table.pair_rows([1], [2])[0]
+
+    assert EdgeTable.for_graph(hill_graph).lengths[row] == 20.0
+    assert edge_table.usable[row] and edge_table.lengths[row] == 60.0
+
+    paths, path_lengths = analyzer.get_paths_and_path_lengths(hill_graph, [[1, 3, 1]], 1, max_steepness=8)
+
+    assert paths == [[1, 2, 3, 2, 1]]
+    assert path_lengths[0] == pytest.approx(60 + 50 + 50 + 20)
+
+
+def test_search_and_scoring_agree_on_the_steepness(hill_graph, analyzer):
+    leaf_failures = []
+    paths, path_lengths = analyzer.get_paths_and_path_lengths(hill_graph, [[1, 3, 1], [1, 4, 1]], 1, max_steepness=8, leaf_failures=leaf_failures)
+
+    # Every edge to the last node is too steep, the first leaf uses an edge of exactly the max steepness
+    assert len(paths) == 1
+    assert leaf_failures == [{"leaf": 1, "reason": "no_path", "leg": [1, 4]}]
+
+    routes = [Route.Route(hill_graph, path, path_length, 0.08) for path, path_length in zip(paths, path_lengths)]
+    scoring_engine = ScoringEngine.ScoringEngine()
+    metrics = scoring_engine.metrics(routes)
+
+    assert metrics[0, scoring_engine.MAX_GRADE] == pytest.approx(0.08)
+    assert scoring_engine.feasible(metrics, 8).all()
+    assert not scoring_engine.feasible(metrics, 7).any()
+
+
+def test_without_steepness_the_shortest_parallel_edge_is_used(hill_graph, analyzer):
+    paths, path_lengths = analyzer.get_paths_and_path_lengths(hill_graph, [[1, 4, 1]], 1)
+
+    assert paths == [[1, 2, 3, 4, 3, 2, 1]]
+    assert path_lengths[0] == pytest.approx(20 + 50 + 70 + 70 + 50 + 20)
+    assert Route.Route(hill_graph, paths[0]).max_grade == pytest.approx(0.2)
@@ -0,0 +1,34 @@
+import pytest
+
+from srm.Core.SmartRouteMaker import CandidateGenerator
+from srm.Core.SmartRouteMaker import Settings
+
+
+class FakeRoute:
+    def __init__(self, length: float) -> None:
+        self.length = length
+
+
+@pytest.fixture
+def candidate_generator() -> CandidateGenerator.CandidateGenerator:
+    settings = dict(Settings.load('PlannerSettings')['candidates'], detour_factor_bounds=[0.8, 2.0], detour_factor_smoothing=0.5)
+
+    return CandidateGenerator.CandidateGenerator(None, None, None, settings)
+
+
+def test_learning_a_detour_factor_leaves_the_shared_factor_alone(candidate_generator):
+    # Routes of 1.5 times the circumference of their leaf, one leaf snapped far away
+    routes = [FakeRoute(1500), FakeRoute(1200), FakeRoute(4000)]
+    leafs = [(0.0, 1.0), (1.0, 0.8), (2.0, 1.0)]
+
+    assert candidate_generator.learn_detour_factor(routes, leafs, 1000) == pytest.approx(1.5)
+    assert candidate_generator.learn_detour_factor([FakeRoute(5000)], [(0.0, 1.0)], 1000) == 2.0
+    assert candidate_generator.shared_detour_factor() == 1.0
+
+
+def test_finished_plans_are_smoothed_into_the_shared_factor(candidate_generator):
+    candidate_generator.remember_detour_factor(2.0)
+    assert candidate_generator.shared_detour_factor() == pytest.approx(1.5)
+
+    candidate_generator.remember_detour_factor(1.0)
+    assert candidate_generator.shared_detour_factor() == pytest.approx(1.25)
@@ -0,0 +1,70 @@
+import pytest
+import networkx as nx
+
+from srm.Core.SmartRouteMaker import RoutingGraph
+from srm.Core.SmartRouteMaker import ContractionHierarchy
+from srm.Core.SmartRouteMaker import Settings
+from conftest import path_length
+
+
+@pytest.fixture(scope='module')
+def contracted_graph(random_graph):
+    routing_graph = RoutingGraph.RoutingGraph.from_graph(random_graph)
+    routing_graph.contraction_hierarchy = ContractionHierarchy.ContractionHierarchy.build(routing_graph)
+
+    return routing_graph
+
+
+def test_query_matches_networkx(random_graph, node_pairs, contracted_graph):
+    for start, end in node_pairs:
+        path, length = contracted_graph.contraction_hierarchy.query(contracted_graph.node_index(start), contracted_graph.node_index(end))
+
+        try:
+            expected = nx.shortest_path_length(random_graph, start, end, weight='length')
+        except nx.NetworkXNoPath:
+            assert path is None and length is None, (start, end)
+            continue
+
+        path = contracted_graph.node_ids[path].tolist()
+        assert path[0] == start and path[-1] == end
+        assert length == pytest.approx(expected, rel=1e-5, abs=1e-2), (start, end)
+        assert path_length(random_graph, path) == pytest.approx(expected, rel=1e-5, abs=1e-2), (start, end)
+
+
+def test_search_leg_uses_the_hierarchy(random_graph, node_pairs, contracted_graph):
+    plain_graph = RoutingGraph.RoutingGraph.from_graph(random_graph)
+
+    for start, end in node_pairs[:50]:
+        leg = contracted_graph.search_leg(start, end)
+        expected = plain_graph.search_leg(start, end)
+
+        assert (leg is None) == (expected is None), (start, end)
+        if leg is not None:
+            assert leg[1] == pytest.approx(expected[1], rel=1e-5, abs=1e-2), (start, end)
+
+
+def test_saved_hierarchy_answers_the_same(tmp_path, node_pairs, contracted_graph):
+    path = str(tmp_path / 'ch.npz')
+    contracted_graph.contraction_hierarchy.save(path)
+    loaded = ContractionHierarchy.ContractionHierarchy.load(path)
+
+    for start, end in node_pairs[:50]:
+        start_index, end_index = contracted_graph.node_index(start), contracted_graph.node_index(end)
+        assert loaded.query(start_index, end_index) == contracted_graph.contraction_hierarchy.query(start_index, end_index)
+
+
+def test_schedule_contracts_in_a_separate_process(monkeypatch, tmp_path, random_graph, node_pairs, contracted_graph):
+    settings = Settings.load('PlannerSettings')
+    monkeypatch.setitem(settings, 'contraction_hierarchies', {"enabled": True, "min_nodes": 0, "directory": str(tmp_path)})
+    monkeypatch.setattr(ContractionHierarchy.ContractionHierarchy, 'build', None)
+
+    # The hierarchy can only come from the contraction process, this process can not build it
+    routing_graph = RoutingGraph.RoutingGraph.from_graph(random_graph)
+    routing_graph.contraction_hierarchy = None
+    ContractionHierarchy.schedule(routing_graph)
+    ContractionHierarchy.wait()
+
+    assert list(tmp_path.glob('ch_*.npz'))
+    for start, end in node_pairs[:50]:
+        start_index, end_index = routing_graph.node_index(start), routing_graph.node_index(end)
+        assert routing_graph.contraction_hierarchy.query(start_index, end_index) == contracted_graph.contraction_hierarchy.query(start_index, end_index)
@@ -0,0 +1,66 @@
+import pytest
+import numpy as np
+import networkx as nx
+
+from srm.Core.SmartRouteMaker import RoutingGraph
+from srm.Core.SmartRouteMaker import EdgeTable
+from conftest import path_length
+
+
+@pytest.fixture(scope='module')
+def routing_graph(random_graph) -> RoutingGraph.RoutingGraph:
+    return RoutingGraph.RoutingGraph.from_graph(random_graph)
+
+
+@pytest.fixture(scope='module')
+def edge_table(random_graph, routing_graph) -> EdgeTable.EdgeTable:
+    return EdgeTable.EdgeTable.from_graph(random_graph, routing_graph)
+
+
+def test_rows_are_aligned_with_the_routing_graph_edges(random_graph, routing_graph, edge_table):
+    start_nodes = np.repeat(routing_graph.node_ids, np.diff(routing_graph.indptr))
+    end_nodes = routing_graph.node_ids[routing_graph.indices]
+
+    assert len(edge_table.keys) == len(routing_graph.indices)
+    assert (edge_table.pair_rows(start_nodes, end_nodes) == np.arange(len(routing_graph.indices))).all()
+    assert edge_table.lengths == pytest.approx(routing_graph.lengths, rel=1e-6)
+
+
+def test_rows_hold_the_shortest_parallel_edge(random_graph, edge_table):
+    parallel = [(u, v) for u, v in random_graph.edges() if random_graph.number_of_edges(u, v) > 1]
+    assert parallel
+
+    rows = edge_table.pair_rows([u for u, _ in parallel], [v for _, v in parallel])
+    assert (rows >= 0).all()
+    assert edge_table.lengths[rows] == pytest.approx([min(data['length'] for data in random_graph[u][v].values()) for u, v in parallel])
+
+
+def test_path_lengths_match_the_graph(random_graph, node_pairs, edge_table):
+    paths = []
+    for start, end in node_pairs[:50]:
+        try:
+            paths.append(nx.shortest_path(random_graph, start, end, weight='length'))
+        except nx.NetworkXNoPath:
+            continue
+
+    assert edge_table.path_lengths(paths) == pytest.approx([path_length(random_graph, path) for path in paths])
+    assert (edge_table.edge_rows([0, 10001]) == -1).all()
+
+
+def test_surfaces_and_grades_of_parallel_edges():
+    graph = nx.MultiDiGraph()
+    graph.add_nodes_from([1, 2, 3], y=52.0, x=5.0)
+    graph.add_edge(1, 2, length=10.0, surface='gravel', grade=0.1)
+    graph.add_edge(1, 2, length=30.0, surface=['asphalt', 'gravel'], grade=0.02)
+    graph.add_edge(2, 3, length=20.0)
+
+    edge_table = EdgeTable.EdgeTable.from_graph(graph, RoutingGraph.RoutingGraph.from_graph(graph))
+    within_grade = edge_table.within_grade(0.05)
+
+    assert edge_table.hardened_lengths([[1, 2, 3]])[0] == 0
+    assert edge_table.max_grades([[1, 2, 3]])[0] == pytest.approx(0.1)
+    assert within_grade.hardened_lengths([[1, 2, 3]])[0] == 30
+    assert within_grade.path_lengths([[1, 2, 3]])[0] == 50
+    assert within_grade.usable.all()
+    assert not edge_table.within_grade(0.01).usable[edge_table.edge_rows([1, 2])].any()
+    assert edge_table.within_grade(0.05) is within_grade
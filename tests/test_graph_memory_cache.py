@@ -0,0 +1,50 @@
+import math
+import random
+import networkx as nx
+
+from srm.Core.SmartRouteMaker import GraphMemoryCache
+
+
+def distance(a: tuple, b: tuple) -> float:
+    """Great circle distance in meters between two coordinates."""
+
+    lat_a, lon_a, lat_b, lon_b = map(math.radians, (*a, *b))
+    h = math.sin((lat_b - lat_a) / 2) ** 2 + math.cos(lat_a) * math.cos(lat_b) * math.sin((lon_b - lon_a) / 2) ** 2
+
+    return 2 * 6371009 * math.asin(math.sqrt(h))
+
+
+def test_nearby_requests_share_a_key():
+    cache = GraphMemoryCache.GraphMemoryCache(coordinate_precision=3, radius_step=250)
+
+    assert cache.quantize((52.2301, 5.3004), 2000, 'bike', 'full_geometry', 'overpass') == cache.quantize((52.2298, 5.2996), 1950, 'bike', 'full_geometry', 'overpass')
+    assert cache.quantize((52.2301, 5.3004), 2000, 'bike', 'full_geometry', 'overpass') != cache.quantize((52.2301, 5.3004), 2000, 'walk', 'full_geometry', 'overpass')
+
+
+def test_quantized_area_covers_the_requested_area():
+    cache = GraphMemoryCache.GraphMemoryCache(coordinate_precision=3, radius_step=250)
+    rng = random.Random(3)
+
+    for _ in range(500):
+        center = (rng.uniform(-60, 60), rng.uniform(-180, 180))
+        radius = rng.uniform(100, 10000)
+        lat, lon, quantized_radius, *_ = cache.quantize(center, radius, 'bike', 'full_geometry', 'overpass')
+
+        assert quantized_radius % 250 == 0
+        assert distance(center, (lat, lon)) + radius <= quantized_radius
+
+
+def test_least_recently_used_graph_is_evicted():
+    graphs = [nx.path_graph(100, create_using=nx.MultiDiGraph) for _ in range(3)]
+    cache = GraphMemoryCache.GraphMemoryCache()
+    cache.put('first', graphs[0])
+    # Room for two graphs and a half
+    cache.max_memory = cache.memory_usage() * 2.5
+
+    cache.put('second', graphs[1])
+    assert cache.get('first') is graphs[0]
+    cache.put('third', graphs[2])
+
+    assert cache.get('second') is None
+    assert cache.get('first') is graphs[0] and cache.get('third') is graphs[2]
+    assert cache.stats()['evictions'] == 1 and cache.stats()['graphs'] == 2
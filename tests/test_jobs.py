@@ -0,0 +1,83 @@
+import json
+import threading
+import pytest
+
+import srm
+from srm.Core import Routes
+from srm.Core.SmartRouteMaker import EventHook
+from srm.Core.SmartRouteMaker import JobManager
+
+
+@pytest.fixture
+def store(tmp_path) -> dict:
+    return {"enabled": True, "path": str(tmp_path / 'jobs.sqlite3'), "poll_interval": 0.05}
+
+
+@pytest.fixture
+def client(monkeypatch, store):
+    monkeypatch.setattr(Routes, 'jobs', JobManager.JobManager(max_workers=1, max_queued=1, store=store))
+
+    return srm.create_headless_app(preload=False).test_client()
+
+
+def plan_with_events(*args, **kwargs) -> dict:
+    for stage in ("graph_loaded", "leafs_generated", "candidates_scored"):
+        EventHook.shared().emit(stage, stage=stage)
+
+    return {"path": [1, 2, 1]}
+
+
+def read_events(response) -> list:
+    """Parses a server-sent event stream into (id, event, data) tuples."""
+
+    events = []
+    for message in response.get_data(as_text=True).split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines() if not line.startswith(":"))
+        if fields:
+            events.append((fields.get("id"), fields["event"], json.loads(fields["data"])))
+
+    return events
+
+
+def test_full_queue_is_rejected(monkeypatch, client):
+    release = threading.Event()
+    monkeypatch.setattr(Routes.srmf, 'plan_circular_route_flower', lambda *args, **kwargs: release.wait(10))
+
+    try:
+        # One job runs and one waits, the third does not fit
+        for _ in range(2):
+            assert client.post('/api/jobs/circular_route', json={"start_point": [52.2, 5.3], "max_length": 4000}).status_code == 202
+
+        response = client.post('/api/jobs/circular_route', json={"start_point": [52.2, 5.3], "max_length": 4000})
+        assert response.status_code == 429
+        assert response.headers['Retry-After'] == '5'
+        assert client.get('/api/jobs').get_json()['running'] == 1
+    finally:
+        release.set()
+        Routes.jobs.executor.shutdown(wait=True)
+
+    assert client.post('/api/jobs/circular_route', json={"start_point": [52.2, 5.3], "max_length": 4000, "time_budget": "soon"}).status_code == 400
+
+
+def test_event_stream_replays_after_the_last_event_id(monkeypatch, client, store):
+    monkeypatch.setattr(Routes.srmf, 'plan_circular_route_flower', plan_with_events)
+
+    job_id = client.post('/api/jobs/circular_route', json={"start_point": [52.2, 5.3], "max_length": 4000}).get_json()['job_id']
+    Routes.jobs.executor.shutdown(wait=True)
+
+    events = read_events(client.get(f'/api/jobs/{job_id}/events'))
+    assert [(event_id, event) for event_id, event, _ in events] == [("0", "graph_loaded"), ("1", "leafs_generated"), ("2", "candidates_scored"), (None, "end")]
+    assert events[-1][2]['status'] == JobManager.DONE
+
+    # A client that reconnects gets the events it missed, also from a server process that did not run the job
+    for manager in (Routes.jobs, JobManager.JobManager(store=store)):
+        monkeypatch.setattr(Routes, 'jobs', manager)
+        events = read_events(client.get(f'/api/jobs/{job_id}/events', headers={'Last-Event-ID': '0'}))
+
+        assert [event_id for event_id, _, _ in events] == ["1", "2", None]
+        assert client.get(f'/api/jobs/{job_id}').get_json()['result'] == {"path": [1, 2, 1]}
+
+
+def test_unknown_job(client):
+    assert client.get('/api/jobs/missing').status_code == 404
+    assert client.get('/api/jobs/missing/events').status_code == 404
@@ -0,0 +1,59 @@
+import time
+import pytest
+
+from srm.Core.SmartRouteMaker import ResultCache
+
+
+def test_quantized_inputs_share_a_key(random_graph):
+    cache = ResultCache.ResultCache()
+
+    def key(length, options):
+        return cache.key("circular_route", random_graph, 1, 1, options, length=cache.quantize(length, 'length'))
+
+    assert key(4020, {"analyze": False}) == key(3980, {"analyze": False})
+    assert key(4020, {"analyze": False}) != key(4080, {"analyze": False})
+    assert key(4020, {"analyze": False}) == key(4020, {"analyze": False, "visualize": True})
+    assert key(4020, {"analyze": False}) != key(4020, {"analyze": True})
+    assert cache.quantize(None, 'elevation') is None
+
+
+def test_results_expire_after_the_ttl(monkeypatch):
+    cache = ResultCache.ResultCache(ttl=60)
+    cache.put('route', {"path": [1, 2, 1]})
+
+    assert cache.get('route') == {"path": [1, 2, 1]}
+
+    now = time.time()
+    monkeypatch.setattr(time, 'time', lambda: now + 61)
+
+    assert cache.get('route') is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_least_recently_used_result_is_evicted():
+    result = {"path": list(range(1000))}
+    cache = ResultCache.ResultCache()
+    cache.put('first', result)
+    # Room for two results and a half
+    cache.max_size = cache.size * 2.5
+
+    cache.put('second', result)
+    cache.get('first')
+    cache.put('third', result)
+
+    assert cache.get('second') is None
+    assert cache.get('first') == result and cache.get('third') == result
+    assert cache.stats()['evictions'] == 1
+
+
+def test_a_result_on_disk_is_found_by_another_cache(tmp_path):
+    disk = {"enabled": True, "directory": str(tmp_path), "max_size_mb": 1}
+    ResultCache.ResultCache(disk=disk).put('route', {"path": [1, 2, 1]})
+    cache = ResultCache.ResultCache(disk=disk)
+
+    assert cache.get('route') == {"path": [1, 2, 1]}
+    assert cache.get('route') == {"path": [1, 2, 1]}
+    assert cache.stats()['disk_hits'] == 1 and cache.stats()['hits'] == 2
+
+    assert ResultCache.ResultCache(ttl=-1, disk=disk).get('route') is None
+    assert not list(tmp_path.glob('*.pickle'))
@@ -0,0 +1,42 @@
+import pytest
+import networkx as nx
+
+from srm.Core.SmartRouteMaker import RoutingGraph
+from conftest import path_length
+
+
+def expected_length(graph: nx.MultiDiGraph, start: int, end: int) -> float:
+    """Shortest path length according to networkx, None when there is no path."""
+
+    try:
+        return nx.shortest_path_length(graph, start, end, weight='length')
+    except nx.NetworkXNoPath:
+        return None
+
+
+def test_search_leg_matches_networkx(random_graph, node_pairs):
+    routing_graph = RoutingGraph.RoutingGraph.from_graph(random_graph)
+
+    for start, end in node_pairs:
+        expected = expected_length(random_graph, start, end)
+        leg = routing_graph.search_leg(start, end)
+
+        if expected is None:
+            assert leg is None, (start, end)
+            continue
+
+        path, length = leg
+        assert path[0] == start and path[-1] == end
+        assert length == pytest.approx(expected, rel=1e-5, abs=1e-2), (start, end)
+        assert path_length(random_graph, path) == pytest.approx(expected, rel=1e-5, abs=1e-2), (start, end)
+
+
+def test_bidirectional_dijkstra_matches_a_star(random_graph, node_pairs):
+    routing_graph = RoutingGraph.RoutingGraph.from_graph(random_graph)
+
+    for start, end in node_pairs[:50]:
+        start_index, end_index = routing_graph.node_index(start), routing_graph.node_index(end)
+        _, a_star_length, _ = routing_graph.bidirectional_search(start_index, end_index)
+        _, dijkstra_length, _ = routing_graph.bidirectional_search(start_index, end_index, use_heuristic=False)
+
+        assert a_star_length == pytest.approx(dijkstra_length, rel=1e-6) if dijkstra_length is not None else a_star_length is None
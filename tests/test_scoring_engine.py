@@ -0,0 +1,40 @@
+import pytest
+import numpy as np
+
+from srm.Core.SmartRouteMaker import ScoringEngine
+
+
+@pytest.fixture
+def scoring_engine() -> ScoringEngine.ScoringEngine:
+    return ScoringEngine.ScoringEngine({'length': 1.0, 'climb': 1.0, 'hardened': 1.0})
+
+
+# length, climb, hardened and max grade of four candidates
+METRICS = np.array([
+    [4000.0, 40.0, 0.5, 0.03],
+    [4400.0, 40.0, 0.5, 0.08],
+    [3900.0, 80.0, 0.9, 0.12],
+    [4000.0, 0.0, 0.0, np.nan],
+])
+
+
+def test_steepness_mask(scoring_engine):
+    assert scoring_engine.feasible(METRICS).all()
+    assert scoring_engine.feasible(METRICS, 8).tolist() == [True, True, False, True]
+    assert scoring_engine.feasible(METRICS, 7.9).tolist() == [True, False, False, True]
+    assert scoring_engine.feasible(METRICS, 0).tolist() == [False, False, False, True]
+
+
+def test_only_objectives_with_a_target_are_scored(scoring_engine):
+    assert scoring_engine.scores(METRICS, 4000) == pytest.approx([0, 0.1, 0.025, 0])
+    assert scoring_engine.scores(METRICS, 4000, elevation_diff_input=40) == pytest.approx([0, 0.1, 1.025, 1])
+    assert scoring_engine.scores(METRICS, 4000, percentage_hard_input=50) == pytest.approx([0, 0.1, 0.425, 0.5])
+    assert ScoringEngine.ScoringEngine({'length': 1.0, 'climb': 0}).scores(METRICS, 4000, elevation_diff_input=40) == pytest.approx([0, 0.1, 0.025, 0])
+
+
+def test_rank_leaves_out_the_infeasible_candidates(scoring_engine):
+    ranking, scores = scoring_engine.rank(METRICS, 4000, 40, 50, 8)
+
+    assert ranking.tolist() == [0, 1, 3]
+    assert len(scores) == len(METRICS)
+    assert len(scoring_engine.rank(np.empty((0, len(ScoringEngine.ScoringEngine.METRICS))), 4000)[0]) == 0
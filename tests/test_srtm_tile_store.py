@@ -0,0 +1,51 @@
+import pytest
+import numpy as np
+
+from srm.Core.SmartRouteMaker import SrtmTileStore
+
+SIDE = 1201
+VOID = -32768
+
+
+@pytest.fixture
+def tile_store(tmp_path) -> SrtmTileStore.SrtmTileStore:
+    """A store with one SRTM3 tile, N52E005, of which the height is the row plus twice the column and a few samples are voids."""
+
+    rows, columns = np.mgrid[0:SIDE, 0:SIDE]
+    heights = (rows + 2 * columns).astype('>i2')
+    heights[100, 100] = VOID
+    heights[200:202, 200:202] = VOID
+    heights.tofile(tmp_path / 'N52E005.hgt')
+
+    return SrtmTileStore.SrtmTileStore(str(tmp_path))
+
+
+def coordinates(row: float, column: float) -> tuple:
+    """Coordinate of a fractional sample position in the N52E005 tile."""
+
+    return 53 - row / (SIDE - 1), 5 + column / (SIDE - 1)
+
+
+def test_bilinear_interpolation_between_samples(tile_store):
+    positions = [(0.5, 0.5), (10.5, 20.25), (600.75, 33.5), (1199.5, 1199.25)]
+    lat, lon = zip(*[coordinates(row, column) for row, column in positions])
+
+    assert tile_store.sample(lat, lon) == pytest.approx([row + 2 * column for row, column in positions], abs=1e-6)
+
+
+def test_voids_are_left_out(tile_store):
+    # Next to a single void the other three samples are used, on the void its valid neighbours, within four voids nothing is known
+    lat, lon = zip(coordinates(100.5, 100.5), coordinates(100, 100), coordinates(200.5, 200.5))
+    elevations = tile_store.sample(lat, lon)
+
+    assert elevations[0] == pytest.approx(((100 + 2 * 101) + (101 + 2 * 100) + (101 + 2 * 101)) / 3)
+    assert 297 <= elevations[1] <= 303
+    assert np.isnan(elevations[2])
+
+
+def test_missing_tiles_are_unknown(tile_store):
+    elevations = tile_store.sample([52.5, 40.5], [5.5, 5.5])
+
+    assert not np.isnan(elevations[0]) and np.isnan(elevations[1])
+    assert tile_store.tile(40, 5) is None
+    assert tile_store.tile_name(-3, -70) == "S03W070.hgt"
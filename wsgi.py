@@ -1,2 +1,2 @@
-from srm import create_app
-app = create_app()
\ No newline at end of file
+from srm import create_headless_app
+app = create_headless_app()
\ No newline at end of file